@@ -0,0 +1,263 @@
+import argparse, csv, datetime, heapq, os, time, warnings
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from numba import njit
+from indicators import batch_series, rule_codes, synthetic_candles
+from transport import Transport
+
+BASE_URL = os.environ.get("BYBIT_BASE_URL", "https://api.bybit.com")
+CACHE_DIR = os.path.join(os.getcwd(), "backtest_cache")
+HEADER = ["Time", "Symbol", "Mode", "Side", "RSI", "ADX", "ATR", "Trend", "EntryPrice", "ExitPrice", "PnL", "Result"]
+HOUR = 3600000
+WARMUP_BARS = 210      # 60m bars loaded before the test window (EMA200 on SWING + BTC regime)
+ZOMBIE_MIN_PNL = 0.2   # same threshold as the live zombie killer
+EXIT_REASONS = ("SL", "TRAIL", "ZOMBIE", "END")
+
+# Mirrors the live defaults in bot_v33.py
+DEFAULTS = {"ADX_THRESHOLD": 25.0, "RISK_PER_TRADE": 4.0, "LEVERAGE": 5, "MAX_OPEN_POSITIONS": 5,
+            "COOLDOWN_MINUTES": 90, "STALEMATE_HOURS": 4, "FEE": 0.00055,
+            "SCALP_CONF": {"interval": "15", "sl_atr": 3.0, "trail_active_atr": 0.5, "trail_cb_atr": 0.5},
+            "SWING_CONF": {"interval": "60", "sl_atr": 5.0, "trail_active_atr": 1.5, "trail_cb_atr": 1.0}}
+
+transport = Transport(pool_size=16)
+
+# --- DATA ---
+def fetch_range(symbol, interval, start_ms, end_ms):
+    rows, end = [], end_ms
+    while end >= start_ms:
+        res = transport.get(f"{BASE_URL}/v5/market/kline", params={"category": "linear", "symbol": symbol, "interval": interval,
+                                                                  "start": start_ms, "end": end, "limit": 1000}).json()
+        batch = res['result']['list']
+        if not batch: break
+        rows.extend(batch)
+        end = int(batch[-1][0]) - 1
+        if len(batch) < 1000: break
+    if not rows: return np.empty((0, 7))
+    arr = np.array(rows, dtype=float)
+    return arr[np.unique(arr[:, 0], return_index=True)[1]]
+
+def load_klines(symbol, interval, start_ms, end_ms):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{symbol}_{interval}_{start_ms}_{end_ms}.npy")
+    if os.path.exists(path): return np.load(path)
+    arr = fetch_range(symbol, interval, start_ms, end_ms)
+    np.save(path, arr)
+    return arr
+
+def to_grid(series, start_ms, n_bars, step):
+    # [symbol arrays of (ts, o, h, l, c, v, t)] -> (6, symbols, bars) planes on a fixed time grid, NaN where missing
+    planes = np.full((6, len(series), n_bars), np.nan)
+    for k, arr in enumerate(series):
+        if not len(arr): continue
+        idx = ((arr[:, 0] - start_ms) // step).astype(np.int64)
+        ok = (idx >= 0) & (idx < n_bars)
+        planes[:, k, idx[ok]] = arr[ok, 1:7].T
+    return planes
+
+def resample(planes, factor):
+    n = planes.shape[2] // factor * factor
+    g = planes[:, :, :n].reshape(6, planes.shape[1], n // factor, factor)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.stack((g[0, ..., 0], np.nanmax(g[1], -1), np.nanmin(g[2], -1), g[3, ..., -1], np.nansum(g[4], -1), np.nansum(g[5], -1)))
+
+def build_dataset(symbols, ltf_series, start_ms, end_ms, ltf):
+    # Only lower-timeframe bars are loaded; 15m and 60m are aggregated from them so every layer agrees.
+    # Index 0 is BTCUSDT (regime filter); the tradeable symbols follow.
+    step = int(ltf) * 60000
+    n = (end_ms - start_ms) // HOUR * (HOUR // step)
+    ds = {"symbols": symbols, "ltf": ltf, "step": step, "start": start_ms, "times": start_ms + np.arange(n) * step}
+    ds["ltf_planes"] = to_grid(ltf_series, start_ms, n, step)
+    for iv in ("15", "60"):
+        f = int(iv) * 60000 // step
+        ds[iv] = resample(ds["ltf_planes"], f)
+        ds["t" + iv] = start_ms + np.arange(ds[iv].shape[2]) * int(iv) * 60000
+    return ds
+
+def load_dataset(symbols, start_ms, end_ms, ltf="5", workers=8):
+    start_ms = start_ms // HOUR * HOUR - WARMUP_BARS * HOUR
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        series = list(pool.map(lambda s: load_klines(s, ltf, start_ms, end_ms), ["BTCUSDT"] + list(symbols)))
+    return build_dataset(list(symbols), series, start_ms, end_ms, ltf)
+
+def synthetic_dataset(symbols, start_ms, end_ms, ltf="5"):
+    start_ms = start_ms // HOUR * HOUR - WARMUP_BARS * HOUR
+    step = int(ltf) * 60000; n = (end_ms - start_ms) // step
+    series = []
+    for k, s in enumerate(["BTCUSDT"] + list(symbols)):
+        arr = synthetic_candles(n, seed=k, start=100.0 + k, step_ms=step)
+        arr[:, 0] += start_ms
+        series.append(arr)
+    return build_dataset(list(symbols), series, start_ms, end_ms, ltf)
+
+# --- PRECOMPUTE ---
+def rolling_mean(a, n):
+    cs = np.cumsum(np.nan_to_num(a), axis=-1); out = np.full(a.shape, np.nan)
+    out[..., n - 1:] = cs[..., n - 1:] - np.concatenate((np.zeros(a.shape[:-1] + (1,)), cs[..., :-n]), axis=-1)
+    return out / n
+
+def trend_codes(close, n):
+    # Live bot: ta.ema over exactly n bars == mean of those n closes -> BULL (+1) / BEAR (-1), 0 while unknown
+    m = rolling_mean(close, n)
+    with np.errstate(invalid='ignore'): return np.where(np.isnan(m) | np.isnan(close), 0, np.where(close > m, 1, -1)).astype(np.int8)
+
+def precompute(ds):
+    # Parameter-independent arrays: indicator series per interval, HTF trend and BTC regime on the 60m grid
+    pre = {}
+    for iv in ("15", "60"):
+        o, h, l, c, v, t = ds[iv]
+        pre[iv] = batch_series(h, l, c, v)
+    pre["htf"] = trend_codes(ds["60"][3], 50)
+    pre["btc"] = trend_codes(ds["60"][3][0], 200)
+    return pre
+
+# --- EXIT SIMULATION ---
+@njit(cache=True)
+def _walk(o, h, l, c, i0, d, entry, sl, act, dist, zombie_i, qty, zombie_pnl):
+    # Exchange-side stop-loss + trailing stop (set_trading_stop) replayed on lower-timeframe bars.
+    # Intrabar path: up bars go open -> low -> high -> close, down bars open -> high -> low -> close.
+    active = False; best = entry; stop = sl; last = i0
+    for i in range(i0, len(c)):
+        if np.isnan(c[i]): continue
+        last = i
+        pts = (o[i], l[i], h[i], c[i]) if c[i] >= o[i] else (o[i], h[i], l[i], c[i])
+        for j in range(4):
+            p = pts[j]
+            if (d > 0 and p <= stop) or (d < 0 and p >= stop):
+                return i, (p if j == 0 else stop), (1 if active else 0)
+            if d * (p - best) > 0: best = p
+            if not active and d * (best - act) >= 0: active = True
+            if active:
+                trail = best - d * dist
+                if d * (trail - stop) > 0: stop = trail
+        if zombie_i >= 0 and i >= zombie_i and d * (c[i] - entry) * qty < zombie_pnl:
+            return i, c[i], 2
+    return last, c[last], 3
+
+def round_qty(qty, price):
+    # Same lot rounding as BybitPrivate.place_order
+    if price > 100: return round(qty, 3)
+    if price > 1: return round(qty, 1)
+    return float(int(qty))
+
+# --- STRATEGY REPLAY ---
+def candidates(ds, pre, params, modes, t_from, t_to):
+    # Every bar-close signal that passes the BTC regime and (SCALP) 60m HTF filters, sorted like the live scan
+    out = []
+    t60_close = ds["t60"] + HOUR
+    for mode_id, (mode, mask) in enumerate(modes):
+        conf = params[mode + "_CONF"]; iv = conf["interval"]; step = int(iv) * 60000
+        s = pre[iv]; o, h, l, c, v, t = ds[iv]
+        close_t = ds["t" + iv] + step
+        j60 = np.searchsorted(t60_close, close_t, side="right") - 1
+        btc = np.where(j60 >= 0, pre["btc"][np.maximum(j60, 0)], 0)
+        codes = rule_codes(s['adx'], s['rsi'], s['ema200'], s['macd_h'], s['vol_ma'], c, v, params["ADX_THRESHOLD"], btc)
+        codes[0] = 0; codes[~mask] = 0
+        codes[:, (close_t < t_from) | (close_t > t_to)] = 0
+        htf = np.where(j60 >= 0, pre["htf"][:, np.maximum(j60, 0)], 0)
+        if mode == "SCALP": codes[(codes * htf) < 0] = 0
+        k, i = np.nonzero(codes)
+        with np.errstate(invalid='ignore'): vol_mult = np.where(v[k, i] > s['vol_ma'][k, i] * 2.0, 1.5, 1.0) if mode == "SCALP" else np.ones(len(k))
+        out.append(np.rec.fromarrays([close_t[i], np.full(len(k), mode_id), k, codes[k, i], c[k, i], s['atr'][k, i], s['rsi'][k, i],
+                                      s['adx'][k, i], vol_mult, htf[k, i]], names="t,mode,k,d,price,atr,rsi,adx,mult,htf"))
+    ev = np.concatenate(out).view(np.recarray) if out else np.empty(0)
+    return ev[np.lexsort((ev.k, ev.mode, ev.t))] if len(ev) else ev
+
+def test_window(ds):
+    # First and last signal time the dataset supports once the warm-up bars are spent
+    return int(ds["t60"][0] + WARMUP_BARS * HOUR), int(ds["times"][-1])
+
+def simulate(ds, pre, params, modes, t_from=None, t_to=None, events=None):
+    # `events` lets a caller reuse candidates() across parameter sets that share ADX_THRESHOLD and window
+    lo, hi = test_window(ds)
+    t_from, t_to = (lo if t_from is None else t_from), (hi if t_to is None else t_to)
+    ev = candidates(ds, pre, params, modes, t_from, t_to) if events is None else events
+    o, h, l, c, v, tv = ds["ltf_planes"]; times, step = ds["times"], ds["step"]
+    n_sym = c.shape[0]
+    last_exit = np.full(n_sym, -np.inf); blacklist = np.zeros(n_sym); streak = np.zeros(n_sym, dtype=int)
+    open_k, exits, loss_times, trades = set(), [], [], []
+    pause_until = 0.0; cooldown = params["COOLDOWN_MINUTES"] * 60000
+    for e in ev:
+        while exits and exits[0][0] <= e.t:
+            xt, k, pnl = heapq.heappop(exits)
+            open_k.discard(k); last_exit[k] = xt
+            if pnl < 0:
+                streak[k] += 1; loss_times.append(xt)
+                if streak[k] >= 2: blacklist[k] = xt + 24 * HOUR
+                if sum(1 for lt in loss_times if xt - lt < HOUR) >= 3: pause_until = xt + 2 * HOUR
+            else: streak[k] = 0
+        if e.k in open_k or e.t < blacklist[e.k] or e.t - last_exit[e.k] < cooldown or e.t < pause_until: continue
+        if len(open_k) >= params["MAX_OPEN_POSITIONS"] or not e.atr > 0: continue
+        mode = modes[e.mode][0]; conf = params[mode + "_CONF"]
+        qty = round_qty(params["RISK_PER_TRADE"] * e.mult * params["LEVERAGE"] / e.price, e.price)
+        if qty <= 0: continue
+        d = int(e.d); i0 = int(np.searchsorted(times, e.t))
+        if i0 >= len(times): continue
+        zombie_i = int(np.searchsorted(times + step, e.t + params["STALEMATE_HOURS"] * HOUR)) if mode == "SCALP" else -1
+        xi, xp, why = _walk(o[e.k], h[e.k], l[e.k], c[e.k], i0, d, e.price, e.price - d * e.atr * conf["sl_atr"],
+                            e.price + d * e.atr * conf["trail_active_atr"], e.atr * conf["trail_cb_atr"], zombie_i, qty, ZOMBIE_MIN_PNL)
+        pnl = d * (xp - e.price) * qty - params["FEE"] * (e.price + xp) * qty
+        xt = times[xi] + step
+        open_k.add(e.k); heapq.heappush(exits, (xt, int(e.k), pnl))
+        trades.append({"Time": datetime.datetime.fromtimestamp(e.t / 1000).strftime("%Y-%m-%d %H:%M:%S"), "Symbol": ds["symbols"][e.k - 1],
+                       "Mode": mode, "Side": "Buy" if d > 0 else "Sell", "RSI": e.rsi, "ADX": e.adx, "ATR": e.atr,
+                       "Trend": ({1: "BULL", -1: "BEAR"}.get(int(e.htf), "NEUTRAL") if mode == "SCALP" else "SWING"),
+                       "EntryPrice": e.price, "ExitPrice": xp, "PnL": pnl, "Result": 1 if pnl > 0 else 0,
+                       "_exit_t": xt, "_reason": EXIT_REASONS[why]})
+    return trades
+
+def mode_masks(ds, scalp, swing):
+    idx = {s: k + 1 for k, s in enumerate(ds["symbols"])}
+    masks = []
+    for mode, syms in (("SCALP", scalp), ("SWING", swing)):
+        m = np.zeros(len(ds["symbols"]) + 1, dtype=bool)
+        for s in syms: m[idx[s]] = True
+        if syms: masks.append((mode, m))
+    return masks
+
+def split_by_volatility(ds):
+    # Like MarketSelector: the more volatile half scalps, the rest swings
+    o, h, l, c, v, t = ds["60"]
+    with np.errstate(invalid='ignore', divide='ignore'): vol = np.nanmean((h[1:] - l[1:]) / l[1:], axis=1)
+    order = [ds["symbols"][k] for k in np.argsort(-np.nan_to_num(vol))]
+    return order[:len(order) // 2 or 1], order[len(order) // 2 or 1:]
+
+def summarize(trades):
+    if not trades: return {"trades": 0, "pnl": 0.0, "win_rate": 0.0, "max_dd": 0.0}
+    pnl = np.array([t["PnL"] for t in sorted(trades, key=lambda t: t["_exit_t"])])
+    equity = np.cumsum(pnl)
+    return {"trades": len(pnl), "pnl": float(equity[-1]), "win_rate": float((pnl > 0).mean() * 100),
+            "max_dd": float(np.max(np.maximum.accumulate(np.concatenate(([0.0], equity))) - np.concatenate(([0.0], equity))))}
+
+def write_trades(trades, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for t in trades: writer.writerow([t[k] for k in HEADER])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Replay the SCALP/SWING strategy over historical Bybit klines")
+    ap.add_argument("--symbols", default="SOLUSDT,DOGEUSDT,XRPUSDT,ETHUSDT")
+    ap.add_argument("--scalp", help="comma list; default: the more volatile half of --symbols")
+    ap.add_argument("--swing", help="comma list; default: the rest of --symbols")
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--ltf", default="5", help="intrabar resolution in minutes (1, 3 or 5)")
+    ap.add_argument("--out", default="backtest_trades.csv")
+    ap.add_argument("--synthetic", action="store_true", help="random-walk data, no network")
+    args = ap.parse_args()
+
+    symbols = args.symbols.split(",")
+    end = int(time.time() * 1000) // HOUR * HOUR; start = end - args.days * 24 * HOUR
+    t0 = time.time()
+    ds = (synthetic_dataset if args.synthetic else load_dataset)(symbols, start, end, args.ltf)
+    t1 = time.time()
+    if args.scalp or args.swing:
+        scalp = args.scalp.split(",") if args.scalp else []; swing = args.swing.split(",") if args.swing else []
+    else: scalp, swing = split_by_volatility(ds)
+    pre = precompute(ds)
+    trades = simulate(ds, pre, DEFAULTS, mode_masks(ds, scalp, swing))
+    t2 = time.time()
+    write_trades(trades, args.out)
+    st = summarize(trades)
+    print(f"📦 Data: {len(symbols)} symbols x {len(ds['times'])} {args.ltf}m bars in {t1 - t0:.1f}s | ⚙️ Replay: {t2 - t1:.2f}s")
+    print(f"🏆 Trades: {st['trades']} | PnL: ${st['pnl']:.2f} | WinRate: {st['win_rate']:.1f}% | MaxDD: ${st['max_dd']:.2f} -> {args.out}")
@@ -0,0 +1,225 @@
+import argparse, json, os, platform, statistics, subprocess, sys, time, types
+from urllib.parse import urlsplit, parse_qsl
+import numpy as np
+
+# --- HOT-PATH BENCHMARKS ---
+# `python bench.py` times the bot's hot paths against recorded exchange responses, checks the fast
+# indicator paths still match pandas_ta, writes machine-readable results and compares them with a
+# stored baseline. Exit code 1 when a benchmark regresses past --threshold or parity fails.
+#   python bench.py --record            # record fixtures from BYBIT_BASE_URL (live or mock_exchange.py)
+#   python bench.py --save-baseline     # run and store the result as the new baseline
+#   python bench.py                     # run, compare, append to bench_history.jsonl
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_FILE = os.path.join(BASE_DIR, "bench_fixtures", "exchange.json")
+BASELINE_FILE = os.path.join(BASE_DIR, "bench_baseline.json")
+HISTORY_FILE = os.path.join(BASE_DIR, "bench_history.jsonl")
+RESULT_FILE = os.path.join(BASE_DIR, "bench_results.json")
+INTERVALS = ("15", "60")
+PARITY_BARS = 1000
+
+# bot_v33 reads credentials at import; the benchmark never reaches a real endpoint
+try: import config
+except ImportError: sys.modules["config"] = types.SimpleNamespace(API_KEY="bench", API_SECRET="bench", TELEGRAM_TOKEN="bench")
+
+# --- FIXTURES ---
+def record(base_url):
+    from transport import Transport
+    tr = Transport()
+    tickers = tr.get(f"{base_url}/v5/market/tickers", params={"category": "linear"}).json()
+    valid = sorted((t for t in tickers['result']['list'] if t['symbol'].endswith('USDT') and 'USDC' not in t['symbol']),
+                   key=lambda t: float(t['turnover24h']), reverse=True)[:40]
+    symbols = sorted({t['symbol'] for t in valid} | {"BTCUSDT"})
+    klines = {}
+    for s in symbols:
+        for i in INTERVALS:
+            klines[f"{s}/{i}"] = tr.get(f"{base_url}/v5/market/kline", params={"category": "linear", "symbol": s, "interval": i, "limit": 200}).json()
+    long_ = tr.get(f"{base_url}/v5/market/kline", params={"category": "linear", "symbol": "BTCUSDT", "interval": "60", "limit": PARITY_BARS}).json()
+    return {"recorded": int(time.time()), "source": base_url, "tickers": tickers, "klines": klines, "long": long_}
+
+def synthetic_fixtures(n_symbols=60, seed=7):
+    # Deterministic stand-in when nothing has been recorded: mock_exchange's seeded random walks
+    from mock_exchange import Market, default_symbols
+    m = Market(default_symbols(n_symbols), seed)
+    ok = lambda result: {"retCode": 0, "retMsg": "OK", "result": result}
+    return {"recorded": int(time.time()), "source": f"synthetic:{seed}", "tickers": ok({"list": [m.ticker(s) for s in m.symbols]}),
+            "klines": {f"{s}/{i}": ok({"list": m.bars(s, int(i))}) for s in m.symbols for i in INTERVALS},
+            "long": ok({"list": m.bars("BTCUSDT", 60, limit=PARITY_BARS)})}
+
+def load_fixtures():
+    if os.path.exists(FIXTURE_FILE):
+        with open(FIXTURE_FILE) as f: return json.load(f)
+    return synthetic_fixtures()
+
+class Response:
+    def __init__(self, payload): self.payload = payload
+    def json(self): return self.payload
+
+class ReplayTransport:
+    # Drop-in for transport.Transport answering from fixtures. Kline timestamps are shifted so the newest
+    # bar is the one forming now, which keeps CandleStore on its incremental (delta) path as in production.
+    def __init__(self, fx):
+        self.fx = fx
+        self.counts = {}
+
+    def request(self, method, url, kind="market", **kw):
+        parts = urlsplit(url); q = dict(parse_qsl(parts.query)); q.update({k: str(v) for k, v in (kw.get("params") or {}).items()})
+        self.counts[parts.path] = self.counts.get(parts.path, 0) + 1
+        return Response(self.route(parts.path, q))
+
+    def get(self, url, kind="market", **kw): return self.request("GET", url, kind, **kw)
+    def post(self, url, kind="market", **kw): return self.request("POST", url, kind, **kw)
+    def summary(self): return "replay"
+
+    def route(self, path, q):
+        ok = lambda result: {"retCode": 0, "retMsg": "OK", "result": result}
+        if path == "/v5/market/tickers": return self.fx["tickers"]
+        if path == "/v5/market/kline":
+            res = self.fx["klines"].get(f"{q.get('symbol')}/{q.get('interval')}")
+            if not res: return {"retCode": 10001, "retMsg": "params error", "result": {}}
+            rows = res["result"]["list"][:int(q.get("limit", 200))]
+            step = int(q["interval"]) * 60000
+            shift = int(time.time() * 1000) // step * step - int(res["result"]["list"][0][0])
+            return ok({"list": [[str(int(r[0]) + shift)] + r[1:] for r in rows]})
+        if path in ("/v5/position/list", "/v5/position/closed-pnl"): return ok({"list": []})
+        if path == "/v5/account/wallet-balance": return ok({"list": [{"coin": [{"coin": "USDT", "walletBalance": "1000"}]}]})
+        if path.startswith(("/v5/order/", "/v5/position/")): return {"retCode": 10001, "retMsg": "orders disabled in bench", "result": {}}
+        if path == "/fng/": return {"data": [{"value": "50", "value_classification": "Neutral"}]}
+        return {"ok": True, "result": []}  # Telegram
+
+# --- TIMING ---
+def timeit(fn, repeat=5, min_time=0.05):
+    fn()
+    loops, el = 1, 0.0
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops): fn()
+        el = time.perf_counter() - t0
+        if el >= min_time or loops >= 1 << 20: break
+        loops *= 2
+    runs = [el / loops]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops): fn()
+        runs.append((time.perf_counter() - t0) / loops)
+    return {"median_us": statistics.median(runs) * 1e6, "min_us": min(runs) * 1e6, "loops": loops}
+
+def benchmarks(fx):
+    import logging
+    import pandas as pd, pandas_ta as ta
+    import bot_v33 as bot
+    from candles import CandleStore, COLUMNS
+    from indicators import IndicatorEngine, signal_table
+    logging.getLogger().setLevel(logging.WARNING)
+
+    replay = ReplayTransport(fx)
+    bot.transport = replay
+    bot.save_settings = lambda: None
+    bot.live_settings.update({"WS_MARKET_DATA": False, "WS_ACCOUNT_DATA": False, "GLOBAL_STOP": False, "PAUSE_UNTIL": 0})
+    bot.account_stream.is_live = lambda max_silence=60: True  # production path: positions/closes from the private stream
+
+    sym = "BTCUSDT"
+    raw = fx["klines"][f"{sym}/15"]["result"]["list"]
+    df = pd.DataFrame(raw[::-1], columns=COLUMNS).apply(pd.to_numeric)
+    store = CandleStore(lambda s, i, limit: raw[:limit][::-1], capacity=200)
+    ring = store.refresh(sym, "15")
+    win_store = CandleStore(lambda s, i, limit: fx["klines"][f"{s}/{i}"]["result"]["list"][:limit][::-1], capacity=200)
+    syms = [k.split("/")[0] for k in fx["klines"] if k.endswith("/15")][:40]
+    windows = [win_store.refresh(s, "15").view() for s in syms]
+
+    def legacy_frame():
+        d = pd.DataFrame(raw[::-1], columns=COLUMNS)
+        d[['h', 'l', 'c', 'v']] = d[['h', 'l', 'c', 'v']].apply(pd.to_numeric)
+        return d
+
+    def ring_load():
+        CandleStore(lambda s, i, limit: raw[:limit][::-1], capacity=200).refresh(sym, "15")
+
+    bot_ui = bot.TelegramBot()
+    state = bot.scanner_init(bot_ui)
+
+    def scan(mode):
+        def run():
+            bot.live_settings['EVAL_MODE'] = mode
+            assert bot.scan_iteration(bot_ui, state, wait=False) == "scanned"
+        return run
+
+    return {
+        "kline_json_to_frame": legacy_frame,
+        "kline_json_to_ring": ring_load,
+        "ta_adx": lambda: ta.adx(df['h'], df['l'], df['c']),
+        "ta_rsi": lambda: ta.rsi(df['c'], length=14),
+        "ta_ema200": lambda: ta.ema(df['c'], length=200),
+        "ta_macd": lambda: ta.macd(df['c']),
+        "ta_atr": lambda: ta.atr(df['h'], df['l'], df['c'], length=14),
+        "ta_sma_vol": lambda: ta.sma(df['v'], length=20),
+        "engine_sync_cold": lambda: IndicatorEngine().sync(ring.view()),
+        "signal_table_40": lambda: signal_table(syms, windows, 25.0, "BULL"),
+        "refresh_lists": bot.MarketSelector.refresh_lists,
+        "send_signed": lambda: bot.BybitPrivate.send_signed("GET", "/v5/position/list", {"category": "linear", "settleCoin": "USDT"}),
+        "smart_round": lambda: (bot.smart_round(1234.5678), bot.smart_round(0.123456), bot.smart_round(0.00001234)),
+        "scan_iteration_stream": scan("stream"),
+        "scan_iteration_batch": scan("batch"),
+    }
+
+def parity(fx):
+    from indicators import parity_error, batch_parity_error, PARITY_TOL
+    arr = np.array(fx["long"]["result"]["list"][::-1], dtype=float)
+    return {name: {"max_rel_err": err, "ok": bool(err < PARITY_TOL)}
+            for name, err in (("streaming", parity_error(arr)), ("batch", batch_parity_error(arr)))}
+
+# --- REPORT ---
+def meta(fx):
+    try: commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip()
+    except Exception: commit = ""
+    import pandas
+    return {"time": int(time.time()), "commit": commit, "python": platform.python_version(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "numpy": np.__version__, "pandas": pandas.__version__, "fixtures": fx["source"]}
+
+def compare(results, baseline, threshold):
+    rows, regressions = [], []
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name) if baseline else None
+        ratio = r["median_us"] / base["median_us"] if base and base["median_us"] else None
+        if ratio is not None and ratio > 1 + threshold: regressions.append(name)
+        rows.append((name, r["median_us"], ratio))
+    return rows, regressions
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the bot's hot paths against recorded fixtures")
+    ap.add_argument("--record", action="store_true", help="record fixtures from BYBIT_BASE_URL and exit")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = +25%%)")
+    ap.add_argument("--only", help="comma list of benchmark names")
+    ap.add_argument("--out", default=RESULT_FILE)
+    args = ap.parse_args()
+
+    if args.record:
+        base = os.environ.get("BYBIT_BASE_URL", "https://api.bybit.com")
+        os.makedirs(os.path.dirname(FIXTURE_FILE), exist_ok=True)
+        with open(FIXTURE_FILE, "w") as f: json.dump(record(base), f)
+        print(f"📼 Recorded fixtures from {base} -> {FIXTURE_FILE}"); sys.exit(0)
+
+    fx = load_fixtures()
+    benches = benchmarks(fx)
+    if args.only: benches = {k: v for k, v in benches.items() if k in args.only.split(",")}
+    results = {name: timeit(fn) for name, fn in benches.items()}
+    report = {"meta": meta(fx), "results": results, "parity": parity(fx)}
+    with open(args.out, "w") as f: json.dump(report, f, indent=2)
+    with open(HISTORY_FILE, "a") as f: f.write(json.dumps(report) + "\n")
+
+    baseline = None
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f: baseline = json.load(f)
+    rows, regressions = compare(results, baseline, args.threshold)
+    for name, us, ratio in rows:
+        delta = f"{(ratio - 1) * 100:+6.1f}%" if ratio is not None else "   new"
+        flag = "❌" if name in regressions else "  "
+        print(f"{flag} {name:24s} {us:12.1f} µs  {delta}")
+    for name, p in report["parity"].items():
+        print(f"{'✅' if p['ok'] else '❌'} parity {name}: max relative error vs pandas_ta {p['max_rel_err']:.2e}")
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f: json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved -> {BASELINE_FILE}")
+    failed = bool(regressions) or not all(p["ok"] for p in report["parity"].values())
+    if regressions: print(f"❌ {len(regressions)} regression(s) over +{args.threshold * 100:.0f}%: {', '.join(regressions)}")
+    sys.exit(1 if failed and not args.save_baseline else 0)
@@ -1,5 +1,21 @@
-import threading, time, json, logging, os, requests, pandas as pd, pandas_ta as ta, datetime, hmac, hashlib, sys, urllib.parse, csv
+import threading, time, json, logging, os, math, pandas as pd, pandas_ta as ta, datetime, sys, urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import config 
+from transport import Transport, bybit_headers, ORDER_ENDPOINTS
+from ratelimit import RateLimiter, UI
+from outbox import Outbox
+from trade_store import TradeStore
+from pnl_sync import PnlSync
+import snapshot
+import metrics
+from candles import CandleStore
+from indicators import IndicatorEngine, market_info, signal_table
+from market_stream import MarketStream, PUBLIC_URL
+from market_hub import HubClient
+from universe import UniverseRanker
+from funnel import Funnel
+from shards import ShardPool
+from private_stream import AccountStream, PRIVATE_URL
 
 # --- CONFIG ---
 API_KEY = config.API_KEY
@@ -9,8 +25,40 @@ TARGET_CHAT_ID = "1143478179"
 BASE_DIR = os.getcwd()
 SETTINGS_FILE = os.path.join(BASE_DIR, "live_settings.json")
 LOG_FILE = os.path.join(BASE_DIR, "bot_v33.log")
-DATA_FILE = os.path.join(BASE_DIR, "trade_history.csv")
+DATA_FILE = os.path.join(BASE_DIR, "trade_history.csv")  # legacy journal, imported into TRADE_DB once
+TRADE_DB = os.path.join(BASE_DIR, "trade_history.db")
 PARDON_FILE = os.path.join(BASE_DIR, "pardoned.json")
+PNL_WATERMARK_FILE = os.path.join(BASE_DIR, "pnl_watermark.json")
+SNAPSHOT_FILE = os.path.join(BASE_DIR, "bot_state.pkl")
+SNAPSHOT_MAX_AGE = 6 * 3600  # older snapshots are ignored (cold start)
+# Endpoints can be pointed at mock_exchange.py (env vars win over config.py)
+BASE_URL = os.environ.get("BYBIT_BASE_URL") or getattr(config, "BYBIT_BASE_URL", "https://api.bybit.com")
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL") or getattr(config, "TELEGRAM_API_URL", "https://api.telegram.org")
+WS_PUBLIC_URL = os.environ.get("BYBIT_WS_PUBLIC_URL") or getattr(config, "WS_PUBLIC_URL", PUBLIC_URL)
+WS_PRIVATE_URL = os.environ.get("BYBIT_WS_PRIVATE_URL") or getattr(config, "WS_PRIVATE_URL", PRIVATE_URL)
+# Public market data from a shared market_hub.py process instead of the exchange (one hub serves every instance)
+MARKET_HUB_SOCKET = os.environ.get("MARKET_HUB_SOCKET") or getattr(config, "MARKET_HUB_SOCKET", None)
+
+# --- NETWORK ---
+# Every HTTP call goes through one pooled keep-alive transport (set HTTP2 = True in config.py to use httpx).
+# Bybit calls queue in a priority rate limiter first: orders, then account reads, then market data, then Telegram reads.
+
+def observe_http(kind, url, seconds, status):
+    ep = metrics.endpoint_label(kind, urllib.parse.urlsplit(url).path)
+    metrics.http_seconds.observe(seconds, ep)
+    if status is None or status >= 400: metrics.api_errors.inc(ep, str(status or "exception"))
+
+limiter = RateLimiter()
+transport = Transport(pool_size=32, http2=getattr(config, "HTTP2", False), observer=observe_http, limiter=limiter)
+BATCH_SIZE = 10  # legs per /v5/order/create-batch call
+order_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="orders")  # parallel batch chunks / per-leg follow-ups
+
+def post_telegram(text, parse_mode="Markdown"):
+    payload = {"chat_id": TARGET_CHAT_ID, "text": text}
+    if parse_mode: payload["parse_mode"] = parse_mode
+    return transport.post(f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}/sendMessage", "telegram", json=payload)
+
+outbox = Outbox(post_telegram)  # every TelegramBot.send goes through here, never inline
 
 # --- LOGGING ---
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", handlers=[logging.FileHandler(LOG_FILE), logging.StreamHandler(sys.stdout)])
@@ -28,14 +76,21 @@ live_settings = {
     "STALEMATE_HOURS": 4,      
     "GOD_MODE": True,
     "AUTO_SCALE": True,
-    "PAUSE_UNTIL": 0 # New: For Circuit Breaker
+    "PAUSE_UNTIL": 0, # New: For Circuit Breaker
+    "SCAN_WORKERS": 8, # Parallel kline downloads per scan
+    "WS_MARKET_DATA": True, # Klines/tickers over WebSocket, REST only for backfill
+    "WS_ACCOUNT_DATA": True, # Positions/fills over the private WebSocket instead of per-loop polling
+    "FUNNEL": True, # Screen the whole universe on one ticker snapshot; only survivors get klines + indicators
+    "FUNNEL_BUDGET": 30, # Max symbols per pass that need REST klines (stream-fed series don't count)
+    "EVAL_MODE": "stream", # "stream": per-symbol incremental engine, "batch": one numba pass per interval
+    "SCAN_SHARDS": 0, # Worker processes that evaluate the scan, each owning a slice of the symbols (0 = in this process)
+    "METRICS_PORT": 9108 # Prometheus /metrics on localhost (0 = off)
 }
 
 # --- DYNAMIC LISTS & DATA ---
 SCALP_TARGETS = []
 SWING_TARGETS = []
 fear_greed_index = {"value": 50, "label": "Neutral"} 
-recent_losses_timestamps = [] # New: Track loss velocity
 
 # --- STRATEGY CONFIG (FIXED FOR PROFIT TAKING) ---
 # Hard Stop is WIDE (3.0), but Trailing Activates EARLY (0.5)
@@ -47,14 +102,11 @@ scan_cache = {}
 active_symbols = [] 
 last_trade_time = {}      
 last_entry_time = {}      
-processed_trades = set()  
+leverage_cache = {}       # symbol -> leverage last confirmed by the exchange
 entry_data_log = {} 
 global_btc_trend = "NEUTRAL"
 last_market_update = 0
 daily_pnl = 0.0
-win_rate = 0.0
-wins = 0
-losses = 0
 
 # --- MEMORY ---
 loss_streak = {}     
@@ -73,12 +125,10 @@ if os.path.exists(SETTINGS_FILE):
 
 # --- CIRCUIT BREAKER (STRIKE 3) ---
 def check_loss_circuit_breaker():
-    global recent_losses_timestamps, live_settings
+    global live_settings
     now = time.time()
-    # Keep only losses from the last 60 minutes
-    recent_losses_timestamps = [t for t in recent_losses_timestamps if now - t < 3600]
-    
-    if len(recent_losses_timestamps) >= 3:
+    # Losses closed in the last 60 minutes, from pnl_sync's rolling ledger
+    if pnl_sync.recent_losses(now) >= 3:
         live_settings['PAUSE_UNTIL'] = now + 7200 # Pause for 2 hours
         save_settings()
         return True
@@ -87,9 +137,11 @@ def check_loss_circuit_breaker():
 # --- INTERNET SENSOR ---
 def fetch_fear_and_greed():
     global fear_greed_index
+    if MARKET_HUB_SOCKET and market_stream.reachable() and market_stream.state.get("fng"):
+        fear_greed_index = dict(market_stream.state["fng"]); return
     try:
         url = "https://api.alternative.me/fng/"
-        r = requests.get(url, timeout=5).json()
+        r = transport.get(url, "sentiment").json()
         data = r['data'][0]
         fear_greed_index = {"value": int(data['value']), "label": data['value_classification']}
         logging.info(f"🌍 INTERNET SENSOR: {fear_greed_index['label']} ({fear_greed_index['value']})")
@@ -113,13 +165,15 @@ def save_pardon(symbol):
     except: pass
 
 # --- BLACK BOX RECORDER ---
-def init_csv():
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Time", "Symbol", "Mode", "Side", "RSI", "ADX", "ATR", "Trend", "EntryPrice", "ExitPrice", "PnL", "Result"])
+# Trades go to the SQLite journal (trade_store.py); writes are queued and committed off the trading thread
+trade_store = TradeStore(TRADE_DB)
+
+def init_store():
+    if os.path.exists(DATA_FILE) and trade_store.count() == 0:
+        logging.info(f"📥 Imported {trade_store.import_csv(DATA_FILE)} trades from {os.path.basename(DATA_FILE)}")
+    entry_data_log.update(trade_store.open_trades())  # entry context survives restarts
 
-def log_trade_entry(symbol, mode, side, rsi, adx, atr, trend, price):
+def log_trade_entry(symbol, mode, side, rsi, adx, atr, trend, price, qty=None, order_id=None):
     entry_data_log[symbol] = {
         "Time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "Mode": mode,
@@ -130,29 +184,17 @@ def log_trade_entry(symbol, mode, side, rsi, adx, atr, trend, price):
         "Trend": trend,
         "EntryPrice": price
     }
+    trade_store.record_entry(symbol, mode, side, rsi, adx, atr, trend, price, qty, order_id)
 
-def log_trade_exit(symbol, exit_price, pnl):
-    if symbol in entry_data_log:
-        d = entry_data_log[symbol]
-        result = 1 if pnl > 0 else 0
-        with open(DATA_FILE, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([d["Time"], symbol, d["Mode"], d["Side"], d["RSI"], d["ADX"], d["ATR"], d["Trend"], d["EntryPrice"], exit_price, pnl, result])
-        del entry_data_log[symbol] 
+def log_trade_exit(symbol, exit_price, pnl, ts=None, order_id=None):
+    entry_data_log.pop(symbol, None)
+    trade_store.record_exit(symbol, exit_price, pnl, ts, order_id)
 
 # --- AUTO SCALER ---
-def adjust_risk_based_on_performance(pnl):
-    global wins, losses, win_rate, recent_losses_timestamps
-    if pnl > 0: 
-        wins += 1
-    else: 
-        losses += 1
-        recent_losses_timestamps.append(time.time()) # Add timestamp of loss
-        
-    total = wins + losses
-    if total < 5: return 
-
-    win_rate = (wins / total) * 100
+def adjust_risk_based_on_performance(now=None):
+    # Win rate of the trades closed in the last 24h, from pnl_sync's rolling ledger
+    if pnl_sync.day.count(now) < 5: return
+    win_rate = pnl_sync.win_rate(now)
     if not live_settings['AUTO_SCALE']: return
 
     current_risk = live_settings['RISK_PER_TRADE']
@@ -174,21 +216,40 @@ def smart_round(num):
     if num > 0.01: return f"{num:.4f}"
     return f"{num:.8f}".rstrip("0")
 
+# --- UI STATE ---
+# Read-only Telegram commands answer from the private stream when it is live, else from the scanner's last snapshot
+# while it is younger than UI_FRESH_SECONDS; only stale data costs an exchange round trip.
+UI_FRESH_SECONDS = 30
+ui_state = {"positions": {}, "positions_ts": 0.0, "balance": None, "balance_ts": 0.0}
+
+def cached_positions():
+    if account_stream.is_live(): return account_stream.position_details()
+    if time.time() - ui_state['positions_ts'] >= UI_FRESH_SECONDS:
+        positions = BybitPrivate.get_open_positions_details()
+        if positions is not None: ui_state['positions'], ui_state['positions_ts'] = positions, time.time()
+    return ui_state['positions']
+
+def cached_balance():
+    if account_stream.is_live() and "USDT" in account_stream.wallet: return account_stream.wallet["USDT"]
+    if ui_state['balance'] is None or time.time() - ui_state['balance_ts'] >= UI_FRESH_SECONDS:
+        ui_state['balance'], ui_state['balance_ts'] = BybitPrivate.get_balance(), time.time()
+    return ui_state['balance']
+
 # --- BYBIT API ---
 class BybitPrivate:
-    BASE_URL = "https://api.bybit.com"
+    BASE_URL = BASE_URL
     
     @staticmethod
     def send_signed(method, endpoint, payload={}):
         try:
-            ts = str(int(time.time() * 1000)); recv_window = "5000"
-            if method == "GET": param_str = urllib.parse.urlencode(payload); sign_str = ts+API_KEY+recv_window+param_str
-            else: param_str = json.dumps(payload); sign_str = ts+API_KEY+recv_window+param_str
-            signature = hmac.new(bytes(API_SECRET, "utf-8"), sign_str.encode("utf-8"), hashlib.sha256).hexdigest()
-            headers = {"X-BAPI-API-KEY": API_KEY, "X-BAPI-SIGN": signature, "X-BAPI-TIMESTAMP": ts, "X-BAPI-RECV-WINDOW": recv_window, "Content-Type": "application/json"}
+            param_str = urllib.parse.urlencode(payload) if method == "GET" else json.dumps(payload)
+            headers = bybit_headers(API_KEY, API_SECRET, param_str)
             url = f"{BybitPrivate.BASE_URL}{endpoint}"
-            if method == "GET": return requests.get(url, headers=headers, params=payload, timeout=5).json()
-            else: return requests.post(url, headers=headers, data=param_str, timeout=5).json()
+            kind = "order" if endpoint.startswith(ORDER_ENDPOINTS) else "private"
+            if method == "GET": res = transport.get(url, kind, headers=headers, params=payload).json()
+            else: res = transport.post(url, kind, headers=headers, data=param_str).json()
+            if res.get('retCode'): metrics.api_errors.inc(endpoint, str(res['retCode']))
+            return res
         except Exception as e: logging.error(f"API Error: {e}"); return None
 
     @staticmethod
@@ -199,26 +260,13 @@ class BybitPrivate:
         except: return 0.0
     
     @staticmethod
-    def get_closed_pnl_history():
-        try:
-            res = BybitPrivate.send_signed("GET", "/v5/position/closed-pnl", {"category": "linear", "limit": 50})
-            data = res['result']['list']
-            return data[::-1] if data else []
-        except: return []
-
-    @staticmethod
-    def get_today_pnl():
-        try:
-            start_time = int((time.time() - 86400) * 1000)
-            res = BybitPrivate.send_signed("GET", "/v5/position/closed-pnl", {"category": "linear", "limit": 50, "startTime": str(start_time)})
-            total = 0.0
-            for trade in res['result']['list']:
-                total += float(trade['closedPnl'])
-            return total
-        except: return 0.0
+    def closed_pnl_page(params):
+        res = BybitPrivate.send_signed("GET", "/v5/position/closed-pnl", params)
+        return res['result'] if res and res.get('retCode') == 0 else None
 
     @staticmethod
     def get_open_positions_details():
+        # -> {symbol: details} of open positions, None when the read failed
         try:
             r = BybitPrivate.send_signed("GET", "/v5/position/list", {"category": "linear", "settleCoin": "USDT"})
             positions = {}
@@ -226,46 +274,105 @@ class BybitPrivate:
                 if float(p['size']) > 0:
                     positions[p['symbol']] = {
                         "size": p['size'], 
+                        "side": p['side'],
                         "pnl": float(p['unrealisedPnl']),
                         "created": int(p['createdTime'])
                     }
             return positions
-        except: return {}
+        except: return None  # unknown, not flat: callers keep what they had
     
     @staticmethod
-    def close_position(symbol):
-        try:
-            res = BybitPrivate.send_signed("GET", "/v5/position/list", {"category": "linear", "symbol": symbol})
-            for p in res['result']['list']:
-                if float(p['size']) > 0:
-                    payload = {"category": "linear", "symbol": symbol, "side": "Buy" if p['side'] == "Sell" else "Sell", "orderType": "Market", "qty": p['size'], "reduceOnly": True}
-                    BybitPrivate.send_signed("POST", "/v5/order/create", payload)
-            return True
-        except: return False
+    def stop_prices(entry_price, side, atr_value, conf):
+        # -> (stop-loss, trailing activation price, trailing distance)
+        d = 1 if side == "Buy" else -1
+        return entry_price - d * atr_value * conf['sl_atr'], entry_price + d * atr_value * conf['trail_active_atr'], atr_value * conf['trail_cb_atr']
 
     @staticmethod
-    def set_trading_stop(symbol, entry_price, side, atr_value, conf):
-        sl_dist = atr_value * conf['sl_atr']
-        trail_active_dist = atr_value * conf['trail_active_atr']
-        trail_cb_dist = atr_value * conf['trail_cb_atr']
-
-        if side == "Buy":
-            sl_price = entry_price - sl_dist
-            activation_price = entry_price + trail_active_dist
-        else: 
-            sl_price = entry_price + sl_dist
-            activation_price = entry_price - trail_active_dist
-        
-        payload_sl = {"category": "linear", "symbol": symbol, "stopLoss": smart_round(sl_price), "positionIdx": 0}
-        payload_ts = {"category": "linear", "symbol": symbol, "activationPrice": smart_round(activation_price), "trailingStop": smart_round(trail_cb_dist), "positionIdx": 0}
-        
-        BybitPrivate.send_signed("POST", "/v5/position/trading-stop", payload_sl)
-        time.sleep(0.2)
-        BybitPrivate.send_signed("POST", "/v5/position/trading-stop", payload_ts)
-        logging.info(f"🛡️ PROTECTED {symbol}")
+    def set_trading_stop(symbol, entry_price, side, atr_value, conf, with_sl=True):
+        # One trading-stop call; with_sl=False when the stop-loss already rode in on the entry order
+        sl_price, active_price, trail_dist = BybitPrivate.stop_prices(entry_price, side, atr_value, conf)
+        payload = {"category": "linear", "symbol": symbol, "trailingStop": smart_round(trail_dist), "activePrice": smart_round(active_price), "positionIdx": 0}
+        if with_sl: payload["stopLoss"] = smart_round(sl_price)
+        res = BybitPrivate.send_signed("POST", "/v5/position/trading-stop", payload)
+        ok = bool(res and res.get('retCode') == 0)
+        if not ok: logging.warning(f"⚠️ TRAILING STOP failed for {symbol}: {res.get('retMsg') if res else 'no response'}")
+        return ok
 
     @staticmethod
-    def place_order(symbol, side, price, atr_value, conf, multiplier=1.0, data_log=None):
+    def ensure_leverage(symbol):
+        lev = str(live_settings['LEVERAGE'])
+        if leverage_cache.get(symbol) == lev: return
+        res = BybitPrivate.send_signed("POST", "/v5/position/set-leverage", {"category":"linear","symbol":symbol,"buyLeverage":lev,"sellLeverage":lev})
+        if res and res.get('retCode') in (0, 110043): leverage_cache[symbol] = lev # 110043: already at this leverage
+
+    @staticmethod
+    def confirm_fill(symbol, order_id, qty, timeout=3.0):
+        # Average fill price from the private stream's execution event, else by polling the order; None if unconfirmed
+        deadline = time.time() + timeout
+        if account_stream.is_live():
+            fill = account_stream.wait_fill(order_id, qty, min(1.0, timeout))
+            if fill: return fill['value'] / fill['qty']
+        delay = 0.05
+        while time.time() < deadline:
+            res = BybitPrivate.send_signed("GET", "/v5/order/realtime", {"category": "linear", "symbol": symbol, "orderId": order_id})
+            rows = (res or {}).get('result', {}).get('list') or []
+            status = rows[0].get('orderStatus') if rows else None
+            if status == "Filled": return float(rows[0].get('avgPrice') or 0) or None
+            if status in ("Cancelled", "Rejected", "Deactivated"): return None
+            time.sleep(delay); delay = min(delay * 2, 0.4)
+        return None
+
+    @staticmethod
+    def create_batch(legs, retry=False):
+        # legs: /v5/order/create payloads without "category". Chunks of BATCH_SIZE go to /v5/order/create-batch in parallel.
+        # -> one {"symbol", "ok", "orderId", "code", "msg"} per leg, in input order. Per-leg rejections are final; with
+        # retry=True, legs whose whole batch call failed are resent once as single orders (only safe for reduce-only legs).
+        def send(chunk):
+            res = BybitPrivate.send_signed("POST", "/v5/order/create-batch", {"category": "linear", "request": chunk})
+            if not res or res.get('retCode') != 0:
+                code, msg = (res.get('retCode'), res.get('retMsg')) if res else (None, "no response")
+                return [{"symbol": l['symbol'], "ok": False, "orderId": None, "code": code, "msg": msg, "sent": False} for l in chunk]
+            rows = res['result'].get('list') or []
+            codes = (res.get('retExtInfo') or {}).get('list') or []
+            out = []
+            for i, l in enumerate(chunk):
+                row = rows[i] if i < len(rows) else {}
+                c = codes[i] if i < len(codes) else {"code": None, "msg": "missing leg"}
+                out.append({"symbol": l['symbol'], "ok": c.get('code') == 0 and bool(row.get('orderId')), "orderId": row.get('orderId') or None,
+                            "code": c.get('code'), "msg": c.get('msg'), "sent": True})
+            return out
+
+        def single(leg):
+            res = BybitPrivate.send_signed("POST", "/v5/order/create", {"category": "linear", **leg})
+            ok = bool(res and res.get('retCode') == 0)
+            return {"symbol": leg['symbol'], "ok": ok, "orderId": res['result'].get('orderId') if ok else None,
+                    "code": res.get('retCode') if res else None, "msg": res.get('retMsg') if res else "no response", "sent": True}
+
+        if not legs: return []
+        chunks = [legs[i:i + BATCH_SIZE] for i in range(0, len(legs), BATCH_SIZE)]
+        results = [r for part in order_pool.map(send, chunks) for r in part]
+        redo = [i for i, r in enumerate(results) if not r['sent']] if retry else []
+        for i, r in zip(redo, order_pool.map(single, [legs[i] for i in redo])): results[i] = r
+        for r in results:
+            if not r['ok']: logging.warning(f"⚠️ ORDER LEG failed for {r['symbol']}: {r['code']} {r['msg']}")
+        return results
+
+    @staticmethod
+    def close_positions(symbols=None, book=None):
+        # Flatten `symbols` (None = everything) with reduce-only market legs in one batch round trip -> {symbol: ok}.
+        # Sizes come from `book`, else the private stream when live, else one position list call.
+        if book is None: book = (account_stream.position_details() if account_stream.is_live() else BybitPrivate.get_open_positions_details()) or {}
+        targets = [s for s, p in book.items() if (symbols is None or s in symbols) and p.get('side') and float(p['size']) > 0]
+        legs = [{"symbol": s, "side": "Buy" if book[s]['side'] == "Sell" else "Sell", "orderType": "Market", "qty": str(book[s]['size']), "reduceOnly": True}
+                for s in targets]
+        return {r['symbol']: r['ok'] for r in BybitPrivate.create_batch(legs, retry=True)}
+
+    @staticmethod
+    def close_position(symbol):
+        return BybitPrivate.close_positions([symbol]).get(symbol, False)
+
+    @staticmethod
+    def order_qty(price, multiplier=1.0):
         sentiment_mult = 1.0
         val = fear_greed_index['value']
         if val < 20: sentiment_mult = 1.25 
@@ -274,132 +381,257 @@ class BybitPrivate:
         final_risk = live_settings['RISK_PER_TRADE'] * multiplier * sentiment_mult
         qty_calc = (final_risk * live_settings['LEVERAGE']) / price
         
-        if price > 100: qty = round(qty_calc, 3)
-        elif price > 1: qty = round(qty_calc, 1)
-        else: qty = int(qty_calc)
+        if price > 100: return round(qty_calc, 3)
+        elif price > 1: return round(qty_calc, 1)
+        return int(qty_calc)
 
-        BybitPrivate.send_signed("POST", "/v5/position/set-leverage", {"category":"linear","symbol":symbol,"buyLeverage":str(live_settings['LEVERAGE']),"sellLeverage":str(live_settings['LEVERAGE'])})
-        payload = {"category": "linear", "symbol": symbol, "side": side, "orderType": "Market", "qty": str(qty)}
-        res = BybitPrivate.send_signed("POST", "/v5/order/create", payload)
-        
-        if res and res.get('retCode') == 0:
-            time.sleep(2) 
-            BybitPrivate.set_trading_stop(symbol, price, side, atr_value, conf)
-            if data_log:
-                log_trade_entry(symbol, data_log['mode'], side, data_log['rsi'], data_log['adx'], data_log['atr'], data_log['trend'], price)
-            return True
-        return False
+    @staticmethod
+    def place_orders(entries):
+        # entries: [{"symbol", "side", "price", "atr", "conf", "mult", "log"}] -> [placed] in the same order.
+        # Leverage checks run in parallel, every entry goes out in one create-batch with its hard stop-loss attached
+        # (so no position is ever open unprotected), then each filled leg gets its fill confirmed and trailing stop set in parallel.
+        t_start = time.time()
+        jobs = []
+        for i, e in enumerate(entries):
+            qty = BybitPrivate.order_qty(e['price'], e.get('mult', 1.0))
+            if qty <= 0: logging.warning(f"⚠️ {e['symbol']} size rounds to zero, skipped"); continue
+            sl_price = BybitPrivate.stop_prices(e['price'], e['side'], e['atr'], e['conf'])[0]
+            jobs.append((i, e, qty, {"symbol": e['symbol'], "side": e['side'], "orderType": "Market", "qty": str(qty),
+                                     "stopLoss": smart_round(sl_price), "slTriggerBy": "MarkPrice", "tpslMode": "Full"}))
+        placed = [False] * len(entries)
+        if not jobs: return placed
+        list(order_pool.map(BybitPrivate.ensure_leverage, [e['symbol'] for _, e, _, _ in jobs]))
+        results = BybitPrivate.create_batch([leg for *_, leg in jobs])
+        t_ack = time.time()
+
+        def protect(job):
+            # The order is live whatever happens here: a failing step is logged and the leg still counts as placed
+            (i, e, qty, _), r = job
+            signal_ts = (e.get('log') or {}).get('signal_ts') or t_start
+            fill, t_fill = None, time.time()
+            try:
+                fill = BybitPrivate.confirm_fill(e['symbol'], r['orderId'], qty)
+                t_fill = time.time()
+                BybitPrivate.set_trading_stop(e['symbol'], fill or e['price'], e['side'], e['atr'], e['conf'], with_sl=False)
+                t_trail = time.time()
+                metrics.entry_seconds.observe(t_ack - signal_ts, "signal_to_protected")
+                metrics.entry_seconds.observe(t_fill - t_ack, "fill_confirm")
+                metrics.entry_seconds.observe(t_trail - signal_ts, "signal_to_trailing")
+                logging.info(f"🛡️ PROTECTED {e['symbol']} in {(t_ack - signal_ts) * 1000:.0f}ms, trailing after {(t_trail - signal_ts) * 1000:.0f}ms" + ("" if fill else " (fill unconfirmed)"))
+            except Exception as ex: logging.error(f"⚠️ {e['symbol']} fill confirm / trailing stop failed (hard SL is on): {ex}")
+            try:
+                d = e.get('log')
+                if fill: trade_store.record_fill(e['symbol'], r['orderId'], e['side'], fill, qty, t_fill)
+                if d: log_trade_entry(e['symbol'], d['mode'], e['side'], d['rsi'], d['adx'], d['atr'], d['trend'], fill or e['price'], qty, r['orderId'])
+            except Exception as ex: logging.error(f"⚠️ {e['symbol']} entry journal failed: {ex}")
+            return i
+
+        for i in order_pool.map(protect, [(j, r) for j, r in zip(jobs, results) if r['ok']]): placed[i] = True
+        return placed
+
+    @staticmethod
+    def place_order(symbol, side, price, atr_value, conf, multiplier=1.0, data_log=None):
+        return BybitPrivate.place_orders([{"symbol": symbol, "side": side, "price": price, "atr": atr_value, "conf": conf, "mult": multiplier, "log": data_log}])[0]
 
     @staticmethod
     def kill_all():
-        BybitPrivate.send_signed("POST", "/v5/order/cancel-all", {"category": "linear", "settleCoin": "USDT"})
-        res = BybitPrivate.send_signed("GET", "/v5/position/list", {"category": "linear", "settleCoin": "USDT"})
-        for p in res['result']['list']:
-            if float(p['size']) > 0:
-                payload = {"category": "linear", "symbol": p['symbol'], "side": "Buy" if p['side'] == "Sell" else "Sell", "orderType": "Market", "qty": p['size'], "reduceOnly": True}
-                BybitPrivate.send_signed("POST", "/v5/order/create", payload)
-        return True
+        # Cancel-all and a fresh position snapshot go out together, then the whole book is flattened in one batch -> {symbol: ok}
+        t0 = time.time()
+        cancel = order_pool.submit(BybitPrivate.send_signed, "POST", "/v5/order/cancel-all", {"category": "linear", "settleCoin": "USDT"})
+        book = order_pool.submit(BybitPrivate.get_open_positions_details)
+        closed = BybitPrivate.close_positions(book=book.result() or (account_stream.position_details() if account_stream.is_live() else {}))
+        cancel.result()
+        logging.info(f"☢️ KILL ALL: {sum(closed.values())}/{len(closed)} positions closed in {(time.time() - t0) * 1000:.0f}ms")
+        return closed
 
 # --- MARKET SELECTOR ---
+# The ranking itself lives in universe_ranker, kept current tick by tick from the public stream; the REST ticker list
+# re-seeds it on start, every 4h (new listings) and whenever the stream is down.
 class MarketSelector:
+    universe = [] # every USDT linear symbol seen in the last ranking
+    version = -1  # universe_ranker.version the target lists were taken from
+
     @staticmethod
     def refresh_lists():
-        global SCALP_TARGETS, SWING_TARGETS
         logging.info("🧠 SMART ENGINE: Analyzing Market...")
         try:
-            url = "https://api.bybit.com/v5/market/tickers?category=linear"
-            res = requests.get(url, timeout=5).json()
-            valid = [t for t in res['result']['list'] if t['symbol'].endswith('USDT') and 'USDC' not in t['symbol']]
-            valid.sort(key=lambda x: float(x['turnover24h']), reverse=True)
-            top_40 = valid[:40]
-            
-            scored_coins = []
-            for t in top_40:
-                funding = float(t.get('fundingRate', 0))
-                if abs(funding) > live_settings['MAX_FUNDING_RATE']: continue 
-                
-                h = float(t['highPrice24h'])
-                l = float(t['lowPrice24h'])
-                volatility = (h - l) / l if l > 0 else 0
-                scored_coins.append({'s': t['symbol'], 'v': volatility})
-            
-            scored_coins.sort(key=lambda x: x['v'], reverse=True)
-            SCALP_TARGETS = [x['s'] for x in scored_coins[:20]]
-            SWING_TARGETS = [x['s'] for x in scored_coins[20:]]
+            universe_ranker.set_max_funding(live_settings['MAX_FUNDING_RATE'])
+            universe_ranker.load(MarketSelector.fetch_tickers())
+            MarketSelector.universe = universe_ranker.symbols()
+            MarketSelector.apply()
             return True
         except:
             if not SCALP_TARGETS: SCALP_TARGETS[:], SWING_TARGETS[:] = ["SOLUSDT"], ["BTCUSDT"]
             return False
 
+    @staticmethod
+    def apply():
+        # Take the live ranking if it moved since the last call -> True when the target lists changed
+        global SCALP_TARGETS, SWING_TARGETS
+        universe_ranker.set_max_funding(live_settings['MAX_FUNDING_RATE'])
+        if not universe_ranker.seeded or universe_ranker.version == MarketSelector.version: return False
+        MarketSelector.version = universe_ranker.version
+        scalp, swing = universe_ranker.split()
+        moves, fmt = [], lambda syms: ",".join(sorted(syms)) if len(syms) <= 5 else f"{len(syms)} symbols"
+        for name, old, new in (("scalp", SCALP_TARGETS, scalp), ("swing", SWING_TARGETS, swing)):
+            added, gone = set(new) - set(old), set(old) - set(new)
+            if added: metrics.universe_changes.inc(name, "in", n=len(added)); moves.append(f"{name} +{fmt(added)}")
+            if gone: metrics.universe_changes.inc(name, "out", n=len(gone)); moves.append(f"{name} -{fmt(gone)}")
+        SCALP_TARGETS, SWING_TARGETS = scalp, swing
+        if moves: logging.info(f"🧠 UNIVERSE: {' | '.join(moves)}")
+        return bool(moves)
+
+    @staticmethod
+    def fetch_tickers():
+        # Full /v5/market/tickers list, from the hub when one is connected
+        if MARKET_HUB_SOCKET and market_stream.connected:
+            try: return market_stream.request("tickers")["list"]
+            except (ConnectionError, TimeoutError) as e: logging.warning(f"🛰️ HUB tickers unavailable, using REST: {e}")
+        return transport.get(f"{BASE_URL}/v5/market/tickers?category=linear").json()['result']['list']
+
+    @staticmethod
+    def tickers():
+        # Whole-universe ticker snapshot: the streamed copy when it covers the universe, else one REST call
+        if market_stream.is_live() and len(market_stream.tickers) >= 0.9 * len(MarketSelector.universe):
+            return [t for t in market_stream.ticker_list() if 'symbol' in t]
+        tickers = MarketSelector.fetch_tickers()
+        universe_ranker.load(tickers)
+        return [t for t in tickers if universe_ranker.eligible(t['symbol'])]
+
+    @staticmethod
+    def screen(now):
+        # Funnel stage one -> (scalp symbols, swing symbols) worth a full indicator pass. Ranked symbols keep their
+        # list; the rest are scalped when their 24h range would make the scalp list.
+        picked = funnel.screen(MarketSelector.tickers(), global_btc_trend, live_settings['ADX_THRESHOLD'], live_settings['MAX_FUNDING_RATE'], now,
+                               allowed=lambda s: can_enter(s, now), free={s for s, _ in stream_keys()} if market_stream.is_live() else (), budget=int(live_settings['FUNNEL_BUDGET']))
+        cut, scalp, swing = universe_ranker.scalp_cut(), [], []
+        for s, rng in picked:
+            (swing if s in SWING_TARGETS or (s not in SCALP_TARGETS and not rng >= cut) else scalp).append(s)
+        for stage in ("universe", "passed", "picked"): metrics.funnel_symbols.set(funnel.last[stage], stage)
+        for reason, n in funnel.last['rejected'].items():
+            if n: metrics.funnel_rejects.inc(reason, n=n)
+        logging.info(funnel.summary())
+        return scalp, swing
+
 # --- EXPERT ENGINE (GOD MODE) ---
 class ExpertEngine:
     @staticmethod
     def check_btc_trend():
+        if MARKET_HUB_SOCKET and market_stream.reachable(): return market_stream.state.get("btc", "NEUTRAL")
         try:
-            url = "https://api.bybit.com/v5/market/kline?category=linear&symbol=BTCUSDT&interval=60&limit=200"
-            res = requests.get(url, timeout=3).json()
-            df = pd.DataFrame(res['result']['list'][::-1], columns=['ts','o','h','l','c','v','t'])
-            df['c'] = pd.to_numeric(df['c'])
+            df = candle_store.frame("BTCUSDT", "60")
             return "BULL" if df['c'].iloc[-1] > ta.ema(df['c'], length=200).iloc[-1] else "BEAR"
         except: return "NEUTRAL"
     
     @staticmethod
     def get_trend_only(symbol, interval):
         try:
-            url = f"https://api.bybit.com/v5/market/kline?category=linear&symbol={symbol}&interval={interval}&limit=50"
-            res = requests.get(url, timeout=3).json()
-            df = pd.DataFrame(res['result']['list'][::-1], columns=['ts','o','h','l','c','v','t'])
-            df['c'] = pd.to_numeric(df['c'])
+            df = candle_store.frame(symbol, interval, last=50)
             ema = ta.ema(df['c'], length=50).iloc[-1]
             price = df['c'].iloc[-1]
             return "BULL" if price > ema else "BEAR"
         except: return "NEUTRAL"
 
     @staticmethod
-    def get_market_info(symbol, interval):
+    def fetch_klines(symbol, interval, limit=200):
+        if MARKET_HUB_SOCKET and market_stream.connected:
+            try: return market_stream.klines(symbol, interval, limit)
+            except (ConnectionError, TimeoutError) as e: logging.warning(f"🛰️ HUB klines unavailable, using REST: {e}")
+        url = f"{BASE_URL}/v5/market/kline?category=linear&symbol={symbol}&interval={interval}&limit={limit}"
+        res = transport.get(url).json()
+        if res.get('retCode') != 0:
+            metrics.api_errors.inc("/v5/market/kline", str(res.get('retCode')))
+            raise RuntimeError(f"retCode {res.get('retCode')} {res.get('retMsg')}")
+        return res['result']['list'][::-1]
+
+    @staticmethod
+    def fetch_many(jobs):
+        # Fan-out: every (symbol, interval) download runs at once on a bounded pool
+        results, errors = {}, {}
+        if not jobs: return results, errors
+        workers = max(1, min(int(live_settings['SCAN_WORKERS']), len(jobs)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(candle_store.refresh, s, i): (s, i) for s, i in jobs}
+            for fut in as_completed(futures):
+                job = futures[fut]
+                try: results[job] = fut.result()
+                except Exception as e: errors[job] = str(e) or type(e).__name__
+        return results, errors
+
+    @staticmethod
+    def get_market_info(symbol, interval, ring=None):
         try:
-            url = f"https://api.bybit.com/v5/market/kline?category=linear&symbol={symbol}&interval={interval}&limit=200"
-            res = requests.get(url, timeout=3).json()
-            df = pd.DataFrame(res['result']['list'][::-1], columns=['ts','o','h','l','c','v','t'])
-            df[['h','l','c','v']] = df[['h','l','c','v']].apply(pd.to_numeric)
-            
-            adx = ta.adx(df['h'], df['l'], df['c'])['ADX_14'].iloc[-1]
-            rsi = ta.rsi(df['c'], length=14).iloc[-1]
-            ema200 = ta.ema(df['c'], length=200).iloc[-1]
-            macd = ta.macd(df['c'])
-            macd_h = macd['MACDh_12_26_9'].iloc[-1]
-            atr = ta.atr(df['h'], df['l'], df['c'], length=14).iloc[-1]
-            
-            vol_ma = ta.sma(df['v'], length=20).iloc[-1]
-            curr_vol = df['v'].iloc[-1]
-            vol_multiplier = 1.0
-            if curr_vol > (vol_ma * 2.0): vol_multiplier = 1.5 
-            
-            price = df['c'].iloc[-1]
-            signal = "WAIT"
+            if ring is None: ring = candle_store.refresh(symbol, interval)
+            engine = indicator_engines.setdefault((symbol, str(interval)), IndicatorEngine())
+            vals = engine.sync(ring.view())
+            if vals is None or None in vals.values(): raise ValueError(f"only {ring.size} candles")
+            return market_info(vals, live_settings['ADX_THRESHOLD'], global_btc_trend)
+        except Exception as e:
+            logging.warning(f"⚠️ {symbol}/{interval} analysis failed: {e}")
+            return None
 
-            if adx > live_settings['ADX_THRESHOLD'] and curr_vol > vol_ma:
-                if (price > ema200) and (macd_h > 0) and (50 < rsi < 70) and global_btc_trend == "BULL":
-                    signal = "LONG"
-                elif (price < ema200) and (macd_h < 0) and (30 < rsi < 50) and global_btc_trend == "BEAR":
-                    signal = "SHORT"
-            
-            return {"adx": adx, "slope": signal, "price": price, "atr": atr, "vol_mult": vol_multiplier, "rsi": rsi}
-        except: return None
+    @staticmethod
+    def evaluate_all(rings):
+        # {(symbol, interval): ring} -> {(symbol, interval): market info}
+        if live_settings['EVAL_MODE'] != "batch":
+            return {(s, i): ExpertEngine.get_market_info(s, i, ring) for (s, i), ring in rings.items()}
+        out, by_interval = {}, {}
+        for (s, i), ring in rings.items(): by_interval.setdefault(i, []).append((s, ring.view()))
+        for i, items in by_interval.items():
+            table = signal_table([s for s, _ in items], [w for _, w in items], live_settings['ADX_THRESHOLD'], global_btc_trend)
+            for row in table:
+                if math.isnan(row['ema200']) or math.isnan(row['atr']):
+                    logging.warning(f"⚠️ {row['symbol']}/{i} analysis failed: not enough candles"); continue
+                out[(str(row['symbol']), i)] = {"adx": row['adx'], "slope": str(row['signal']), "price": row['price'], "atr": row['atr'], "vol_mult": row['vol_mult'], "rsi": row['rsi'], "ema200": row['ema200']}
+        return out
+
+# Shared by the scanner, HTF filter and BTC regime check: each (symbol, interval) is downloaded once, then topped up
+candle_store = CandleStore(ExpertEngine.fetch_klines, capacity=200, live_age=30)
+indicator_engines = {} # (symbol, interval) -> IndicatorEngine, fed only the candles closed since the last scan
+
+# --- LIVE MARKET DATA ---
+scan_wakeup = threading.Event() # set when a streamed candle closes
+universe_ranker = UniverseRanker(size=40, scalp=20, max_funding=live_settings['MAX_FUNDING_RATE'])
+funnel = Funnel()
+if MARKET_HUB_SOCKET: market_stream = HubClient(candle_store, MARKET_HUB_SOCKET, on_close=lambda s, i: scan_wakeup.set(), on_ticker=universe_ranker.update)
+else: market_stream = MarketStream(candle_store, WS_PUBLIC_URL, on_close=lambda s, i: scan_wakeup.set(), on_ticker=universe_ranker.update)
+account_stream = AccountStream(API_KEY, API_SECRET, WS_PRIVATE_URL, on_event=lambda e: scan_wakeup.set())
+pnl_sync = PnlSync(BybitPrivate.closed_pnl_page, PNL_WATERMARK_FILE)  # closed trades + rolling 24h/1h ledger
+
+shard_pool = None # ShardPool while SCAN_SHARDS > 0
+
+def get_shard_pool():
+    # (Re)build the worker pool when SCAN_SHARDS changes; None runs the scan in-process
+    global shard_pool
+    n = int(live_settings['SCAN_SHARDS'])
+    if shard_pool and len(shard_pool) != n: shard_pool.close(); shard_pool = None
+    if n > 0 and shard_pool is None:
+        shard_pool = ShardPool(n)
+        logging.info(f"🧩 Scan sharded over {n} worker processes")
+    return shard_pool
+
+def stream_keys():
+    keys = {(s, SCALP_CONF['interval']) for s in SCALP_TARGETS} | {(s, SWING_CONF['interval']) for s in SWING_TARGETS}
+    return keys | {(s, "60") for s in SCALP_TARGETS} | {("BTCUSDT", "60")}
 
 # --- TELEGRAM BOT ---
 class TelegramBot:
+    # Control commands run one at a time on their own lane, so a slow read never holds up /pause or /kill
+    CONTROL = ("/pause", "/resume", "/kill", "/close", "/risk", "/adx", "/lev", "/limit", "/goal", "/unban")
+
     def __init__(self):
-        self.url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
+        self.url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}"
         self.offset = 0
+        self.control = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tg-control")
+        self.reads = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tg-read")
         self.refresh_ui()
 
     def refresh_ui(self):
-        requests.post(f"{self.url}/deleteMyCommands")
-        time.sleep(1)
+        # setMyCommands replaces the whole list, no need to delete first
         cmds = [
             {"command": "status", "description": "📊 Status"},
             {"command": "scan", "description": "🔍 Market Heatmap"},
+            {"command": "perf", "description": "⏱️ Loop Timings"},
             {"command": "report", "description": "📈 Daily PnL"},
             {"command": "risk", "description": "🎲 Set Risk ($)"},
             {"command": "adx", "description": "📉 Set ADX"},
@@ -415,10 +647,10 @@ class TelegramBot:
             {"command": "pause", "description": "🛑 STOP"},
             {"command": "kill", "description": "⚠️ KILL ALL"}
         ]
-        requests.post(f"{self.url}/setMyCommands", json={"commands": cmds})
+        transport.post(f"{self.url}/setMyCommands", "telegram", json={"commands": cmds})
 
     def send(self, msg):
-        requests.post(f"{self.url}/sendMessage", json={"chat_id": TARGET_CHAT_ID, "text": msg, "parse_mode": "Markdown"})
+        outbox.put(msg)
 
     def handle(self, text):
         global live_settings, blacklisted, loss_streak
@@ -433,8 +665,11 @@ class TelegramBot:
             else:
                 st = '🛑 PAUSED' if live_settings['GLOBAL_STOP'] else '🟢 LIVE'
             
-            self.send(f"🤖 **V60.00 SMART TRAIL + BREAKER**\nState: {st}\n🌍 BTC: **{global_btc_trend}**\n🧠 Mood: **{fear_greed_index['label']}** ({fear_greed_index['value']})\n📉 PnL: `${daily_pnl:.2f}`\n💰 Risk: `${live_settings['RISK_PER_TRADE']}`\n📈 WinRate: `{win_rate:.1f}%`")
+            self.send(f"🤖 **V60.00 SMART TRAIL + BREAKER**\nState: {st}\n🌍 BTC: **{global_btc_trend}**\n🧠 Mood: **{fear_greed_index['label']}** ({fear_greed_index['value']})\n📉 PnL: `${daily_pnl:.2f}`\n💰 Risk: `${live_settings['RISK_PER_TRADE']}`\n📈 WinRate: `{pnl_sync.win_rate():.1f}%`\n🔌 Net: `{transport.summary()}`")
         
+        elif cmd == "/perf":
+            self.send(metrics.summary() + (f"\n{shard_pool.summary()}" if shard_pool else ""))
+
         elif cmd == "/risk":
             if len(args) > 1:
                 try: 
@@ -520,7 +755,12 @@ class TelegramBot:
 
         elif cmd == "/report":
             color = "🟢" if daily_pnl >= 0 else "🔴"
-            self.send(f"📅 **DAILY REPORT**\n\nRealized PnL: {color} `${daily_pnl:.2f}`\n\nTarget: `${live_settings['DAILY_PROFIT_GOAL']}`\nStop: `${live_settings['DAILY_LOSS_LIMIT']}`")
+            msg = f"📅 **DAILY REPORT**\n\nRealized PnL: {color} `${daily_pnl:.2f}`\n\nTarget: `${live_settings['DAILY_PROFIT_GOAL']}`\nStop: `${live_settings['DAILY_LOSS_LIMIT']}`"
+            modes = trade_store.pnl_by("mode", time.time() - 86400)
+            if modes: msg += "\n\n**By mode (24h):**\n" + "\n".join(f"`{m:<6}` {n} trades | `${p:.2f}` | WR {w:.0f}%" for m, n, p, w in modes)
+            rates = trade_store.win_rates()
+            msg += "\n**Win rate:** " + " | ".join(f"{win // 86400}d {wr:.0f}% ({n})" for win, (n, _, wr) in rates.items())
+            self.send(msg)
 
         elif cmd == "/scan":
             if not scan_cache: self.send("⏳ Syncing..."); return
@@ -538,21 +778,15 @@ class TelegramBot:
             self.send(m)
 
         elif cmd == "/positions":
-            res = BybitPrivate.send_signed("GET", "/v5/position/list", {"category": "linear", "settleCoin": "USDT"})
-            try:
+            positions = cached_positions()
+            if not positions: self.send("🤷 **No open positions.**")
+            else:
                 msg = "📋 **OPEN POSITIONS:**\n"
-                has_pos = False
-                for p in res['result']['list']:
-                    if float(p['size']) > 0:
-                        has_pos = True
-                        pnl = float(p['unrealisedPnl'])
-                        msg += f"{'🟢' if pnl>=0 else '🔴'} **{p['symbol']}** | PnL: `${pnl:.2f}`\n"
-                if not has_pos: self.send("🤷 **No open positions.**")
-                else: self.send(msg)
-            except: self.send("❌ Error")
+                for s, p in positions.items(): msg += f"{'🟢' if p['pnl']>=0 else '🔴'} **{s}** | PnL: `${p['pnl']:.2f}`\n"
+                self.send(msg)
 
         elif cmd == "/balance":
-            bal = BybitPrivate.get_balance()
+            bal = cached_balance()
             self.send(f"💰 Balance: `${bal:.2f}`\nTrades: {len(active_symbols)}/{live_settings['MAX_OPEN_POSITIONS']}")
 
         elif cmd == "/pause":
@@ -562,188 +796,328 @@ class TelegramBot:
             live_settings['GLOBAL_STOP'] = False; live_settings['PAUSE_UNTIL'] = 0; save_settings(); self.send("🟢 **LIVE**")
 
         elif cmd == "/kill":
-            self.send("⚠️ **KILLING ALL...**"); BybitPrivate.kill_all(); self.send("✅ Done.")
+            self.send("⚠️ **KILLING ALL...**")
+            failed = [sym for sym, ok in BybitPrivate.kill_all().items() if not ok]
+            self.send(f"❌ Failed to close: {', '.join(failed)}" if failed else "✅ Done.")
 
     def poll(self):
         while True:
             try:
-                r = requests.get(f"{self.url}/getUpdates?offset={self.offset}&timeout=10", timeout=15).json()
+                r = transport.get(f"{self.url}/getUpdates?offset={self.offset}&timeout=10", "telegram_poll").json()
                 for u in r.get("result", []):
                     self.offset = u["update_id"] + 1
-                    if "message" in u and "text" in u["message"]: self.handle(u["message"]["text"])
+                    if "message" in u and "text" in u["message"]: self.dispatch(u["message"]["text"])
             except: time.sleep(2)
 
+    def dispatch(self, text):
+        cmd = text.split()[0].lower() if text.split() else ""
+        if cmd in self.CONTROL: self.control.submit(self.run, text, False)
+        else: self.reads.submit(self.run, text, True)
+
+    def run(self, text, read):
+        try:
+            if not read: self.handle(text); return
+            with limiter.priority(UI): self.handle(text)  # any exchange calls a read makes queue behind trading traffic
+        except Exception as e: logging.error(f"Command Error ({text}): {e}")
+
 # --- PORTFOLIO LOOP ---
-def scanner_loop():
-    global scan_cache, active_symbols, global_btc_trend, last_trade_time, last_entry_time, last_market_update, daily_pnl, processed_trades
-    init_csv()
+def can_enter(symbol, now):
+    if symbol in active_symbols: return False
+    if symbol in blacklisted and now < blacklisted[symbol]: return False
+    if now - last_trade_time.get(symbol, 0) < (COOLDOWN_MINUTES * 60): return False
+    return len(active_symbols) < live_settings['MAX_OPEN_POSITIONS']
+
+def sync_closed_trades(bot_ui, now, notify=True):
+    # Applies every closed-pnl record since the watermark -> symbols that closed
+    closed = set()
+    for last_trade in pnl_sync.poll(now):
+        oid = last_trade['orderId']
+        s = last_trade['symbol']
+        pnl = float(last_trade['closedPnl'])
+        exit_price = float(last_trade['avgExitPrice'])
+        ts = int(last_trade['updatedTime']) / 1000.0
+        closed.add(s)
+
+        log_trade_exit(s, exit_price, pnl, ts, oid)
+        adjust_risk_based_on_performance(now)
+            
+        if notify and now - ts < 900: 
+            msg = f"💰 **PROFIT:** {s} (+${pnl:.2f})" if pnl > 0 else f"☠️ **BLACKLISTED {s}**\nReason: Stop Loss."
+            bot_ui.send(f"{msg}")
+
+        if s not in active_symbols: 
+            if pnl < 0:
+                loss_streak[s] = loss_streak.get(s, 0) + 1
+                if loss_streak[s] >= 2:
+                    if s in pardoned_coins and (now - pardoned_coins[s] < 86400):
+                        if notify: bot_ui.send(f"🛡️ **PARDON SHIELD:** {s} had a loss, but is protected.")
+                    else:
+                        blacklisted[s] = now + 86400
+                    
+                # CHECK FOR CIRCUIT BREAKER TRIGGER (live closes only: the startup replay must not re-pause silently)
+                if notify and check_loss_circuit_breaker():
+                    bot_ui.send("⚡ **CIRCUIT BREAKER TRIGGERED**\n3 Losses in 60m. Pausing buys for 2 hours.")
+            else:
+                loss_streak[s] = 0
+    return closed
+
+# --- WARM START ---
+# Scanner state is snapshotted every minute (off the trading thread) and restored on start; the exchange stays the
+# source of truth for what is actually open.
+snapshotter = snapshot.Snapshotter(SNAPSHOT_FILE, every=60)
+
+def capture_state(state):
+    return {"entry_data_log": dict(entry_data_log), "loss_streak": dict(loss_streak), "blacklisted": dict(blacklisted),
+            "last_trade_time": dict(last_trade_time), "last_entry_time": dict(last_entry_time), "scan_cache": dict(scan_cache),
+            "targets": (list(SCALP_TARGETS), list(SWING_TARGETS), list(MarketSelector.universe)), "tickers": universe_ranker.dump(), "funnel": dict(funnel.known), "last_market_update": last_market_update,
+            "fear_greed_index": dict(fear_greed_index), "last_fng_update": state['last_fng_update'], "global_btc_trend": global_btc_trend,
+            "candles": candle_store.dump()}
+
+def restore_state(snap, state):
+    global scan_cache, SCALP_TARGETS, SWING_TARGETS, last_market_update, fear_greed_index, global_btc_trend
+    for d in ("loss_streak", "blacklisted", "last_trade_time", "last_entry_time"): globals()[d].update(snap[d])
+    for sym, ctx in snap["entry_data_log"].items(): entry_data_log.setdefault(sym, ctx)
+    scan_cache = snap["scan_cache"]
+    SCALP_TARGETS, SWING_TARGETS, MarketSelector.universe = (list(x) for x in snap["targets"])
+    universe_ranker.load(snap.get("tickers", [])); MarketSelector.version = universe_ranker.version
+    funnel.known.update(snap.get("funnel", {}))
+    last_market_update, fear_greed_index, global_btc_trend = snap["last_market_update"], snap["fear_greed_index"], snap["global_btc_trend"]
+    state['last_fng_update'] = snap["last_fng_update"]
+    candle_store.load(snap["candles"])
+
+def reconcile_state():
+    # Positions that closed while we were down lose their entry context; expired bans are dropped
+    global active_symbols
+    now = time.time()
+    for s in [s for s, until in blacklisted.items() if until <= now]: del blacklisted[s]
+    positions = BybitPrivate.get_open_positions_details()
+    if positions is None:
+        # Unknown is not flat: keep the restored book, the first scan pass resyncs active_symbols
+        logging.warning("⚠️ Position list unavailable, keeping the restored entry data"); return
+    for s in [s for s in entry_data_log if s not in positions]: del entry_data_log[s]
+    active_symbols = list(positions)
+
+def scanner_init(bot_ui):
+    global last_market_update
+    init_store()
     load_pardons() 
-    bot_ui = TelegramBot()
+    # pending_closes: symbol -> when the private stream saw it go flat
+    state = {"pending_closes": {}, "last_pnl_sync": time.time(), "last_fng_update": 0}
+
+    snap, saved_at = snapshot.load(SNAPSHOT_FILE, SNAPSHOT_MAX_AGE)
+    if snap:
+        restore_state(snap, state)
+        logging.info(f"♻️ WARM START from a {time.time() - saved_at:.0f}s old snapshot ({len(snap['candles'])} candle series)")
     
-    # Init Data
-    MarketSelector.refresh_lists()
-    fetch_fear_and_greed() 
-    last_market_update = time.time()
-    last_fng_update = time.time()
+    # Init Data (a warm start only redoes what has gone stale)
+    if MARKET_HUB_SOCKET: market_stream.start()  # connect first so tickers, klines and sentiment come from the hub
+    now = time.time()
+    if now - last_market_update > 14400:
+        MarketSelector.refresh_lists()
+        last_market_update = now
+    if now - state['last_fng_update'] > 14400:
+        fetch_fear_and_greed()
+        state['last_fng_update'] = now
+    if MARKET_HUB_SOCKET or live_settings['WS_MARKET_DATA']:
+        market_stream.set_universe(stream_keys(), MarketSelector.universe)
+        if not MARKET_HUB_SOCKET: market_stream.start()
     
-    # Init History
-    history = BybitPrivate.get_closed_pnl_history()
-    for trade in history:
-        oid = trade['orderId']
-        processed_trades.add(oid) 
-        s = trade['symbol']
-        pnl = float(trade['closedPnl'])
-        ts = int(trade['updatedTime']) / 1000.0
-        
-        if pnl < 0: loss_streak[s] = loss_streak.get(s, 0) + 1
-        else: loss_streak[s] = 0
-        
-        if loss_streak[s] >= 2:
-            if s in pardoned_coins and (time.time() - pardoned_coins[s] < 86400):
-                pass 
-            else:
-                blacklisted[s] = time.time() + 86400
-        
-        adjust_risk_based_on_performance(pnl) 
-
-    while True:
-        daily_pnl = BybitPrivate.get_today_pnl()
-        now = time.time()
-
-        # CHECK CIRCUIT BREAKER STATUS
-        if live_settings.get('PAUSE_UNTIL', 0) > now:
-            # We are in Circuit Breaker mode
-            time.sleep(30); continue
-
-        if not live_settings['GLOBAL_STOP']:
-            if daily_pnl <= live_settings['DAILY_LOSS_LIMIT']:
-                live_settings['GLOBAL_STOP'] = True; save_settings(); bot_ui.send(f"⛔ **CIRCUIT BREAKER**\nDaily Loss: `${daily_pnl:.2f}`")
-            if daily_pnl >= live_settings['DAILY_PROFIT_GOAL']:
-                live_settings['GLOBAL_STOP'] = True; save_settings(); bot_ui.send(f"🏆 **TARGET HIT**\nDaily Profit: `${daily_pnl:.2f}`")
-
-        # 4H: Refresh Market List
-        if now - last_market_update > 14400:
-            MarketSelector.refresh_lists()
-            last_market_update = now
-
-        # 4H: Refresh Internet Sentiment (Fear & Greed)
-        if now - last_fng_update > 14400:
-            fetch_fear_and_greed()
-            last_fng_update = now
-
-        global_btc_trend = ExpertEngine.check_btc_trend()
-        
-        # 1. UPDATE POSITIONS
-        current_positions = BybitPrivate.get_open_positions_details()
-        new_active = list(current_positions.keys())
-        
-        for s in active_symbols:
-            if s not in new_active:
-                last_trade_time[s] = now
-        
-        active_symbols = new_active
+    # Init History: catch up from the persisted watermark (or the last 24h on a first run)
+    sync_closed_trades(bot_ui, time.time(), notify=False)
+    if snap: reconcile_state()
+
+    if live_settings['WS_ACCOUNT_DATA']: account_stream.start()
+    return state
+
+IDLE_WAIT = {"paused": 30, "stopped": 5, "error": 10} # seconds before the next pass; a finished scan waits for a candle close (max 60s)
+
+def scan_iteration(bot_ui, state, wait=True):
+    # One pass of the portfolio loop. wait=False skips the idle wait after the pass so it can be timed on
+    # its own (e.g. against mock_exchange.py). Returns what the pass did.
+    lap = metrics.Laps()
+    result = scan_pass(bot_ui, state, lap)
+    lap.total(); metrics.iterations.inc(result)
+    snapshotter.maybe_save(lambda: capture_state(state))
+    if wait:
+        if result in IDLE_WAIT: time.sleep(IDLE_WAIT[result])
+        else: scan_wakeup.wait(60); scan_wakeup.clear()
+        lap("wait")
+    return result
+
+def scan_pass(bot_ui, state, lap):
+    global scan_cache, active_symbols, global_btc_trend, last_trade_time, last_entry_time, last_market_update, daily_pnl
+    pending_closes = state['pending_closes']
+    now = time.time()
+    daily_pnl = pnl_sync.daily_pnl(now)  # rolling 24h ledger, no exchange call
+    lap("pnl_sync")
+
+    # CHECK CIRCUIT BREAKER STATUS
+    if live_settings.get('PAUSE_UNTIL', 0) > now:
+        # We are in Circuit Breaker mode
+        return "paused"
+
+    if not live_settings['GLOBAL_STOP']:
+        if daily_pnl <= live_settings['DAILY_LOSS_LIMIT']:
+            live_settings['GLOBAL_STOP'] = True; save_settings(); bot_ui.send(f"⛔ **CIRCUIT BREAKER**\nDaily Loss: `${daily_pnl:.2f}`")
+        if daily_pnl >= live_settings['DAILY_PROFIT_GOAL']:
+            live_settings['GLOBAL_STOP'] = True; save_settings(); bot_ui.send(f"🏆 **TARGET HIT**\nDaily Profit: `${daily_pnl:.2f}`")
+
+    # Market List: live ranking from the ticker stream, full REST re-seed every 4H or while the stream is down
+    if now - last_market_update > 14400 or (not market_stream.is_live() and now - last_market_update > 300):
+        MarketSelector.refresh_lists()
+        market_stream.set_universe(stream_keys(), MarketSelector.universe)
+        last_market_update = now
+    elif MarketSelector.apply():
+        market_stream.set_universe(stream_keys(), MarketSelector.universe)
+
+    # 4H: Refresh Internet Sentiment (Fear & Greed)
+    if now - state['last_fng_update'] > 14400:
+        fetch_fear_and_greed()
+        state['last_fng_update'] = now
+
+    lap("refresh")
+    global_btc_trend = ExpertEngine.check_btc_trend()
+    lap("btc_trend")
+    
+    # 1. UPDATE POSITIONS
+    resync = False
+    for ev in account_stream.drain():
+        if ev['type'] == 'resync':
+            book = BybitPrivate.get_open_positions_details()
+            if book is not None: account_stream.seed(book); resync = True
+        elif ev['type'] == 'closed': pending_closes.setdefault(ev['symbol'], now)
+    stream_live = account_stream.is_live()
+    current_positions = account_stream.position_details() if stream_live else BybitPrivate.get_open_positions_details()
+    if current_positions is None: logging.warning("⚠️ Position list unavailable, skipping this pass"); return "error"
+    new_active = list(current_positions.keys())
+    ui_state['positions'], ui_state['positions_ts'] = current_positions, now
+    
+    for s in active_symbols:
+        if s not in new_active:
+            last_trade_time[s] = now
+    
+    active_symbols = new_active
+    lap("positions")
+    
+    # 2. DETECT CLOSED TRADES
+    # One forward read from the watermark covers every symbol. With the private stream up it only runs when a
+    # position went flat (plus a 5 minute safety net); without it, every pass.
+    if not stream_live or resync or pending_closes or now - state['last_pnl_sync'] > 300:
+        closed = sync_closed_trades(bot_ui, now)
+        state['last_pnl_sync'] = now
+        for s, t0 in list(pending_closes.items()):
+            if s in closed or now - t0 > 300: del pending_closes[s]
+        daily_pnl = pnl_sync.daily_pnl(now)
+    lap("closed_pnl")
+
+    # 3. ZOMBIE KILLER
+    now_ms = now * 1000
+    zombies = []
+    for s, details in current_positions.items():
+        if s in last_entry_time and (now - last_entry_time[s] < 3600):
+            continue
+        duration_hours = (now_ms - details['created']) / 3600000.0
+        if s in SCALP_TARGETS and duration_hours > live_settings['STALEMATE_HOURS']:
+            if details['pnl'] < 0.2:
+                bot_ui.send(f"🧟 **ZOMBIE KILLED:** {s}\nOpen for {duration_hours:.1f}h. Freed up slot.")
+                zombies.append(s)
+    if zombies: BybitPrivate.close_positions(zombies, book=current_positions)
+    lap("zombie")
+
+    if live_settings['GLOBAL_STOP']:
+        return "stopped"
         
-        # 2. DETECT CLOSED TRADES
-        time.sleep(2)
-        res = BybitPrivate.send_signed("GET", "/v5/position/closed-pnl", {"category": "linear", "limit": 10})
-        if res and res.get('result'):
-            for last_trade in res['result']['list']:
-                oid = last_trade['orderId']
-                if oid in processed_trades: continue 
-
-                processed_trades.add(oid) 
-                
-                s = last_trade['symbol']
-                pnl = float(last_trade['closedPnl'])
-                exit_price = float(last_trade['avgExitPrice'])
-                ts = int(last_trade['updatedTime']) / 1000.0
-                
-                log_trade_exit(s, exit_price, pnl)
-                adjust_risk_based_on_performance(pnl)
-                
-                if now - ts < 900: 
-                    msg = f"💰 **PROFIT:** {s} (+${pnl:.2f})" if pnl > 0 else f"☠️ **BLACKLISTED {s}**\nReason: Stop Loss."
-                    bot_ui.send(f"{msg}")
-
-                if s not in active_symbols: 
-                    if pnl < 0:
-                        loss_streak[s] = loss_streak.get(s, 0) + 1
-                        if loss_streak[s] >= 2:
-                            if s in pardoned_coins and (now - pardoned_coins[s] < 86400):
-                                bot_ui.send(f"🛡️ **PARDON SHIELD:** {s} had a loss, but is protected.")
-                            else:
-                                blacklisted[s] = now + 86400
-                        
-                        # CHECK FOR CIRCUIT BREAKER TRIGGER
-                        if check_loss_circuit_breaker():
-                            bot_ui.send("⚡ **CIRCUIT BREAKER TRIGGERED**\n3 Losses in 60m. Pausing buys for 2 hours.")
-                    else:
-                        loss_streak[s] = 0
-
-        # 3. ZOMBIE KILLER
-        now_ms = now * 1000
-        for s, details in current_positions.items():
-            if s in last_entry_time and (now - last_entry_time[s] < 3600):
-                continue
-            duration_hours = (now_ms - details['created']) / 3600000.0
-            if s in SCALP_TARGETS and duration_hours > live_settings['STALEMATE_HOURS']:
-                if details['pnl'] < 0.2:
-                    bot_ui.send(f"🧟 **ZOMBIE KILLED:** {s}\nOpen for {duration_hours:.1f}h. Freed up slot.")
-                    BybitPrivate.close_position(s)
-
-        if live_settings['GLOBAL_STOP']: time.sleep(5); continue
-            
-        try:
-            tmp = {}
-            for symbol in SCALP_TARGETS:
-                if symbol in active_symbols: continue
-                if symbol in blacklisted and now < blacklisted[symbol]: continue
-                if now - last_trade_time.get(symbol, 0) < (COOLDOWN_MINUTES * 60): continue
-                if len(active_symbols) >= live_settings['MAX_OPEN_POSITIONS']: continue
-
-                data = ExpertEngine.get_market_info(symbol, SCALP_CONF['interval'])
-                if data:
-                    tmp[symbol] = {**data, "mode": "SCALP"}
-                    if data['slope'] != "WAIT":
-                        htf_trend = ExpertEngine.get_trend_only(symbol, "60") 
-                        if data['slope'] == "LONG" and htf_trend == "BEAR": continue 
-                        if data['slope'] == "SHORT" and htf_trend == "BULL": continue 
-
-                        size_mult = data['vol_mult']
-                        
-                        trade_log = {"mode": "SCALP", "rsi": data['rsi'], "adx": data['adx'], "atr": data['atr'], "trend": htf_trend}
-                        
-                        if BybitPrivate.place_order(symbol, "Buy" if data['slope']=="LONG" else "Sell", data['price'], data['atr'], SCALP_CONF, size_mult, trade_log):
-                            last_entry_time[symbol] = now
-                            active_symbols.append(symbol) 
-                            boost_msg = "🔥 **GOD HAND (1.5x)**" if size_mult > 1 else ""
-                            bot_ui.send(f"⚡ **SCALP ENTRY:** {symbol}\nSig: {data['slope']} | {boost_msg}")
-
-            for symbol in SWING_TARGETS:
-                if symbol in active_symbols: continue
-                if symbol in blacklisted and now < blacklisted[symbol]: continue
-                if now - last_trade_time.get(symbol, 0) < (COOLDOWN_MINUTES * 60): continue
-                if len(active_symbols) >= live_settings['MAX_OPEN_POSITIONS']: continue
-
-                data = ExpertEngine.get_market_info(symbol, SWING_CONF['interval'])
-                if data:
-                    tmp[symbol] = {**data, "mode": "SWING"}
-                    if data['slope'] != "WAIT":
-                        trade_log = {"mode": "SWING", "rsi": data['rsi'], "adx": data['adx'], "atr": data['atr'], "trend": "SWING"}
-                        
-                        if BybitPrivate.place_order(symbol, "Buy" if data['slope']=="LONG" else "Sell", data['price'], data['atr'], SWING_CONF, 1.0, trade_log):
-                            last_entry_time[symbol] = now
-                            active_symbols.append(symbol) 
-                            bot_ui.send(f"🐢 **SWING ENTRY: {symbol}**\nSig: {data['slope']}")
-
-            scan_cache = tmp
-            logging.info(f"Scan Done. Active: {len(active_symbols)}")
-            time.sleep(60)
-        except Exception as e: logging.error(f"Scan Error: {e}"); time.sleep(10)
+    try:
+        # SCREEN STAGE: one ticker snapshot rules out most of the universe
+        if live_settings['FUNNEL']:
+            scalp_syms, swing_syms = MarketSelector.screen(now)
+        else:
+            scalp_syms = [s for s in SCALP_TARGETS if can_enter(s, now)]
+            swing_syms = [s for s in SWING_TARGETS if can_enter(s, now)]
+        lap("screen")
+
+        # FETCH STAGE: download every series this pass needs in one fan-out
+        jobs = [(s, SCALP_CONF['interval']) for s in scalp_syms] + [(s, SWING_CONF['interval']) for s in swing_syms]
+        t0 = time.time()
+        klines, errors = ExpertEngine.fetch_many(jobs)
+        if errors:
+            logging.warning(f"⚠️ KLINE FETCH FAILED {len(errors)}/{len(jobs)}: " + ", ".join(f"{s}/{i} ({e})" for (s, i), e in errors.items()))
+        logging.info(f"📥 Fetched {len(klines)}/{len(jobs)} series in {time.time() - t0:.2f}s")
+        lap("fetch")
+        pool = get_shard_pool()
+        if pool:
+            # Sharded: each worker gets only the bars it has not seen of its own symbols; only the records come back
+            t0 = time.time()
+            infos, errors = pool.evaluate({key: ring.view() for key, ring in klines.items()}, live_settings['ADX_THRESHOLD'], global_btc_trend)
+            if errors:
+                logging.warning(f"⚠️ SHARD SCAN FAILED {len(errors)}/{len(klines)}: " + ", ".join(f"{s}/{i} ({e})" for (s, i), e in list(errors.items())[:10]))
+            logging.info(f"🧩 Evaluated {len(infos)}/{len(klines)} series on {len(pool)} shards in {time.time() - t0:.2f}s")
+        else: infos = ExpertEngine.evaluate_all(klines)
+        signal_ts = time.time()
+        for (s, _), info in infos.items(): funnel.remember(s, info, now)
+        lap("evaluate")
+
+        tmp = {}
+        entries = []  # every entry this pass goes out in one batch after the swing loop
+        for symbol in scalp_syms:
+            if not can_enter(symbol, now): continue
+            data = infos.get((symbol, SCALP_CONF['interval']))
+            if data:
+                tmp[symbol] = {**data, "mode": "SCALP"}
+                if data['slope'] != "WAIT":
+                    metrics.signals.inc("SCALP", data['slope'])
+                    htf_trend = ExpertEngine.get_trend_only(symbol, "60") 
+                    if data['slope'] == "LONG" and htf_trend == "BEAR": continue 
+                    if data['slope'] == "SHORT" and htf_trend == "BULL": continue 
+
+                    size_mult = data['vol_mult']
+                    
+                    trade_log = {"mode": "SCALP", "rsi": data['rsi'], "adx": data['adx'], "atr": data['atr'], "trend": htf_trend, "signal_ts": signal_ts}
+                    
+                    boost_msg = "🔥 **GOD HAND (1.5x)**" if size_mult > 1 else ""
+                    entries.append({"symbol": symbol, "side": "Buy" if data['slope']=="LONG" else "Sell", "price": data['price'], "atr": data['atr'], "conf": SCALP_CONF,
+                                    "mult": size_mult, "log": trade_log, "msg": f"⚡ **SCALP ENTRY:** {symbol}\nSig: {data['slope']} | {boost_msg}"})
+                    active_symbols.append(symbol) # holds the slot so can_enter() counts it before the batch goes out
+        lap("scalp")
+
+        for symbol in swing_syms:
+            if not can_enter(symbol, now): continue
+            data = infos.get((symbol, SWING_CONF['interval']))
+            if data:
+                tmp[symbol] = {**data, "mode": "SWING"}
+                if data['slope'] != "WAIT":
+                    metrics.signals.inc("SWING", data['slope'])
+                    trade_log = {"mode": "SWING", "rsi": data['rsi'], "adx": data['adx'], "atr": data['atr'], "trend": "SWING", "signal_ts": signal_ts}
+                    
+                    entries.append({"symbol": symbol, "side": "Buy" if data['slope']=="LONG" else "Sell", "price": data['price'], "atr": data['atr'], "conf": SWING_CONF,
+                                    "mult": 1.0, "log": trade_log, "msg": f"🐢 **SWING ENTRY: {symbol}**\nSig: {data['slope']}"})
+                    active_symbols.append(symbol)
+        lap("swing")
+
+        if entries:
+            for e, placed in zip(entries, BybitPrivate.place_orders(entries)):
+                metrics.orders.inc(e['log']['mode'], "ok" if placed else "fail")
+                if placed:
+                    last_entry_time[e['symbol']] = now
+                    bot_ui.send(e['msg'])
+                else: active_symbols.remove(e['symbol'])
+            lap("orders")
+
+        scan_cache = tmp
+        logging.info(f"Scan Done. Active: {len(active_symbols)}")
+        return "scanned"
+    except Exception as e:
+        logging.error(f"Scan Error: {e}")
+        return "error"
+
+def scanner_loop(bot_ui):
+    state = scanner_init(bot_ui)
+    while True: scan_iteration(bot_ui, state)
 
 if __name__ == "__main__":
     print("🚀 BOT V60.00 SMART TRAIL + BREAKER STARTING...")
+    if live_settings['METRICS_PORT']: metrics.serve(int(live_settings['METRICS_PORT']))
     t_bot = TelegramBot()
     threading.Thread(target=t_bot.poll, daemon=True).start()
-    threading.Thread(target=scanner_loop, daemon=True).start()
+    threading.Thread(target=scanner_loop, args=(t_bot,), daemon=True).start()
     while True: time.sleep(1)
\ No newline at end of file
@@ -0,0 +1,149 @@
+import threading, time
+import numpy as np, pandas as pd
+
+COLUMNS = ['ts', 'o', 'h', 'l', 'c', 'v', 't']
+INTERVAL_MS = {"1": 60000, "3": 180000, "5": 300000, "15": 900000, "30": 1800000, "60": 3600000,
+               "120": 7200000, "240": 14400000, "360": 21600000, "720": 43200000, "D": 86400000, "W": 604800000}
+
+# --- RING BUFFER ---
+# Fixed-size OHLCV window. The newest slot is the still-forming candle. `lock` is the series lock CandleStore writes
+# under; readers (view, last_ts) take it too, so a scan never sees a window half-way through a streamed update.
+class CandleRing:
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, len(COLUMNS)))
+        self.head = 0   # slot of the oldest candle
+        self.size = 0
+        self.pushed_at = 0.0  # last WebSocket update
+        self.lock = threading.RLock()  # re-entrant: the store reads its own rings while holding it
+
+    def clear(self):
+        self.head = 0; self.size = 0
+
+    def append(self, row):
+        if self.size < self.capacity:
+            self.data[(self.head + self.size) % self.capacity] = row
+            self.size += 1
+        else:
+            self.data[self.head] = row
+            self.head = (self.head + 1) % self.capacity
+
+    def set_last(self, row):
+        self.data[(self.head + self.size - 1) % self.capacity] = row
+
+    def last_ts(self):
+        with self.lock: return int(self.data[(self.head + self.size - 1) % self.capacity][0]) if self.size else None
+
+    def view(self):
+        # Oldest -> newest copy of the filled part of the ring
+        with self.lock:
+            end = self.head + self.size
+            if end <= self.capacity: return self.data[self.head:end].copy()
+            return np.concatenate((self.data[self.head:], self.data[:end - self.capacity]))
+
+    def frame(self, last=None):
+        arr = self.view()
+        if last: arr = arr[-last:]
+        return pd.DataFrame(arr, columns=COLUMNS)
+
+# --- CANDLE STORE ---
+# One ring per (symbol, interval). `fetch(symbol, interval, limit)` must return Bybit kline rows oldest -> newest.
+# After the first fill only the bars since the stored forming candle are downloaded.
+# Series kept current by push() (WebSocket) skip REST entirely while younger than `live_age` seconds.
+class CandleStore:
+    def __init__(self, fetch, capacity=200, live_age=0):
+        self.fetch = fetch
+        self.capacity = capacity
+        self.live_age = live_age
+        self.rings = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.stats = {"full": 0, "delta": 0, "gaps": 0, "bars": 0}
+
+    def _slot(self, symbol, interval):
+        key = (symbol, str(interval))
+        with self.lock:
+            if key not in self.rings:
+                self.rings[key] = CandleRing(self.capacity)
+                self.locks[key] = self.rings[key].lock
+            return self.rings[key], self.locks[key]
+
+    def get(self, symbol, interval):
+        return self.rings.get((symbol, str(interval)))
+
+    def drop(self, symbol, interval):
+        with self.lock:
+            self.rings.pop((symbol, str(interval)), None); self.locks.pop((symbol, str(interval)), None)
+
+    def refresh(self, symbol, interval, force=False):
+        ring, lock = self._slot(symbol, interval)
+        with lock:
+            if not force and ring.size and time.time() - ring.pushed_at < self.live_age: return ring
+            step = INTERVAL_MS.get(str(interval))
+            if not ring.size or not step: self._reload(ring, symbol, interval)
+            else: self._catch_up(ring, symbol, interval, step)
+            return ring
+
+    def push(self, symbol, interval, row):
+        # One streamed candle (forming or just closed). False means it was not applied: the series needs a REST backfill
+        # first, or the candle is older than the newest one stored.
+        ring, lock = self._slot(symbol, interval)
+        step = INTERVAL_MS.get(str(interval))
+        with lock:
+            last_ts = ring.last_ts()
+            if last_ts is None or not step: return False
+            ts = int(row[0])
+            if ts == last_ts: ring.set_last(row)
+            elif ts == last_ts + step: ring.append(row)
+            else: return False
+            ring.pushed_at = time.time()
+            return True
+
+    def frame(self, symbol, interval, last=None):
+        return self.refresh(symbol, interval).frame(last)
+
+    def dump(self):
+        # (symbol, interval) -> oldest -> newest array, for snapshots
+        with self.lock: keys = list(self.rings)
+        out = {}
+        for key in keys:
+            with self.locks[key]:
+                if self.rings[key].size: out[key] = self.rings[key].view()
+        return out
+
+    def load(self, arrays):
+        # Refill rings from dump() output; they count as stale, so the next refresh() only fetches the bars since then
+        for (symbol, interval), arr in arrays.items():
+            ring, lock = self._slot(symbol, interval)
+            arr = arr[-self.capacity:]
+            with lock:
+                ring.data[:len(arr)] = arr; ring.head, ring.size, ring.pushed_at = 0, len(arr), 0.0
+
+    def _reload(self, ring, symbol, interval):
+        rows = self.fetch(symbol, interval, self.capacity)
+        ring.clear()
+        for r in rows: ring.append([float(x) for x in r])
+        self.stats["full"] += 1; self.stats["bars"] += len(rows)
+
+    def _catch_up(self, ring, symbol, interval, step):
+        last_ts = ring.last_ts()
+        missing = max(0, int(time.time() * 1000) // step * step - last_ts) // step
+        limit = missing + 2  # stored forming bar + one bar of overlap for the continuity check
+        while True:
+            if limit >= self.capacity: return self._reload(ring, symbol, interval)
+            rows = self.fetch(symbol, interval, limit)
+            if not rows: return
+            if int(rows[0][0]) <= last_ts: break
+            limit *= 2  # local clock behind the exchange: widen the window until it overlaps
+        self.stats["delta"] += 1; self.stats["bars"] += len(rows)
+        for r in rows:
+            ts = int(r[0])
+            if ts < last_ts: continue
+            row = [float(x) for x in r]
+            if ts == last_ts: ring.set_last(row)
+            elif ts == last_ts + step: ring.append(row)
+            else:
+                # Hole between stored and fresh candles: rebuild the window
+                self.stats["gaps"] += 1
+                return self._reload(ring, symbol, interval)
+            last_ts = ts
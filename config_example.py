@@ -9,3 +9,11 @@ RISK_PER_TRADE = 5.0
 MAX_POSITION_SIZE = 50.0
 ATR_MULTIPLIER_SL = 2.0
 ATR_MULTIPLIER_TP = 4.0
+
+# Optional: point the bot at a local mock_exchange.py (or set BYBIT_BASE_URL / TELEGRAM_API_URL in the environment)
+# BYBIT_BASE_URL = "http://127.0.0.1:8600"
+# TELEGRAM_API_URL = "http://127.0.0.1:8600"
+
+# Optional: share public market data between instances through one `python market_hub.py --socket <path>` process
+# (or set MARKET_HUB_SOCKET in the environment)
+# MARKET_HUB_SOCKET = "/tmp/market_hub.sock"
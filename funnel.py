@@ -0,0 +1,79 @@
+import numpy as np
+
+FIELDS = ("lastPrice", "highPrice24h", "lowPrice24h", "prevPrice1h", "turnover24h", "fundingRate")
+REASONS = ("turnover", "funding", "range", "regime", "levels", "adx", "ema", "rsi")
+RSI_BAND = {"BULL": (50.0, 70.0), "BEAR": (30.0, 50.0)}  # where signal_rule can fire LONG / SHORT
+
+def ticker_table(tickers):
+    # [ticker dict] -> (symbols, float matrix with one column per FIELDS entry, NaN where missing)
+    syms = [t["symbol"] for t in tickers]
+    X = np.array([[float(t.get(f) or "nan") for f in FIELDS] for t in tickers], dtype=float).reshape(len(tickers), len(FIELDS))
+    return syms, X
+
+# --- SCREENING FUNNEL ---
+# Stage one of the scan: the whole linear universe is checked at once with numpy using nothing but one ticker
+# snapshot plus what the last full evaluation of each symbol left behind (price, ADX, EMA200, RSI). A symbol is
+# dropped when it can't fire under signal_rule this pass: thin turnover, funding over the cap, a dead 24h range,
+# price pinned to the wrong end of its 24h range for the BTC regime, or (while its last evaluation is fresh)
+# ADX well under the threshold, price on the wrong side of EMA200, or RSI far outside the band with price barely
+# moved since. Survivors go to stage two (klines + indicators). Series the stream already keeps current are free;
+# symbols that need REST klines are capped at `budget` per pass, shared between fresh near-threshold symbols and a
+# longest-unseen-first sweep of everything else, so the whole universe is covered over the following passes.
+class Funnel:
+    def __init__(self, min_turnover=2e6, min_range=0.01, min_pos=0.15, adx_margin=5.0, ema_margin=0.01,
+                 rsi_margin=10.0, move_tol=0.01, max_age=900):
+        self.min_turnover, self.min_range, self.min_pos = min_turnover, min_range, min_pos
+        self.adx_margin, self.ema_margin, self.rsi_margin, self.move_tol, self.max_age = adx_margin, ema_margin, rsi_margin, move_tol, max_age
+        self.known = {}  # symbol -> (evaluated at, price, adx, ema200, rsi)
+        self.last = {"universe": 0, "passed": 0, "picked": 0, "rejected": dict.fromkeys(REASONS, 0)}
+
+    def remember(self, symbol, info, now):
+        self.known[symbol] = (now, info['price'], info['adx'], info['ema200'], info['rsi'])
+
+    def screen(self, tickers, btc_trend, adx_threshold, max_funding, now, allowed=None, free=(), budget=40):
+        # -> [(symbol, 24h range)] for stage two: fresh near-threshold symbols first, then the longest unseen
+        if allowed: tickers = [t for t in tickers if allowed(t["symbol"])]
+        syms, X = ticker_table(tickers)
+        last, hi, lo, p1h, turnover, funding = X.T
+        k = np.array([self.known.get(s, (np.nan,) * 5) for s in syms], dtype=float).reshape(len(syms), 5)
+        seen, k_price, k_adx, k_ema, k_rsi = k.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rng = (hi - lo) / lo
+            pos = (last - lo) / (hi - lo)
+            gap = (last - k_ema) / k_ema
+            moved = np.abs(last / k_price - 1)
+        fresh = now - seen < self.max_age  # NaN (never evaluated) -> False
+
+        bull, bear = btc_trend == "BULL", btc_trend == "BEAR"
+        lo_rsi, hi_rsi = RSI_BAND.get(btc_trend, (np.nan, np.nan))
+        rsi_off = np.maximum(lo_rsi - k_rsi, k_rsi - hi_rsi)
+        masks = {  # True = rejected; NaN inputs only reject where a value is required
+            "turnover": ~(turnover >= self.min_turnover),
+            "funding": np.abs(np.nan_to_num(funding)) > max_funding,
+            "range": ~(rng >= self.min_range),
+            "regime": np.full(len(syms), not (bull or bear)),
+            "levels": (pos < self.min_pos) if bull else (pos > 1 - self.min_pos),
+            "adx": fresh & (k_adx < adx_threshold - self.adx_margin),
+            "ema": fresh & ((gap < -self.ema_margin) if bull else (gap > self.ema_margin)),
+            "rsi": fresh & (moved < self.move_tol) & (rsi_off > self.rsi_margin),
+        }
+        keep = np.ones(len(syms), dtype=bool)
+        rejected = {}
+        for reason in REASONS:
+            hit = keep & masks[reason]
+            rejected[reason] = int(hit.sum()); keep &= ~hit
+
+        idx = np.flatnonzero(keep)
+        order = idx[np.lexsort((-np.nan_to_num(turnover[idx]), np.nan_to_num(seen[idx]), ~fresh[idx]))]
+        paid_hot = [i for i in order if fresh[i] and syms[i] not in free]
+        paid_cold = [i for i in order if not fresh[i] and syms[i] not in free]
+        # At least a third of the budget keeps sweeping unseen/stale symbols, or near-threshold ones would starve them
+        cold = paid_cold[:max(budget // 3, budget - len(paid_hot))]
+        chosen = set(paid_hot[:budget - len(cold)] + cold)
+        picked = [(syms[i], float(rng[i])) for i in order if syms[i] in free or i in chosen]
+        self.last = {"universe": len(syms), "passed": int(keep.sum()), "picked": len(picked), "rejected": rejected}
+        return picked
+
+    def summary(self):
+        r = ", ".join(f"{k} {v}" for k, v in self.last["rejected"].items() if v)
+        return f"🔻 FUNNEL: {self.last['universe']} -> {self.last['passed']} passed -> {self.last['picked']} evaluated ({r or 'none rejected'})"
@@ -0,0 +1,296 @@
+import math
+from collections import deque
+import numpy as np, pandas as pd, pandas_ta as ta
+from numba import njit, prange
+
+# --- STREAMING INDICATORS ---
+# Each indicator consumes one closed candle per update() in O(1). peek() returns the value the
+# forming candle would give without touching state. Recurrences and seeding follow pandas_ta
+# (EMA/ATR seeded with an SMA, RMA seeded with the first value), so over the same candle history
+# the values agree with pandas_ta to float rounding (checked to PARITY_TOL by `python indicators.py`).
+PARITY_TOL = 1e-6
+
+class _Smooth:
+    def __init__(self, length, alpha, presma):
+        self.n = length; self.alpha = alpha; self.presma = presma
+        self.value = None; self.seed_sum = 0.0; self.seed_cnt = 0
+
+    def step(self, x, commit=True):
+        if self.value is None:
+            if not self.presma:
+                if commit: self.value = x
+                return x
+            s, c = self.seed_sum + x, self.seed_cnt + 1
+            out = s / c if c == self.n else None
+            if commit: self.seed_sum, self.seed_cnt, self.value = s, c, out
+            return out
+        out = self.value + self.alpha * (x - self.value)
+        if commit: self.value = out
+        return out
+
+def EMA(length): return _Smooth(length, 2.0 / (length + 1), presma=True)
+def RMA(length, presma=False): return _Smooth(length, 1.0 / length, presma)
+
+class SMA:
+    def __init__(self, length):
+        self.n = length; self.window = deque(maxlen=length); self.total = 0.0
+
+    def step(self, x, commit=True):
+        total = self.total + x - (self.window[0] if len(self.window) == self.n else 0.0)
+        full = len(self.window) + 1 >= self.n
+        if commit:
+            self.window.append(x); self.total = total
+        return total / self.n if full else None
+
+class RSI:
+    def __init__(self, length=14):
+        self.gain = RMA(length); self.loss = RMA(length); self.prev = None
+
+    def step(self, c, commit=True):
+        if self.prev is None:
+            if commit: self.prev = c
+            return None
+        d = c - self.prev
+        g = self.gain.step(max(d, 0.0), commit); l = self.loss.step(max(-d, 0.0), commit)
+        if commit: self.prev = c
+        return 100.0 * g / (g + l) if g + l > 0 else math.nan
+
+class ATR:
+    def __init__(self, length=14):
+        self.rma = RMA(length, presma=True); self.prev = None
+
+    def step(self, h, l, c, commit=True):
+        tr = h - l if self.prev is None else max(h - l, abs(h - self.prev), abs(self.prev - l))
+        out = self.rma.step(tr, commit)
+        if commit: self.prev = c
+        return out
+
+class ADX:
+    # ta.adx scales +DM/-DM by the same ATR, which cancels out of DX; only its warm-up length matters
+    def __init__(self, length=14):
+        self.n = length; self.pos = RMA(length); self.neg = RMA(length); self.adx = RMA(length)
+        self.prev = None; self.count = 0
+
+    def step(self, h, l, commit=True):
+        out = None
+        if self.prev is not None:
+            up = h - self.prev[0]; dn = self.prev[1] - l
+            p = self.pos.step(up if (up > dn and up > 0) else 0.0, commit)
+            m = self.neg.step(dn if (dn > up and dn > 0) else 0.0, commit)
+            if self.count + 1 >= self.n and p + m > 0:
+                out = self.adx.step(100.0 * abs(p - m) / (p + m), commit)
+        if commit: self.prev = (h, l); self.count += 1
+        return out
+
+class MACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast); self.slow = EMA(slow); self.signal = EMA(signal)
+
+    def step(self, c, commit=True):
+        f = self.fast.step(c, commit); s = self.slow.step(c, commit)
+        if f is None or s is None: return None
+        sig = self.signal.step(f - s, commit)
+        return None if sig is None else (f - s) - sig
+
+# --- PER-SERIES ENGINE ---
+# Mirrors the indicator set of ExpertEngine.get_market_info for one (symbol, interval) series.
+class IndicatorEngine:
+    def __init__(self):
+        self.ema200 = EMA(200); self.rsi = RSI(14); self.atr = ATR(14); self.adx = ADX(14)
+        self.macd = MACD(12, 26, 9); self.vol = SMA(20); self.last_ts = None
+
+    def _step(self, h, l, c, v, commit):
+        return {"adx": self.adx.step(h, l, commit), "rsi": self.rsi.step(c, commit), "ema200": self.ema200.step(c, commit),
+                "macd_h": self.macd.step(c, commit), "atr": self.atr.step(h, l, c, commit), "vol_ma": self.vol.step(v, commit),
+                "price": c, "vol": v}
+
+    def update(self, ts, h, l, c, v):
+        self.last_ts = ts
+        return self._step(h, l, c, v, True)
+
+    def peek(self, h, l, c, v):
+        return self._step(h, l, c, v, False)
+
+    def seed(self, rows):
+        for r in rows: self.update(int(r[0]), r[2], r[3], r[4], r[5])
+
+    def sync(self, arr):
+        # arr: candle window oldest -> newest (CandleRing.view()); the last row is the forming candle
+        if len(arr) == 0: return None
+        if self.last_ts is None or self.last_ts < arr[0][0]:
+            self.__init__(); self.seed(arr[:-1])
+        else:
+            self.seed(arr[np.searchsorted(arr[:-1, 0], self.last_ts, side='right'):-1])
+        h, l, c, v = arr[-1][2], arr[-1][3], arr[-1][4], arr[-1][5]
+        return self.peek(h, l, c, v)
+
+# --- SIGNAL RULE ---
+def signal_rule(vals, adx_threshold, btc_trend):
+    adx, rsi, ema200, macd_h, vol_ma = vals['adx'], vals['rsi'], vals['ema200'], vals['macd_h'], vals['vol_ma']
+    price, curr_vol = vals['price'], vals['vol']
+    if adx > adx_threshold and curr_vol > vol_ma:
+        if (price > ema200) and (macd_h > 0) and (50 < rsi < 70) and btc_trend == "BULL": return "LONG"
+        if (price < ema200) and (macd_h < 0) and (30 < rsi < 50) and btc_trend == "BEAR": return "SHORT"
+    return "WAIT"
+
+def market_info(vals, adx_threshold, btc_trend):
+    # IndicatorEngine values -> the scanner's per-symbol record (vol_mult: 1.5x size on a 2x volume spike)
+    return {"adx": vals['adx'], "slope": signal_rule(vals, adx_threshold, btc_trend), "price": vals['price'], "atr": vals['atr'],
+            "vol_mult": 1.5 if vals['vol'] > vals['vol_ma'] * 2.0 else 1.0, "rsi": vals['rsi'], "ema200": vals['ema200']}
+
+# --- BATCH KERNEL ---
+# Same recurrences as the streaming classes, compiled with numba and run over a whole universe at once.
+# Inputs are 2-D (symbols x bars) float arrays, oldest -> newest; shorter histories are left-padded with NaN.
+# Output planes follow SERIES; values are NaN until an indicator has warmed up.
+SERIES = ("adx", "rsi", "ema200", "macd_h", "atr", "vol_ma")
+
+@njit(cache=True, inline='always')
+def _ema_step(val, ssum, cnt, x, n, alpha):
+    if cnt < n:
+        ssum += x; cnt += 1
+        return (ssum / n if cnt == n else np.nan), ssum, cnt
+    return val + alpha * (x - val), ssum, cnt
+
+@njit(cache=True, parallel=True)
+def _series_kernel(h, l, c, v, out):
+    n_sym, n_bars = c.shape
+    for k in prange(n_sym):
+        s0 = 0
+        while s0 < n_bars and np.isnan(c[k, s0]): s0 += 1
+        e200 = e12 = e26 = e9 = np.nan; s200 = s12 = s26 = s9 = 0.0; n200 = n12 = n26 = n9 = 0
+        ag = al = atr = dp = dm = adx = np.nan; tr_sum = 0.0; vol_sum = 0.0
+        for i in range(s0, n_bars):
+            j = i - s0
+            hi, lo, cl, vo = h[k, i], l[k, i], c[k, i], v[k, i]
+            # EMA200
+            e200, s200, n200 = _ema_step(e200, s200, n200, cl, 200, 2.0 / 201)
+            out[2, k, i] = e200
+            # MACD histogram
+            e12, s12, n12 = _ema_step(e12, s12, n12, cl, 12, 2.0 / 13)
+            e26, s26, n26 = _ema_step(e26, s26, n26, cl, 26, 2.0 / 27)
+            out[3, k, i] = np.nan
+            if n26 == 26:
+                m = e12 - e26
+                e9, s9, n9 = _ema_step(e9, s9, n9, m, 9, 0.2)
+                if n9 == 9: out[3, k, i] = m - e9
+            # Volume SMA20
+            vol_sum += vo
+            if j >= 20: vol_sum -= v[k, i - 20]
+            out[5, k, i] = vol_sum / 20 if j >= 19 else np.nan
+            # ATR14 (SMA seeded), RSI14, ADX14
+            if j == 0:
+                tr = hi - lo
+                out[0, k, i] = out[1, k, i] = np.nan
+            else:
+                pc = c[k, i - 1]
+                tr = max(hi - lo, abs(hi - pc), abs(pc - lo))
+                d = cl - pc
+                g = d if d > 0 else 0.0; ls = -d if d < 0 else 0.0
+                if j == 1: ag, al = g, ls
+                else: ag += (g - ag) / 14; al += (ls - al) / 14
+                out[1, k, i] = 100.0 * ag / (ag + al) if ag + al > 0 else np.nan
+                up = hi - h[k, i - 1]; dn = l[k, i - 1] - lo
+                p = up if (up > dn and up > 0) else 0.0
+                q = dn if (dn > up and dn > 0) else 0.0
+                if j == 1: dp, dm = p, q
+                else: dp += (p - dp) / 14; dm += (q - dm) / 14
+                out[0, k, i] = np.nan
+                if j >= 13 and dp + dm > 0:
+                    dx = 100.0 * abs(dp - dm) / (dp + dm)
+                    adx = dx if np.isnan(adx) else adx + (dx - adx) / 14
+                    out[0, k, i] = adx
+            if j < 14:
+                tr_sum += tr
+                if j == 13: atr = tr_sum / 14
+            else: atr += (tr - atr) / 14
+            out[4, k, i] = atr if j >= 13 else np.nan
+        for i in range(s0):
+            for f in range(6): out[f, k, i] = np.nan
+
+def batch_series(h, l, c, v):
+    out = np.empty((len(SERIES),) + c.shape)
+    _series_kernel(np.ascontiguousarray(h, dtype=np.float64), np.ascontiguousarray(l, dtype=np.float64),
+                   np.ascontiguousarray(c, dtype=np.float64), np.ascontiguousarray(v, dtype=np.float64), out)
+    return dict(zip(SERIES, out))
+
+def rule_codes(adx, rsi, ema200, macd_h, vol_ma, price, vol, adx_threshold, btc):
+    # Vectorised signal_rule: +1 LONG, -1 SHORT, 0 WAIT. `btc` is +1 BULL / -1 BEAR / 0 NEUTRAL (scalar or array).
+    with np.errstate(invalid='ignore'):
+        gate = (adx > adx_threshold) & (vol > vol_ma)
+        long_ = gate & (price > ema200) & (macd_h > 0) & (rsi > 50) & (rsi < 70) & (btc == 1)
+        short = gate & (price < ema200) & (macd_h < 0) & (rsi > 30) & (rsi < 50) & (btc == -1)
+    return long_.astype(np.int8) - short.astype(np.int8)
+
+def stack(windows, n_bars=None):
+    # Candle windows (CandleRing.view() arrays) -> right-aligned (symbols x bars) OHLCV planes
+    n_bars = n_bars or max(len(w) for w in windows)
+    planes = np.full((6, len(windows), n_bars), np.nan)
+    for k, w in enumerate(windows):
+        w = w[-n_bars:]
+        if len(w): planes[:, k, n_bars - len(w):] = w[:, 1:7].T
+    return planes
+
+SIGNAL_NAMES = np.array(["SHORT", "WAIT", "LONG"])
+TABLE_DTYPE = [("symbol", "U24"), ("adx", "f8"), ("rsi", "f8"), ("ema200", "f8"), ("macd_h", "f8"), ("atr", "f8"),
+               ("vol_ma", "f8"), ("price", "f8"), ("vol", "f8"), ("vol_mult", "f8"), ("signal", "U5")]
+
+def signal_table(symbols, windows, adx_threshold, btc_trend):
+    # One pass over the whole universe: last-bar indicator values + LONG/SHORT/WAIT per symbol
+    o, h, l, c, v, t = stack(windows)
+    s = {k: a[:, -1] for k, a in batch_series(h, l, c, v).items()}
+    price, vol = c[:, -1], v[:, -1]
+    btc = {"BULL": 1, "BEAR": -1}.get(btc_trend, 0)
+    codes = rule_codes(s['adx'], s['rsi'], s['ema200'], s['macd_h'], s['vol_ma'], price, vol, adx_threshold, btc)
+    table = np.empty(len(symbols), dtype=TABLE_DTYPE)
+    table["symbol"] = symbols
+    for k in SERIES: table[k] = s[k]
+    table["price"], table["vol"] = price, vol
+    with np.errstate(invalid='ignore'): table["vol_mult"] = np.where(vol > s['vol_ma'] * 2.0, 1.5, 1.0)
+    table["signal"] = SIGNAL_NAMES[codes + 1]
+    return table
+
+# --- PANDAS_TA REFERENCE ---
+def evaluate_frame(df):
+    return {"adx": ta.adx(df['h'], df['l'], df['c'])['ADX_14'].iloc[-1], "rsi": ta.rsi(df['c'], length=14).iloc[-1],
+            "ema200": ta.ema(df['c'], length=200).iloc[-1], "macd_h": ta.macd(df['c'])['MACDh_12_26_9'].iloc[-1],
+            "atr": ta.atr(df['h'], df['l'], df['c'], length=14).iloc[-1], "vol_ma": ta.sma(df['v'], length=20).iloc[-1],
+            "price": df['c'].iloc[-1], "vol": df['v'].iloc[-1]}
+
+def parity_error(arr):
+    # Largest relative gap between the streaming engine and pandas_ta over the same history
+    eng = IndicatorEngine(); worst = 0.0
+    for i in range(len(arr)):
+        got = eng.peek(*arr[i][2:6])
+        if i >= 250 and i % 25 == 0:
+            ref = evaluate_frame(pd.DataFrame(arr[:i + 1], columns=['ts', 'o', 'h', 'l', 'c', 'v', 't']))
+            for k, want in ref.items():
+                worst = max(worst, abs(got[k] - want) / max(abs(want), 1e-12))
+        eng.update(int(arr[i][0]), *arr[i][2:6])
+    return worst
+
+def synthetic_candles(n, seed=7, start=100.0, step_ms=900000):
+    rng = np.random.default_rng(seed)
+    c = start * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    o = np.concatenate(([start], c[:-1]))
+    h = np.maximum(o, c) * (1 + rng.uniform(0, 0.005, n)); l = np.minimum(o, c) * (1 - rng.uniform(0, 0.005, n))
+    v = rng.uniform(100, 1000, n)
+    return np.column_stack((np.arange(n) * step_ms, o, h, l, c, v, v * c))
+
+def batch_parity_error(arr):
+    # Same check for the numba kernel over one long series
+    o, h, l, c, v, t = stack([arr])
+    got = batch_series(h, l, c, v); worst = 0.0
+    for i in range(250, len(arr), 25):
+        ref = evaluate_frame(pd.DataFrame(arr[:i + 1], columns=['ts', 'o', 'h', 'l', 'c', 'v', 't']))
+        for k in SERIES: worst = max(worst, abs(got[k][0, i] - ref[k]) / max(abs(ref[k]), 1e-12))
+    return worst
+
+if __name__ == "__main__":
+    import time
+    candles = synthetic_candles(1000)
+    for name, err in (("streaming", parity_error(candles)), ("batch", batch_parity_error(candles))):
+        print(f"{'✅' if err < PARITY_TOL else '❌'} {name}: max relative error vs pandas_ta {err:.2e} (tolerance {PARITY_TOL:.0e})")
+    windows = [synthetic_candles(200, seed=i) for i in range(500)]
+    signal_table([f"S{i}" for i in range(500)], windows, 25.0, "BULL")  # JIT warm-up
+    t0 = time.perf_counter(); signal_table([f"S{i}" for i in range(500)], windows, 25.0, "BULL")
+    print(f"⏱️ batch signal table: 500 symbols x 200 bars in {(time.perf_counter() - t0) * 1000:.1f}ms")
@@ -0,0 +1,402 @@
+import argparse, asyncio, collections, itertools, json, logging, os, socket, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from candles import CandleStore, COLUMNS, INTERVAL_MS
+from market_stream import MarketStream, PUBLIC_URL
+
+SOCKET_PATH = os.path.join(os.getcwd(), "market_hub.sock")
+STATE_EVERY = 5          # seconds between state heartbeats (BTC trend, Fear & Greed, feed health)
+MAX_BUFFER = 8 << 20     # a client this far behind is dropped instead of buffering forever
+BTC_KEY = ("BTCUSDT", "60")
+BAR_GRACE = 2            # seconds after a bar boundary before polling for the closed bar (feed down)
+TICKERS_DOWN = 60        # seconds between ticker list polls while the feed is down (one bot's scan cadence)
+dumps = lambda msg: (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+
+# --- WIRE FORMAT ---
+# Newline-delimited JSON over a Unix socket.
+#   client -> hub  {"op": "sub", "klines": [[symbol, interval], ...], "tickers": bool}   (replaces the subscription)
+#                  {"op": "klines" | "tickers" | "state", "id": n, ...}                 (request -> {"id": n, ...})
+#   hub -> client  {"t": "k", "s", "i", "r": row}  candle update     {"t": "c", "s", "i"}  candle closed
+#                  {"t": "tk", "d": ticker delta}  {"t": "tks", "list": [...]}  ticker snapshot
+#                  {"t": "st", "btc", "fng", "ws", "ts"}  state heartbeat, and at once when the feed ("ws") goes up or down
+
+# --- HUB STORE ---
+# CandleStore that reports every streamed candle so the hub can fan it out, and serves a series refreshed over REST
+# in the last `reuse` seconds as it is, so the same request from N clients costs one download.
+class HubStore(CandleStore):
+    def __init__(self, fetch, on_push, **kw):
+        super().__init__(fetch, **kw)
+        self.on_push = on_push
+        self.served = {}  # (symbol, interval) -> last REST refresh
+
+    def push(self, symbol, interval, row):
+        ok = super().push(symbol, interval, row)
+        if ok: self.on_push(symbol, interval, row)
+        return ok
+
+    def rows(self, symbol, interval, reuse=0.0):
+        key = (symbol, str(interval))
+        if time.time() - self.served.get(key, 0) >= reuse:
+            self.refresh(symbol, interval); self.served[key] = time.time()
+        ring, lock = self._slot(symbol, interval)
+        with lock: return ring.view()
+
+# --- MARKET HUB ---
+# Owns all public market data for every bot instance on the host: one WebSocket feed for the union of what the
+# clients subscribed to, one ticker list, Fear & Greed and the BTC regime. Kline requests are answered from the hub's
+# own rings, so N instances cost the exchange the same as one. While the feed is down each subscribed series is polled
+# once per bar, just after its boundary, to publish the close (series no client has loaded yet wait for the first
+# request); the forming bar is only refreshed when a client asks for it, and then at most every `poll` seconds.
+class MarketHub:
+    def __init__(self, path=SOCKET_PATH, base_url="https://api.bybit.com", ws_url=PUBLIC_URL, poll=15.0):
+        from transport import Transport
+        self.path, self.base_url, self.poll = path, base_url, poll
+        self.transport = Transport(pool_size=16)
+        self.store = HubStore(self.fetch_klines, self._pushed, capacity=200, live_age=30)
+        self.stream = MarketStream(self.store, ws_url, on_close=self._closed, on_ticker=self._ticker)
+        self.clients = {}   # writer -> {"klines": {(symbol, interval)}, "tickers": bool}
+        self.tickers = {}
+        self.state = {"btc": "NEUTRAL", "fng": None}
+        self.polled = {}    # key -> bar start (ms) last polled for while the feed is down
+        self.inflight = {}  # key -> pending rows() future, shared by concurrent requests
+        self.stats = {"requests": 0, "published": 0, "dropped": 0}
+        self.pool = ThreadPoolExecutor(8, thread_name_prefix="hub-rest")
+        self.loop = None
+
+    # --- exchange side (REST) ---
+    def fetch_klines(self, symbol, interval, limit=200):
+        res = self.transport.get(f"{self.base_url}/v5/market/kline", params={"category": "linear", "symbol": symbol, "interval": interval, "limit": limit}).json()
+        if res.get('retCode') != 0: raise RuntimeError(f"retCode {res.get('retCode')} {res.get('retMsg')}")
+        return res['result']['list'][::-1]
+
+    def fetch_tickers(self):
+        tickers = self.transport.get(f"{self.base_url}/v5/market/tickers?category=linear").json()['result']['list']
+        return {t['symbol']: t for t in tickers if t['symbol'].endswith('USDT') and 'USDC' not in t['symbol']}
+
+    def fetch_sentiment(self):
+        data = self.transport.get("https://api.alternative.me/fng/", "sentiment").json()['data'][0]
+        return {"value": int(data['value']), "label": data['value_classification']}
+
+    def btc_trend(self):
+        import pandas_ta as ta
+        df = pd.DataFrame(self.store.rows(*BTC_KEY, reuse=60), columns=COLUMNS)
+        return "BULL" if df['c'].iloc[-1] > ta.ema(df['c'], length=200).iloc[-1] else "BEAR"
+
+    # --- feed callbacks (stream thread) ---
+    def _pushed(self, symbol, interval, row):
+        self.loop.call_soon_threadsafe(self._publish, (symbol, str(interval)), {"t": "k", "s": symbol, "i": str(interval), "r": list(row)})
+
+    def _closed(self, symbol, interval):
+        self.loop.call_soon_threadsafe(self._publish, (symbol, str(interval)), {"t": "c", "s": symbol, "i": str(interval)})
+
+    def _ticker(self, data):
+        self.loop.call_soon_threadsafe(self._apply_ticker, data)
+
+    # --- fan-out (event loop) ---
+    def _send(self, writer, msg):
+        if writer.transport.is_closing(): return
+        if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            logging.warning("🛰️ HUB: dropping a client that stopped reading"); self.stats["dropped"] += 1
+            writer.close(); return
+        writer.write(msg if isinstance(msg, bytes) else dumps(msg))
+
+    def _publish(self, key, msg):
+        line = dumps(msg)
+        for w, sub in list(self.clients.items()):
+            if key in sub["klines"]: self._send(w, line); self.stats["published"] += 1
+
+    def _apply_ticker(self, data):
+        self.tickers.setdefault(data["symbol"], {}).update(data)
+        line = dumps({"t": "tk", "d": data})
+        for w, sub in list(self.clients.items()):
+            if sub["tickers"]: self._send(w, line)
+
+    def _state_msg(self):
+        return {"t": "st", **self.state, "ws": self.stream.is_live(), "ts": time.time()}
+
+    def _resubscribe(self):
+        keys = set().union(*(sub["klines"] for sub in self.clients.values())) | {BTC_KEY}
+        self.stream.set_universe(keys, self.tickers if any(sub["tickers"] for sub in self.clients.values()) else ())
+
+    # --- clients ---
+    async def _serve(self, reader, writer):
+        self.clients[writer] = {"klines": set(), "tickers": False}
+        self._send(writer, self._state_msg())
+        try:
+            while line := await reader.readline():
+                msg = json.loads(line)
+                if msg.get("op") == "sub": self._subscribe(writer, msg)
+                else: asyncio.create_task(self._answer(writer, msg))
+        except (ConnectionError, ValueError) as e: logging.warning(f"🛰️ HUB client error: {e}")
+        finally:
+            self.clients.pop(writer, None); writer.close(); self._resubscribe()
+
+    def _subscribe(self, writer, msg):
+        sub = self.clients[writer]
+        sub["klines"], sub["tickers"] = {(s, str(i)) for s, i in msg.get("klines", [])}, bool(msg.get("tickers"))
+        self._resubscribe()
+        if sub["tickers"]: self._send(writer, {"t": "tks", "list": list(self.tickers.values())})
+
+    async def _answer(self, writer, msg):
+        self.stats["requests"] += 1
+        reply = {"id": msg.get("id")}
+        try:
+            if msg["op"] == "klines": reply["rows"] = (await self._rows(msg["symbol"], str(msg["interval"])))[-int(msg.get("limit", 200)):].tolist()
+            elif msg["op"] == "tickers": reply["list"] = list(self.tickers.values())
+            elif msg["op"] == "state": reply.update(self._state_msg(), stats=self.stats, clients=len(self.clients))
+            else: reply["error"] = f"unknown op {msg['op']}"
+        except Exception as e: reply["error"] = str(e) or type(e).__name__
+        self._send(writer, reply)
+
+    async def _rows(self, symbol, interval, reuse=None):
+        key = (symbol, interval)
+        if key not in self.inflight:
+            fut = self.inflight[key] = self.loop.run_in_executor(self.pool, self.store.rows, symbol, interval, self.poll if reuse is None else reuse)
+            fut.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(self.inflight[key])
+
+    # --- housekeeping ---
+    async def _rest_poll(self, key, bar_ms):
+        # Feed down: top the series up over REST (unless a client request already did since the bar opened) and
+        # publish what changed, closes included
+        ring = self.store.get(*key)
+        before = ring.last_ts() if ring else None
+        try: rows = (await self._rows(*key, reuse=time.time() - bar_ms / 1000 - BAR_GRACE))[-2:].tolist()
+        except Exception as e: logging.warning(f"🛰️ HUB poll {key[0]}/{key[1]} failed: {e}"); return
+        if before is not None and rows[-1][0] > before: self._publish(key, {"t": "c", "s": key[0], "i": key[1]})
+        for r in rows:
+            if before is None or r[0] >= before: self._publish(key, {"t": "k", "s": key[0], "i": key[1], "r": r})
+
+    async def _refresh_slow(self):
+        # Ticker list: new listings, and the whole list every TICKERS_DOWN seconds while the feed is down
+        try:
+            for s, t in (await self.loop.run_in_executor(self.pool, self.fetch_tickers)).items():
+                if self.stream.is_live() and s in self.tickers: continue
+                self._apply_ticker(t)
+        except Exception as e: logging.warning(f"🛰️ HUB tickers failed: {e}")
+        self._resubscribe()
+
+    async def _housekeeping(self):
+        last_state = last_btc = last_tickers = last_fng = 0.0
+        was_live = None
+        while True:
+            await asyncio.sleep(1)
+            now = time.time()
+            live = self.stream.is_live()
+            if live != was_live: was_live = live; last_state = 0.0  # clients switch to/from REST polling on this
+            if not live:
+                keys = set().union(*(sub["klines"] for sub in self.clients.values())) | {BTC_KEY}
+                bars = {k: int((now - BAR_GRACE) * 1000) // INTERVAL_MS.get(k[1], 60000) * INTERVAL_MS.get(k[1], 60000) for k in keys}
+                due = [k for k in keys if self.polled.get(k) != bars[k]]
+                for k in due: self.polled[k] = bars[k]
+                due = [k for k in due if (ring := self.store.get(*k)) and ring.size]  # nothing to close until a client loaded it
+                if due: await asyncio.gather(*(self._rest_poll(k, bars[k]) for k in due))
+            if now - last_tickers >= (14400 if live else TICKERS_DOWN): last_tickers = now; await self._refresh_slow()
+            if now - last_fng >= 14400:
+                last_fng = now
+                try: self.state["fng"] = await self.loop.run_in_executor(self.pool, self.fetch_sentiment)
+                except Exception as e: logging.warning(f"🛰️ HUB sentiment failed: {e}")
+            if now - last_btc >= 60:
+                last_btc = now
+                try: self.state["btc"] = await self.loop.run_in_executor(self.pool, self.btc_trend)
+                except Exception: self.state["btc"] = "NEUTRAL"
+            if now - last_state >= STATE_EVERY:
+                last_state = now
+                line = dumps(self._state_msg())
+                for w in list(self.clients): self._send(w, line)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        if os.path.exists(self.path): os.unlink(self.path)
+        await self._refresh_slow()
+        self.stream.start()
+        server = await asyncio.start_unix_server(self._serve, self.path, limit=4 << 20)
+        logging.info(f"🛰️ MARKET HUB on {self.path} ({len(self.tickers)} tickers)")
+        async with server: await asyncio.gather(server.serve_forever(), self._housekeeping())
+
+# --- CLIENT ---
+# Hub connection with MarketStream's interface (start / set_universe / is_live / tickers / on_close / on_ticker), so a
+# bot swaps one for the other. is_live() follows the hub's own exchange feed, as reported in its state messages;
+# reachable() only says the hub answers, which is enough for its BTC regime and Fear & Greed. Streamed candles go into the local CandleStore via push(); a push that doesn't fit
+# (gap, first sight) and every series after a reconnect are backfilled through the hub's klines request. Requests
+# block the calling thread. The reader thread only routes replies; pushes are applied in order on their own thread,
+# since store.push waits on a series lock that a refresh -- itself waiting for a reply -- may be holding.
+class HubClient:
+    def __init__(self, store, path=SOCKET_PATH, on_close=None, on_ticker=None, timeout=10.0):
+        self.store, self.path, self.timeout = store, path, timeout
+        self.on_close, self.on_ticker = on_close, on_ticker
+        self.tickers, self.state = {}, {}
+        self.kline_keys, self.ticker_syms = set(), set()
+        self.connected, self.last_msg, self.sock = False, 0.0, None
+        self.stats = {"connects": 0, "messages": 0, "closed": 0, "backfills": 0}
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.wlock = threading.Lock()
+        self.backfills = ThreadPoolExecutor(4, thread_name_prefix="hub-backfill")
+        self.applier = ThreadPoolExecutor(1, thread_name_prefix="hub-apply")
+        self.filling = set()  # series with a backfill queued, so a burst of pushes asks once
+        self.stopped = False
+        self.greeted = threading.Event()  # first state message received
+
+    def start(self, wait=2.0):
+        # Returns once the hub has sent its state (or `wait` seconds); a hub that isn't up yet is retried in the background
+        if self._connect(): logging.info(f"🛰️ HUB: connected to {self.path}")
+        threading.Thread(target=self._run, name="hub-client", daemon=True).start()
+        if self.connected: self.greeted.wait(wait)
+        return self
+
+    def stop(self):
+        self.stopped = True
+        if self.sock: self.sock.close()
+
+    def reachable(self, max_silence=STATE_EVERY * 3):
+        return self.connected and time.time() - self.last_msg < max_silence
+
+    def is_live(self, max_silence=STATE_EVERY * 3):
+        return self.reachable(max_silence) and bool(self.state.get("ws"))
+
+    def set_universe(self, kline_keys, ticker_syms=()):
+        self.kline_keys = {(s, str(i)) for s, i in kline_keys}
+        self.ticker_syms = set(ticker_syms)
+        if self.connected: self._subscribe()
+
+    def ticker_list(self):
+        return list(self.tickers.values())
+
+    def klines(self, symbol, interval, limit=200):
+        return self.request("klines", symbol=symbol, interval=str(interval), limit=limit)["rows"]
+
+    def request(self, op, **kw):
+        if not self.connected: raise ConnectionError("market hub not connected")
+        rid = next(self.ids); box = [threading.Event(), None]
+        self.pending[rid] = box
+        try:
+            self._write({"op": op, "id": rid, **kw})
+            if not box[0].wait(self.timeout): raise TimeoutError(f"market hub: no answer to {op}")
+        finally: self.pending.pop(rid, None)
+        if box[1] is None: raise ConnectionError("market hub connection lost")
+        if "error" in box[1]: raise RuntimeError(box[1]["error"])
+        return box[1]
+
+    def _write(self, msg):
+        with self.wlock: self.sock.sendall(dumps(msg))
+
+    def _subscribe(self):
+        try: self._write({"op": "sub", "klines": sorted(self.kline_keys), "tickers": bool(self.ticker_syms)})
+        except OSError: pass
+
+    def _connect(self):
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM); sock.connect(self.path)
+        except OSError: return False
+        self.sock, self.connected, self.last_msg = sock, True, time.time()
+        self.stats["connects"] += 1
+        self._subscribe()
+        if self.stats["connects"] > 1:
+            for key in self.kline_keys: self._backfill(*key)
+        return True
+
+    def _run(self):
+        backoff = 1
+        while not self.stopped:
+            if not self.connected and not self._connect():
+                time.sleep(backoff); backoff = min(backoff * 2, 30); continue
+            backoff = 1
+            try:
+                for line in self.sock.makefile("rb"):
+                    self.last_msg = time.time(); self.stats["messages"] += 1
+                    self._handle(json.loads(line))
+            except (OSError, ValueError) as e: logging.warning(f"🛰️ HUB connection error: {e}")
+            self.connected = False
+            for box in list(self.pending.values()): box[0].set()
+            if not self.stopped: logging.warning("🛰️ HUB disconnected, reconnecting")
+
+    def _backfill(self, symbol, interval):
+        if self.store is None or (symbol, interval) in self.filling: return
+        self.filling.add((symbol, interval)); self.stats["backfills"] += 1
+        self.backfills.submit(self._refresh, symbol, interval)
+
+    def _refresh(self, symbol, interval):
+        try: self.store.refresh(symbol, interval, force=True)
+        except Exception as e: logging.warning(f"🛰️ HUB backfill {symbol}/{interval} failed: {e}")
+        finally: self.filling.discard((symbol, interval))
+
+    def _handle(self, msg):
+        if "id" in msg:
+            box = self.pending.get(msg["id"])
+            if box: box[1] = msg; box[0].set()
+            return
+        self.applier.submit(self._apply, msg)
+
+    def _apply(self, msg):
+        try: self._dispatch(msg)
+        except Exception as e: logging.warning(f"🛰️ HUB message {msg.get('t')} failed: {e}")
+
+    def _dispatch(self, msg):
+        t = msg.get("t")
+        if t == "k":
+            if self.store is not None and (msg["s"], msg["i"]) in self.kline_keys and not self.store.push(msg["s"], msg["i"], msg["r"]):
+                self._backfill(msg["s"], msg["i"])
+        elif t == "c":
+            self.stats["closed"] += 1
+            if self.on_close: self.on_close(msg["s"], msg["i"])
+        elif t in ("tk", "tks"):
+            for d in ([msg["d"]] if t == "tk" else msg["list"]):
+                self.tickers.setdefault(d["symbol"], {}).update(d)
+                if self.on_ticker: self.on_ticker(d)
+        elif t == "st": self.state = msg; self.greeted.set()
+
+# --- SELF-TEST ---
+# `python market_hub.py --selftest` runs a hub on market_stream's local stand-in feed with canned REST data and
+# connects several clients: every client's candles must follow the stream and close events must reach all of them,
+# while the hub's REST downloads stay the same whatever the number of clients. Then the hub's feed is stopped: the
+# clients must stop reporting live within a few seconds while the hub stays reachable.
+def selftest(clients=3, seconds=5, port=8766, step=60000):
+    from market_stream import standin_server
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    feed = asyncio.run_coroutine_threadsafe(standin_server(port, step), loop).result()
+    calls = collections.Counter()
+
+    class StandinHub(MarketHub):
+        def fetch_klines(self, symbol, interval, limit=200):
+            calls[(symbol, interval)] += 1; last = feed["bar"]
+            return [[str(last - (limit - 1 - i) * step), "100", "100", "100", "100", "1", "100"] for i in range(limit)]
+        def fetch_tickers(self):
+            calls["tickers"] += 1; return {s: {"symbol": s, "lastPrice": "100"} for s in ("BTCUSDT", "ETHUSDT")}
+        def fetch_sentiment(self): return {"value": 50, "label": "Neutral"}
+
+    path = os.path.join(tempfile.mkdtemp(), "hub.sock")
+    hub = StandinHub(path, ws_url=f"ws://127.0.0.1:{port}/")
+    threading.Thread(target=asyncio.run, args=(hub.run(),), daemon=True).start()
+    while not os.path.exists(path): time.sleep(0.05)
+    keys, bots, closes = [("ETHUSDT", "1"), ("SOLUSDT", "1")], [], collections.Counter()
+    for k in range(clients):
+        bot = HubClient(None, path, on_close=lambda s, i, k=k: closes.update([k]))
+        bot.store = CandleStore(bot.klines, capacity=50, live_age=30)
+        bot.start(); bot.set_universe(keys, ["ETHUSDT"])
+        for key in keys: bot.store.refresh(*key)
+        bots.append(bot)
+    time.sleep(seconds)
+    lag = max(feed["bar"] - bot.store.get(*key).last_ts() for bot in bots for key in keys)
+    ok = lag <= step and len(closes) == clients and all(bot.is_live() and bot.tickers for bot in bots) and all(calls[key] <= 2 for key in keys)
+    t0 = time.time(); hub.stream.stop()
+    while any(bot.is_live() for bot in bots) and time.time() - t0 < 5: time.sleep(0.1)
+    down = time.time() - t0
+    ok = ok and not any(bot.is_live() for bot in bots) and all(bot.reachable() for bot in bots)
+    print(f"{'✅' if ok else '❌'} {clients} clients: lag={lag // step} bars, closes={dict(closes)}, "
+          f"hub REST klines={[calls[key] for key in keys]} tickers={calls['tickers']}, backfills={[bot.stats['backfills'] for bot in bots]}, "
+          f"feed loss seen in {down:.1f}s")
+    return ok
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Shared public market-data hub for bot instances on this host")
+    ap.add_argument("--socket", default=os.environ.get("MARKET_HUB_SOCKET") or SOCKET_PATH)
+    ap.add_argument("--base-url", default=os.environ.get("BYBIT_BASE_URL") or "https://api.bybit.com")
+    ap.add_argument("--ws-url", default=os.environ.get("BYBIT_WS_PUBLIC_URL") or PUBLIC_URL)
+    ap.add_argument("--poll", type=float, default=15.0, help="seconds a REST-refreshed forming bar is reused for client requests")
+    ap.add_argument("--selftest", type=int, nargs="?", const=3, metavar="CLIENTS", help="run against a local stand-in feed and exit")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.selftest: raise SystemExit(0 if selftest(args.selftest) else 1)
+    asyncio.run(MarketHub(args.socket, args.base_url, args.ws_url, args.poll).run())
@@ -0,0 +1,210 @@
+import asyncio, json, logging, threading, time
+import aiohttp
+
+PUBLIC_URL = "wss://stream.bybit.com/v5/public/linear"
+SUB_CHUNK = 10      # topics per subscribe request
+PING_EVERY = 20     # Bybit drops public connections without a ping for ~30s
+
+# --- STREAM BASE ---
+# One Bybit v5 WebSocket on its own asyncio thread: reconnect with backoff, ping, and a 1s keeper tick.
+class BybitStream:
+    def __init__(self, url):
+        self.url = url
+        self.connected = False
+        self.last_msg = 0.0
+        self.stats = {"connects": 0, "messages": 0}
+        self.loop = None
+        self.ws = None
+        self.stopped = False
+
+    def start(self):
+        threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        if self.loop and self.ws: asyncio.run_coroutine_threadsafe(self.ws.close(), self.loop)
+
+    def is_live(self, max_silence=30):
+        return self.connected and time.time() - self.last_msg < max_silence
+
+    async def _on_connect(self): pass
+    async def _tick(self): pass
+    def _handle(self, msg): pass
+
+    async def _run(self):
+        self.loop = asyncio.get_running_loop()
+        backoff = 1
+        async with aiohttp.ClientSession() as session:
+            while not self.stopped:
+                try:
+                    async with session.ws_connect(self.url, heartbeat=None, receive_timeout=PING_EVERY * 2) as ws:
+                        self.ws = ws; self.last_msg = time.time(); backoff = 1
+                        self.stats["connects"] += 1
+                        await self._on_connect()
+                        self.connected = True
+                        keeper = asyncio.create_task(self._keeper())
+                        try:
+                            async for msg in ws:
+                                if msg.type == aiohttp.WSMsgType.TEXT:
+                                    self.last_msg = time.time(); self.stats["messages"] += 1
+                                    self._handle(json.loads(msg.data))
+                                elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR): break
+                        finally: keeper.cancel()
+                except Exception as e:
+                    logging.warning(f"📡 STREAM error ({self.url}): {e}")
+                self.connected = False; self.ws = None
+                if self.stopped: break
+                await asyncio.sleep(backoff); backoff = min(backoff * 2, 30)
+
+    async def _keeper(self):
+        last_ping = time.time()
+        while True:
+            await asyncio.sleep(1)
+            await self._tick()
+            if time.time() - last_ping >= PING_EVERY:
+                await self.ws.send_json({"op": "ping"}); last_ping = time.time()
+
+    async def _send_ops(self, op, topics):
+        topics = sorted(topics)
+        for n in range(0, len(topics), SUB_CHUNK):
+            await self.ws.send_json({"op": op, "args": topics[n:n + SUB_CHUNK]})
+
+# --- PUBLIC MARKET STREAM ---
+# Bybit v5 public linear feed (kline.<interval>.<symbol>, tickers.<symbol>).
+# Candles go straight into a CandleStore; after a reconnect or a hole in the stream the affected
+# series are backfilled over REST (store.refresh(force=True)). `on_close(symbol, interval)` fires when
+# a candle is confirmed so the scanner can evaluate it immediately; `on_ticker(data)` gets every ticker
+# snapshot/delta as it arrives.
+class MarketStream(BybitStream):
+    def __init__(self, store, url=PUBLIC_URL, on_close=None, on_ticker=None):
+        super().__init__(url)
+        self.store = store
+        self.on_close, self.on_ticker = on_close, on_ticker
+        self.tickers = {}
+        self.kline_keys = set()      # wanted (symbol, interval)
+        self.ticker_syms = set()     # wanted ticker symbols
+        self.subscribed = set()      # topics live on the current connection
+        self.filling = set()         # series with a backfill in flight, so a burst of failed pushes refreshes once
+        self.stats.update({"closed": 0, "backfills": 0})
+        self.lock = threading.Lock()
+
+    def set_universe(self, kline_keys, ticker_syms=()):
+        with self.lock:
+            self.kline_keys = {(s, str(i)) for s, i in kline_keys}
+            self.ticker_syms = set(ticker_syms)
+
+    def ticker_list(self):
+        return list(self.tickers.values())
+
+    def _wanted(self):
+        with self.lock:
+            return {f"kline.{i}.{s}" for s, i in self.kline_keys} | {f"tickers.{s}" for s in self.ticker_syms}
+
+    async def _on_connect(self):
+        self.subscribed = self._wanted()
+        await self._send_ops("subscribe", self.subscribed)
+        logging.info(f"📡 STREAM: connected, {len(self.subscribed)} topics")
+        if self.stats["connects"] > 1: self._backfill(k for k in self.kline_keys)
+
+    async def _tick(self):
+        # Apply universe changes on the open connection
+        wanted = self._wanted()
+        if wanted != self.subscribed:
+            gone, new = self.subscribed - wanted, wanted - self.subscribed
+            if gone: await self._send_ops("unsubscribe", gone)
+            if new: await self._send_ops("subscribe", new)
+            self.subscribed = wanted
+            logging.info(f"📡 STREAM: resubscribed (+{len(new)} / -{len(gone)})")
+            self._backfill((t.split(".")[2], t.split(".")[1]) for t in new if t.startswith("kline."))
+
+    def _backfill(self, keys):
+        for s, i in list(keys):
+            if (s, i) in self.filling: continue
+            self.filling.add((s, i)); self.stats["backfills"] += 1
+            self.loop.run_in_executor(None, self._refresh, s, i)
+
+    def _refresh(self, symbol, interval):
+        try: self.store.refresh(symbol, interval, force=True)
+        except Exception as e: logging.warning(f"📡 STREAM backfill {symbol}/{interval} failed: {e}")
+        finally: self.filling.discard((symbol, interval))
+
+    def _handle(self, msg):
+        topic = msg.get("topic", "")
+        if topic.startswith("kline."):
+            _, interval, symbol = topic.split(".", 2)
+            for k in msg.get("data", []):
+                row = [float(k["start"]), float(k["open"]), float(k["high"]), float(k["low"]), float(k["close"]), float(k["volume"]), float(k["turnover"])]
+                if not self.store.push(symbol, interval, row):
+                    self._backfill([(symbol, interval)]); continue
+                if k.get("confirm"):
+                    self.stats["closed"] += 1
+                    if self.on_close: self.on_close(symbol, interval)
+        elif topic.startswith("tickers."):
+            data = msg.get("data", {})
+            if msg.get("type") == "snapshot": self.tickers[data["symbol"]] = data
+            else: self.tickers.setdefault(data["symbol"], {}).update(data)
+            if self.on_ticker: self.on_ticker(data)
+
+# --- LOCAL STAND-IN ---
+# `python market_stream.py` serves synthetic klines/tickers on localhost, drops the connection once and
+# checks that the client reconnects, resubscribes, backfills and keeps the candle store in sync.
+async def standin_server(port, step_ms=60000, drop_after=None):
+    from aiohttp import web
+    state = {"price": 100.0, "bar": int(time.time() * 1000) // step_ms * step_ms, "served": 0}
+
+    async def handler(request):
+        ws = web.WebSocketResponse(); await ws.prepare(request)
+        topics = set(); state["served"] += 1
+        async def feed():
+            n = 0
+            while not ws.closed:
+                await asyncio.sleep(0.05); n += 1
+                state["price"] *= 1.0005
+                confirm = n % 10 == 0
+                for t in list(topics):
+                    kind, *rest = t.split(".")
+                    if kind == "kline":
+                        p = state["price"]
+                        k = {"start": state["bar"], "open": p, "high": p, "low": p, "close": p, "volume": 1, "turnover": p, "confirm": confirm}
+                        await ws.send_json({"topic": t, "type": "snapshot", "data": [k]})
+                    else:
+                        await ws.send_json({"topic": t, "type": "delta", "data": {"symbol": rest[0], "lastPrice": str(state["price"])}})
+                if confirm: state["bar"] += step_ms
+                if drop_after and state["served"] == 1 and n == drop_after: await ws.close()
+        task = asyncio.create_task(feed())
+        async for msg in ws:
+            req = json.loads(msg.data)
+            if req["op"] == "subscribe": topics.update(req["args"])
+            elif req["op"] == "unsubscribe": topics.difference_update(req["args"])
+            elif req["op"] == "ping": await ws.send_json({"op": "pong"})
+        task.cancel()
+        return ws
+
+    app = web.Application(); app.router.add_get("/", handler)
+    runner = web.AppRunner(app); await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return state
+
+if __name__ == "__main__":
+    from candles import CandleStore
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    port, step = 8765, 60000
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    state = asyncio.run_coroutine_threadsafe(standin_server(port, step, drop_after=25), loop).result()
+
+    def rest(symbol, interval, limit):
+        last = state["bar"]
+        return [[str(last - (limit - 1 - i) * step), "100", "100", "100", "100", "1", "100"] for i in range(limit)]
+
+    closes = []
+    store = CandleStore(rest, capacity=50, live_age=30)
+    store.refresh("BTCUSDT", "1")
+    ms = MarketStream(store, f"ws://127.0.0.1:{port}/", on_close=lambda s, i: closes.append((s, i))).start()
+    ms.set_universe([("BTCUSDT", "1")], ["BTCUSDT"])
+    time.sleep(2); ms.set_universe([("BTCUSDT", "1"), ("ETHUSDT", "1")], ["BTCUSDT"])
+    time.sleep(4)
+    ring = store.get("BTCUSDT", "1")
+    ok = ms.stats["connects"] >= 2 and len(closes) > 0 and ring.last_ts() >= state["bar"] - step and store.get("ETHUSDT", "1").size > 0
+    print(f"{'✅' if ok else '❌'} connects={ms.stats['connects']} closes={len(closes)} backfills={ms.stats['backfills']} tickers={len(ms.tickers)}")
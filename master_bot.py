@@ -1,5 +1,7 @@
-import threading, time, json, logging, os, requests, pandas as pd, pandas_ta as ta, datetime, hmac, hashlib, sys, urllib.parse
+import threading, time, json, logging, os, pandas as pd, pandas_ta as ta, datetime, hmac, hashlib, sys, urllib.parse
 import config 
+from transport import Transport, ORDER_ENDPOINTS
+from market_hub import HubClient
 
 # --- CONFIG ---
 API_KEY = config.API_KEY
@@ -9,9 +11,19 @@ TARGET_CHAT_ID = "1143478179"
 BASE_DIR = os.getcwd()
 SETTINGS_FILE = os.path.join(BASE_DIR, "live_settings.json")
 LOG_FILE = os.path.join(BASE_DIR, "bot_v33.log")
+# Endpoints can be pointed at mock_exchange.py (env vars win over config.py)
+BASE_URL = os.environ.get("BYBIT_BASE_URL") or getattr(config, "BYBIT_BASE_URL", "https://api.bybit.com")
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL") or getattr(config, "TELEGRAM_API_URL", "https://api.telegram.org")
+# Public market data from a shared market_hub.py process instead of the exchange
+MARKET_HUB_SOCKET = os.environ.get("MARKET_HUB_SOCKET") or getattr(config, "MARKET_HUB_SOCKET", None)
+
+# --- NETWORK ---
+# Every HTTP call goes through one pooled keep-alive transport (set HTTP2 = True in config.py to use httpx)
+transport = Transport(pool_size=32, http2=getattr(config, "HTTP2", False))
 
 # --- LOGGING ---
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", handlers=[logging.FileHandler(LOG_FILE), logging.StreamHandler(sys.stdout)])
+hub = HubClient(None, MARKET_HUB_SOCKET).start() if MARKET_HUB_SOCKET else None  # after logging is set up: start() logs
 
 # --- SETTINGS & STATE ---
 live_settings = {
@@ -37,6 +49,7 @@ COOLDOWN_MINUTES = 90
 scan_cache = {}
 active_symbols = []
 last_trade_time = {} # Tracks when a coin was last traded
+leverage_cache = {} # symbol -> leverage last confirmed by the exchange
 wallet_snapshot_24h = 0.0 
 global_btc_trend = "NEUTRAL" 
 
@@ -52,7 +65,7 @@ if os.path.exists(SETTINGS_FILE):
 
 # --- BYBIT API ---
 class BybitPrivate:
-    BASE_URL = "https://api.bybit.com"
+    BASE_URL = BASE_URL
     
     @staticmethod
     def send_signed(method, endpoint, payload={}):
@@ -63,8 +76,9 @@ class BybitPrivate:
             signature = hmac.new(bytes(API_SECRET, "utf-8"), sign_str.encode("utf-8"), hashlib.sha256).hexdigest()
             headers = {"X-BAPI-API-KEY": API_KEY, "X-BAPI-SIGN": signature, "X-BAPI-TIMESTAMP": ts, "X-BAPI-RECV-WINDOW": recv_window, "Content-Type": "application/json"}
             url = f"{BybitPrivate.BASE_URL}{endpoint}"
-            if method == "GET": return requests.get(url, headers=headers, params=payload, timeout=5).json()
-            else: return requests.post(url, headers=headers, data=param_str, timeout=5).json()
+            kind = "order" if endpoint.startswith(ORDER_ENDPOINTS) else "private"
+            if method == "GET": return transport.get(url, kind, headers=headers, params=payload).json()
+            else: return transport.post(url, kind, headers=headers, data=param_str).json()
         except Exception as e: logging.error(f"API Error: {e}"); return None
 
     @staticmethod
@@ -81,23 +95,32 @@ class BybitPrivate:
             return [p['symbol'] for p in r['result']['list'] if float(p['size']) > 0]
         except: return []
 
+    @staticmethod
+    def stop_prices(entry_price, side, atr_value, conf):
+        # -> (stop-loss, trailing activation price, trailing distance)
+        d = 1 if side == "Buy" else -1
+        return entry_price - d * atr_value * conf['sl_atr'], entry_price + d * atr_value * conf['trail_active_atr'], atr_value * conf['trail_cb_atr']
+
     @staticmethod
     def set_trading_stop(symbol, entry_price, side, atr_value, conf):
-        sl_dist = atr_value * conf['sl_atr']
-        trail_active_dist = atr_value * conf['trail_active_atr']
-        trail_cb_dist = atr_value * conf['trail_cb_atr']
-
-        if side == "Buy":
-            sl_price = entry_price - sl_dist
-            activation_price = entry_price + trail_active_dist
-        else: 
-            sl_price = entry_price + sl_dist
-            activation_price = entry_price - trail_active_dist
-        
-        BybitPrivate.send_signed("POST", "/v5/position/trading-stop", {"category": "linear", "symbol": symbol, "stopLoss": str(round(sl_price, 4)), "positionIdx": 0})
-        BybitPrivate.send_signed("POST", "/v5/position/trading-stop", {"category": "linear", "symbol": symbol, "activationPrice": str(round(activation_price, 4)), "trailingStop": str(round(trail_cb_dist, 4)), "positionIdx": 0})
+        # Trailing stop only: the stop-loss is attached to the entry order
+        sl_price, active_price, trail_dist = BybitPrivate.stop_prices(entry_price, side, atr_value, conf)
+        BybitPrivate.send_signed("POST", "/v5/position/trading-stop", {"category": "linear", "symbol": symbol, "activePrice": str(round(active_price, 4)), "trailingStop": str(round(trail_dist, 4)), "positionIdx": 0})
         logging.info(f"🛡️ PROTECTED {symbol}")
 
+    @staticmethod
+    def wait_filled(symbol, order_id, timeout=3.0):
+        # Poll the order instead of sleeping a fixed time -> average fill price or None
+        delay, deadline = 0.05, time.time() + timeout
+        while time.time() < deadline:
+            res = BybitPrivate.send_signed("GET", "/v5/order/realtime", {"category": "linear", "symbol": symbol, "orderId": order_id})
+            rows = (res or {}).get('result', {}).get('list') or []
+            status = rows[0].get('orderStatus') if rows else None
+            if status == "Filled": return float(rows[0].get('avgPrice') or 0) or None
+            if status in ("Cancelled", "Rejected", "Deactivated"): return None
+            time.sleep(delay); delay = min(delay * 2, 0.4)
+        return None
+
     @staticmethod
     def place_order(symbol, side, price, atr_value, conf):
         qty_calc = (live_settings['RISK_PER_TRADE'] * live_settings['LEVERAGE']) / price
@@ -105,13 +128,18 @@ class BybitPrivate:
         elif price > 1: qty = round(qty_calc, 1)
         else: qty = int(qty_calc)
 
-        BybitPrivate.send_signed("POST", "/v5/position/set-leverage", {"category":"linear","symbol":symbol,"buyLeverage":str(live_settings['LEVERAGE']),"sellLeverage":str(live_settings['LEVERAGE'])})
-        payload = {"category": "linear", "symbol": symbol, "side": side, "orderType": "Market", "qty": str(qty)}
+        lev = str(live_settings['LEVERAGE'])
+        if leverage_cache.get(symbol) != lev:
+            r = BybitPrivate.send_signed("POST", "/v5/position/set-leverage", {"category":"linear","symbol":symbol,"buyLeverage":lev,"sellLeverage":lev})
+            if r and r.get('retCode') in (0, 110043): leverage_cache[symbol] = lev # 110043: already at this leverage
+        sl_price = BybitPrivate.stop_prices(price, side, atr_value, conf)[0]
+        payload = {"category": "linear", "symbol": symbol, "side": side, "orderType": "Market", "qty": str(qty),
+                   "stopLoss": str(round(sl_price, 4)), "slTriggerBy": "MarkPrice", "tpslMode": "Full"}
         res = BybitPrivate.send_signed("POST", "/v5/order/create", payload)
         
         if res and res.get('retCode') == 0:
-            time.sleep(2) 
-            BybitPrivate.set_trading_stop(symbol, price, side, atr_value, conf)
+            fill = BybitPrivate.wait_filled(symbol, res['result']['orderId'])
+            BybitPrivate.set_trading_stop(symbol, fill or price, side, atr_value, conf)
             return True
         return False
 
@@ -127,12 +155,20 @@ class BybitPrivate:
 
 # --- EXPERT ENGINE ---
 class ExpertEngine:
+    @staticmethod
+    def fetch_klines(symbol, interval, limit=200):
+        # Rows oldest -> newest, from the hub when one is connected
+        if hub and hub.connected:
+            try: return hub.klines(symbol, interval, limit)
+            except (ConnectionError, TimeoutError): pass
+        url = f"{BASE_URL}/v5/market/kline?category=linear&symbol={symbol}&interval={interval}&limit={limit}"
+        return transport.get(url).json()['result']['list'][::-1]
+
     @staticmethod
     def check_btc_trend():
+        if hub and hub.reachable(): return hub.state.get("btc", "NEUTRAL")
         try:
-            url = "https://api.bybit.com/v5/market/kline?category=linear&symbol=BTCUSDT&interval=60&limit=200"
-            res = requests.get(url, timeout=3).json()
-            df = pd.DataFrame(res['result']['list'][::-1], columns=['ts','o','h','l','c','v','t'])
+            df = pd.DataFrame(ExpertEngine.fetch_klines("BTCUSDT", "60"), columns=['ts','o','h','l','c','v','t'])
             df['c'] = pd.to_numeric(df['c'])
             return "BULL" if df['c'].iloc[-1] > ta.ema(df['c'], length=200).iloc[-1] else "BEAR"
         except: return "NEUTRAL"
@@ -140,9 +176,7 @@ class ExpertEngine:
     @staticmethod
     def get_market_info(symbol, interval):
         try:
-            url = f"https://api.bybit.com/v5/market/kline?category=linear&symbol={symbol}&interval={interval}&limit=200"
-            res = requests.get(url, timeout=3).json()
-            df = pd.DataFrame(res['result']['list'][::-1], columns=['ts','o','h','l','c','v','t'])
+            df = pd.DataFrame(ExpertEngine.fetch_klines(symbol, interval), columns=['ts','o','h','l','c','v','t'])
             df[['h','l','c','v']] = df[['h','l','c','v']].apply(pd.to_numeric)
             
             adx = ta.adx(df['h'], df['l'], df['c'])['ADX_14'].iloc[-1]
@@ -171,12 +205,12 @@ class ExpertEngine:
 # --- TELEGRAM BOT ---
 class TelegramBot:
     def __init__(self):
-        self.url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
+        self.url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}"
         self.offset = 0
         self.refresh_ui()
 
     def refresh_ui(self):
-        requests.post(f"{self.url}/deleteMyCommands")
+        transport.post(f"{self.url}/deleteMyCommands", "telegram")
         time.sleep(1)
         cmds = [
             {"command": "status", "description": "📊 Status"},
@@ -189,10 +223,10 @@ class TelegramBot:
             {"command": "kill", "description": "⚠️ KILL POSITIONS"},
             {"command": "reboot", "description": "♻️ Reboot"}
         ]
-        requests.post(f"{self.url}/setMyCommands", json={"commands": cmds})
+        transport.post(f"{self.url}/setMyCommands", "telegram", json={"commands": cmds})
 
     def send(self, msg):
-        requests.post(f"{self.url}/sendMessage", json={"chat_id": TARGET_CHAT_ID, "text": msg, "parse_mode": "Markdown"})
+        transport.post(f"{self.url}/sendMessage", "telegram", json={"chat_id": TARGET_CHAT_ID, "text": msg, "parse_mode": "Markdown"})
 
     def handle(self, text):
         global live_settings
@@ -239,7 +273,7 @@ class TelegramBot:
     def poll(self):
         while True:
             try:
-                r = requests.get(f"{self.url}/getUpdates?offset={self.offset}&timeout=10", timeout=15).json()
+                r = transport.get(f"{self.url}/getUpdates?offset={self.offset}&timeout=10", "telegram_poll").json()
                 for u in r.get("result", []):
                     self.offset = u["update_id"] + 1
                     if "message" in u and "text" in u["message"]: self.handle(u["message"]["text"])
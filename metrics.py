@@ -0,0 +1,170 @@
+import bisect, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds (1ms .. 120s, roughly x2.5 per step)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# --- METRICS ---
+# Minimal Prometheus-style counters and histograms. An observation is one bisect plus a few additions
+# under a lock (~1µs), cheap enough to leave on in production.
+class Counter:
+    TYPE = "counter"
+
+    def __init__(self, name, help_, labels=()):
+        self.name, self.help, self.labels = name, help_, tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, n=1):
+        with self.lock: self.values[labels] = self.values.get(labels, 0) + n
+
+    def total(self):
+        return sum(self.values.values())
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        for labels, v in sorted(self.values.items()): out.append(f"{self.name}{_fmt(self.labels, labels)} {v}")
+        return out
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, value, *labels):
+        with self.lock: self.values[labels] = value
+
+class Histogram:
+    def __init__(self, name, help_, labels=(), buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_, tuple(labels), tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            s = self.series.get(labels)
+            if s is None: s = self.series[labels] = [0] * (len(self.buckets) + 2)
+            s[i] += 1; s[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        t0 = time.perf_counter()
+        try: yield
+        finally: self.observe(time.perf_counter() - t0, *labels)
+
+    def stats(self, labels):
+        # -> (count, mean, p50, p95) with quantiles read off the bucket upper bounds
+        s = self.series.get(labels)
+        if not s: return 0, 0.0, 0.0, 0.0
+        counts, total = s[:-1], s[-1]
+        n = sum(counts)
+        def q(p):
+            acc = 0
+            for i, c in enumerate(counts):
+                acc += c
+                if acc >= p * n: return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return n, total / n, q(0.5), q(0.95)
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock: items = sorted((k, list(v)) for k, v in self.series.items())
+        for labels, s in items:
+            acc = 0
+            for b, c in zip(self.buckets + ("+Inf",), s[:-1]):
+                acc += c
+                out.append(f"{self.name}_bucket{_fmt(self.labels + ('le',), labels + (str(b),))} {acc}")
+            out.append(f"{self.name}_sum{_fmt(self.labels, labels)} {s[-1]:.6f}")
+            out.append(f"{self.name}_count{_fmt(self.labels, labels)} {acc}")
+        return out
+
+class Laps:
+    # Back-to-back stage timing: each call records the time since the previous call under `stage`
+    def __init__(self, hist=None):
+        self.hist = hist or stage_seconds
+        self.t0 = self.t = time.perf_counter()
+
+    def __call__(self, stage):
+        now = time.perf_counter(); self.hist.observe(now - self.t, stage); self.t = now
+
+    def total(self, stage="iteration"):
+        self.hist.observe(time.perf_counter() - self.t0, stage)
+
+def _fmt(names, values):
+    if not names: return ""
+    return "{" + ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values)) + "}"
+
+# --- BOT METRICS ---
+stage_seconds = Histogram("bot_stage_seconds", "Time spent per scanner_loop stage", ("stage",))
+http_seconds = Histogram("bot_http_seconds", "HTTP round trip per endpoint", ("endpoint",))
+api_errors = Counter("bot_api_errors_total", "Bybit responses with retCode != 0 or failed requests", ("endpoint", "code"))
+signals = Counter("bot_signals_total", "LONG/SHORT signals seen by the scanner", ("mode", "side"))
+orders = Counter("bot_orders_total", "Entry orders placed", ("mode", "result"))
+iterations = Counter("bot_iterations_total", "scanner_loop passes by outcome", ("result",))
+entry_seconds = Histogram("bot_entry_seconds", "Order entry latency from the signal", ("step",))
+ratelimit_wait = Histogram("bot_ratelimit_wait_seconds", "Time a request queued in the client-side rate limiter", ("group", "priority"))
+ratelimit_queue = Gauge("bot_ratelimit_queue_depth", "Requests waiting in the rate limiter", ("group",))
+ratelimit_holds = Counter("bot_ratelimit_holds_total", "Times the exchange reported a spent rate-limit window", ("group",))
+telegram_messages = Counter("bot_telegram_messages_total", "Telegram outbox deliveries by outcome", ("result",))
+telegram_queue = Gauge("bot_telegram_queue_depth", "Messages waiting in the Telegram outbox")
+shard_seconds = Histogram("bot_shard_seconds", "Evaluate time per scan shard", ("shard",))
+shard_restarts = Counter("bot_shard_restarts_total", "Scan shard worker restarts", ("shard", "reason"))
+funnel_symbols = Gauge("bot_funnel_symbols", "Symbols at each screening stage in the last pass", ("stage",))
+funnel_rejects = Counter("bot_funnel_rejects_total", "Symbols dropped by the ticker screen", ("reason",))
+universe_changes = Counter("bot_universe_changes_total", "Symbols entering/leaving the scalp and swing lists", ("list", "change"))
+REGISTRY = [stage_seconds, http_seconds, api_errors, signals, orders, iterations, entry_seconds, ratelimit_wait, ratelimit_queue, ratelimit_holds,
+            telegram_messages, telegram_queue, shard_seconds, shard_restarts, funnel_symbols, funnel_rejects,
+            universe_changes]
+started = time.time()
+
+def render():
+    lines = [f"# HELP bot_uptime_seconds Seconds since start", "# TYPE bot_uptime_seconds gauge", f"bot_uptime_seconds {time.time() - started:.0f}"]
+    for m in REGISTRY: lines += m.render()
+    return "\n".join(lines) + "\n"
+
+def endpoint_label(kind, path):
+    # Keep label cardinality bounded: no bot tokens or query strings
+    if kind.startswith("telegram"): return "telegram/" + path.rsplit("/", 1)[-1]
+    return path
+
+def summary():
+    # Telegram /perf text
+    lines = ["⏱️ **LOOP TIMINGS** (n | mean | p50 | p95)"]
+    for labels in sorted(stage_seconds.series):
+        n, mean, p50, p95 = stage_seconds.stats(labels)
+        lines.append(f"`{labels[0]:<10}` {n} | {mean * 1000:.0f}ms | ≤{p50 * 1000:.0f}ms | ≤{p95 * 1000:.0f}ms")
+    slow = sorted(http_seconds.series, key=lambda k: -http_seconds.stats(k)[1])[:5]
+    if slow:
+        lines.append("🌐 **Slowest endpoints** (mean)")
+        for labels in slow:
+            n, mean, _, _ = http_seconds.stats(labels)
+            lines.append(f"`{labels[0]}` {mean * 1000:.0f}ms x{n}")
+    if entry_seconds.series:
+        lines.append("🛡️ **Order entry** (mean | p95)")
+        for labels in sorted(entry_seconds.series):
+            n, mean, _, p95 = entry_seconds.stats(labels)
+            lines.append(f"`{labels[0]}` {mean * 1000:.0f}ms | ≤{p95 * 1000:.0f}ms x{n}")
+    waits = [(k, ratelimit_wait.stats(k)) for k in sorted(ratelimit_wait.series)]
+    waits = [(k, st) for k, st in waits if st[3] >= 0.01]
+    if waits or ratelimit_holds.total():
+        lines.append(f"🚦 **Rate limiter** (mean | p95 wait) holds: {ratelimit_holds.total()} | queued: {ratelimit_queue.total()}")
+        for (group, prio), (n, mean, _, p95) in waits: lines.append(f"`{group}/{prio}` {mean * 1000:.0f}ms | ≤{p95 * 1000:.0f}ms x{n}")
+    lines.append(f"❗ API errors: {api_errors.total()} | 📶 Signals: {signals.total()} | 🧾 Orders: {orders.total()}")
+    return "\n".join(lines)
+
+# --- HTTP ENDPOINT ---
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics": self.send_error(404); return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+def serve(port, host="127.0.0.1"):
+    # Prometheus scrape target at http://host:port/metrics on a daemon thread
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,345 @@
+import argparse, asyncio, collections, hashlib, hmac, json, logging, math, random, time, uuid
+import numpy as np
+from aiohttp import web
+
+# --- MOCK BYBIT V5 ---
+# Local stand-in for the REST endpoints the bot uses, so the scanner can be driven and timed offline:
+#   BYBIT_BASE_URL=http://127.0.0.1:8600 TELEGRAM_API_URL=http://127.0.0.1:8600 python bot_v33.py
+# Prices are seeded 1-minute random walks pinned to the wall clock, so klines, tickers and fills agree.
+# Market orders fill at the last price; resting limit orders, stop-losses and trailing stops are
+# matched on every engine tick. Latency, error rate and per-endpoint rate limits are injectable and
+# can be changed at runtime with POST /mock/config.
+MINUTE = 60000
+HISTORY_MIN = 14 * 1440   # minutes of 1m history generated per symbol (covers 200 x 60m bars)
+RATE_WINDOW = 1.0         # seconds per rate-limit window
+
+class Market:
+    def __init__(self, symbols, seed=7):
+        self.symbols = list(symbols)
+        self.origin = (int(time.time() * 1000) // MINUTE - HISTORY_MIN) * MINUTE
+        self.paths = {}
+        for k, s in enumerate(self.symbols):
+            rng = np.random.default_rng(seed + k)
+            start = 60000.0 if s == "BTCUSDT" else float(rng.uniform(0.05, 500))
+            drift = rng.normal(0, 0.00002)
+            self.paths[s] = {"rng": rng, "close": start * np.exp(np.cumsum(rng.normal(drift, 0.0015, HISTORY_MIN))),
+                             "vol": rng.lognormal(8, 1, HISTORY_MIN), "drift": drift, "funding": float(rng.normal(0, 0.0003))}
+
+    def _extend(self, s, upto):
+        p = self.paths[s]; n = upto - len(p["close"]) + 1
+        if n <= 0: return
+        steps = p["rng"].normal(p["drift"], 0.0015, n)
+        p["close"] = np.concatenate((p["close"], p["close"][-1] * np.exp(np.cumsum(steps))))
+        p["vol"] = np.concatenate((p["vol"], p["rng"].lognormal(8, 1, n)))
+
+    def minute(self, ts_ms=None):
+        ts = int(time.time() * 1000) if ts_ms is None else ts_ms
+        return (ts - self.origin) // MINUTE
+
+    def price(self, s):
+        m = self.minute(); self._extend(s, m)
+        return float(self.paths[s]["close"][m])
+
+    def bars(self, s, minutes, start=None, end=None, limit=200):
+        # -> rows [start, o, h, l, c, v, turnover], newest first (Bybit order)
+        now_m = self.minute(); self._extend(s, now_m)
+        p = self.paths[s]
+        last = now_m // minutes if end is None else min(now_m, self.minute(end)) // minutes
+        first = max(0, last - limit + 1)
+        if start is not None: first = max(first, -(-self.minute(start) // minutes))
+        rows = []
+        for b in range(last, first - 1, -1):
+            lo, hi = b * minutes, min((b + 1) * minutes, now_m + 1)
+            c = p["close"][lo:hi]; v = p["vol"][lo:hi]
+            o = p["close"][lo - 1] if lo > 0 else c[0]
+            rows.append([str(self.origin + lo * MINUTE), f"{o:.6g}", f"{max(o, c.max()):.6g}", f"{min(o, c.min()):.6g}",
+                         f"{c[-1]:.6g}", f"{v.sum():.2f}", f"{(v * c).sum():.2f}"])
+        return rows
+
+    def ticker(self, s):
+        m = self.minute(); self._extend(s, m)
+        p = self.paths[s]; day = p["close"][max(0, m - 1439):m + 1]
+        return {"symbol": s, "lastPrice": f"{day[-1]:.6g}", "highPrice24h": f"{day.max():.6g}", "lowPrice24h": f"{day.min():.6g}",
+                "prevPrice24h": f"{day[0]:.6g}", "prevPrice1h": f"{day[max(0, len(day) - 61)]:.6g}", "price24hPcnt": f"{day[-1] / day[0] - 1:.4f}", "fundingRate": f"{p['funding']:.6f}",
+                "volume24h": f"{p['vol'][max(0, m - 1439):m + 1].sum():.2f}",
+                "turnover24h": f"{(p['vol'][max(0, m - 1439):m + 1] * day).sum():.2f}"}
+
+class Exchange:
+    def __init__(self, market, balance=1000.0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=0, api_secret=None, fee=0.00055):
+        self.market = market
+        self.balance = balance
+        self.fee = fee
+        self.api_secret = api_secret
+        self.faults = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate, "rate_limit": rate_limit,
+                       "telegram_interval": 0.0}  # min seconds between sendMessage calls per chat before a 429 (0 = off)
+        self.telegram_last = {}  # chat_id -> last accepted sendMessage time
+        self.telegram_log = collections.deque(maxlen=50)
+        self.positions = {}     # symbol -> position dict
+        self.orders = {}        # orderId -> resting limit order
+        self.history = {}       # orderId -> order record as /v5/order/realtime returns it
+        self.closed = []        # closed-pnl records, oldest first
+        self.leverage = {}
+        self.windows = {}       # endpoint -> [window start, count]
+        self.stats = {}
+
+    def seed_history(self, n, days=90, seed=1):
+        # n synthetic closed-pnl records spread over the last `days`, for exercising report.py
+        rng = random.Random(seed); now = int(time.time() * 1000) - 60_000
+        for t in sorted(rng.randint(now - days * 86400_000, now) for _ in range(n)):
+            s = rng.choice(self.market.symbols); px = self.market.price(s); d = rng.choice((1, -1)); qty = round(rng.uniform(1, 20) / px, 4) or 0.001
+            exit_px = px * (1 + rng.gauss(0, 0.01))
+            self.closed.append({"symbol": s, "orderId": str(uuid.UUID(int=rng.getrandbits(128))), "side": "Sell" if d > 0 else "Buy", "qty": str(qty),
+                                "avgEntryPrice": str(px), "avgExitPrice": f"{exit_px:.6g}", "closedPnl": f"{d * (exit_px - px) * qty:.6f}",
+                                "createdTime": str(t - rng.randint(60_000, 4 * 3600_000)), "updatedTime": str(t), "leverage": "5"})
+
+    # --- matching engine stand-in ---
+    def fill(self, symbol, side, qty, price, reduce_only=False, stop_loss=None):
+        pos = self.positions.get(symbol)
+        if pos and pos["side"] != side:
+            close_qty = min(qty, pos["size"])
+            sign = 1 if pos["side"] == "Buy" else -1
+            pnl = sign * (price - pos["entry"]) * close_qty - self.fee * (price + pos["entry"]) * close_qty
+            self.balance += pnl
+            self.closed.append({"symbol": symbol, "orderId": str(uuid.uuid4()), "side": side, "qty": str(close_qty),
+                                "avgEntryPrice": str(pos["entry"]), "avgExitPrice": str(price), "closedPnl": f"{pnl:.6f}",
+                                "createdTime": str(pos["created"]), "updatedTime": str(int(time.time() * 1000)), "leverage": str(pos["lev"])})
+            pos["size"] = round(pos["size"] - close_qty, 10)
+            if pos["size"] <= 0: del self.positions[symbol]
+            qty -= close_qty
+        if qty <= 0 or reduce_only: return
+        if pos and pos["side"] == side and symbol in self.positions:
+            pos["entry"] = (pos["entry"] * pos["size"] + price * qty) / (pos["size"] + qty); pos["size"] += qty
+        else:
+            self.positions[symbol] = {"side": side, "size": qty, "entry": price, "created": int(time.time() * 1000),
+                                      "lev": self.leverage.get(symbol, 10), "sl": stop_loss, "trail": None, "active": None, "best": None}
+
+    def tick(self):
+        for oid, o in list(self.orders.items()):
+            px = self.market.price(o["symbol"])
+            if (o["side"] == "Buy" and px <= o["price"]) or (o["side"] == "Sell" and px >= o["price"]):
+                del self.orders[oid]; self.fill(o["symbol"], o["side"], o["qty"], o["price"], o["reduce"])
+                self.history[oid].update({"orderStatus": "Filled", "avgPrice": str(o["price"]), "cumExecQty": str(o["qty"])})
+        for s, p in list(self.positions.items()):
+            px = self.market.price(s); d = 1 if p["side"] == "Buy" else -1
+            if p["trail"]:
+                if p["best"] is not None or p["active"] is None or d * (px - p["active"]) >= 0:
+                    p["best"] = px if p["best"] is None else (max(p["best"], px) if d > 0 else min(p["best"], px))
+            stops = [x for x in (p["sl"], p["best"] - d * p["trail"] if p["trail"] and p["best"] is not None else None) if x]
+            if any(d * (px - x) <= 0 for x in stops):
+                self.fill(s, "Sell" if d > 0 else "Buy", p["size"], px, reduce_only=True)
+
+    async def engine(self, every=1.0):
+        while True:
+            await asyncio.sleep(every)
+            self.tick()
+
+    # --- fault injection ---
+    def limit_headers(self, endpoint):
+        cap = self.faults["rate_limit"]
+        w = self.windows.setdefault(endpoint, [time.time(), 0])
+        if time.time() - w[0] >= RATE_WINDOW: w[0], w[1] = time.time(), 0
+        w[1] += 1
+        headers = {}
+        if cap:
+            headers = {"X-Bapi-Limit": str(cap), "X-Bapi-Limit-Status": str(max(0, cap - w[1])),
+                       "X-Bapi-Limit-Reset-Timestamp": str(int((w[0] + RATE_WINDOW) * 1000))}
+        return headers, bool(cap) and w[1] > cap
+
+    async def guard(self, request, endpoint):
+        self.stats[endpoint] = self.stats.get(endpoint, 0) + 1
+        f = self.faults
+        if f["latency_ms"] or f["jitter_ms"]:
+            await asyncio.sleep(max(0.0, f["latency_ms"] + random.uniform(-f["jitter_ms"], f["jitter_ms"])) / 1000)
+        headers, limited = self.limit_headers(endpoint)
+        if limited: return headers, (10006, "Too many visits!")
+        if f["error_rate"] and random.random() < f["error_rate"]: return headers, (10016, "Internal server error")
+        return headers, None
+
+    def authed(self, request, body):
+        if not request.headers.get("X-BAPI-API-KEY"): return False
+        if not self.api_secret: return True
+        param_str = body if request.method == "POST" else request.query_string
+        sign_str = request.headers.get("X-BAPI-TIMESTAMP", "") + request.headers["X-BAPI-API-KEY"] + request.headers.get("X-BAPI-RECV-WINDOW", "") + param_str
+        want = hmac.new(self.api_secret.encode(), sign_str.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(want, request.headers.get("X-BAPI-SIGN", ""))
+
+    # --- routes ---
+    def routes(self):
+        public = {"/v5/market/kline": self.kline, "/v5/market/tickers": self.tickers}
+        private = {"/v5/account/wallet-balance": self.wallet, "/v5/position/list": self.position_list,
+                   "/v5/position/closed-pnl": self.closed_pnl, "/v5/position/set-leverage": self.set_leverage,
+                   "/v5/order/create": self.order_create, "/v5/order/create-batch": self.order_create_batch, "/v5/order/cancel-all": self.cancel_all, "/v5/order/realtime": self.order_realtime,
+                   "/v5/position/trading-stop": self.trading_stop}
+
+        def wrap(endpoint, fn, private_):
+            async def handler(request):
+                body = await request.text()
+                headers, fault = await self.guard(request, endpoint)
+                if fault is None and private_ and not self.authed(request, body): fault = (10004, "error sign!")
+                if fault is None:
+                    args = dict(request.query) if request.method == "GET" else (json.loads(body) if body else {})
+                    code, msg, result, *ext = fn(args)
+                else: (code, msg), result, ext = fault, {}, ()
+                return web.json_response({"retCode": code, "retMsg": msg, "result": result, "retExtInfo": ext[0] if ext else {}, "time": int(time.time() * 1000)}, headers=headers)
+            return handler
+
+        out = [web.route("*", path, wrap(path, fn, False)) for path, fn in public.items()]
+        out += [web.route("*", path, wrap(path, fn, True)) for path, fn in private.items()]
+        out += [web.route("*", "/bot{token}/{method}", self.telegram), web.get("/mock/stats", self.mock_stats),
+                web.post("/mock/config", self.mock_config)]
+        return out
+
+    def kline(self, q):
+        s, iv = q.get("symbol"), q.get("interval", "")
+        if s not in self.market.paths or not iv.isdigit(): return 10001, "params error", {}
+        rows = self.market.bars(s, int(iv), start=int(q["start"]) if "start" in q else None, end=int(q["end"]) if "end" in q else None,
+                                limit=min(int(q.get("limit", 200)), 1000))
+        return 0, "OK", {"symbol": s, "category": "linear", "list": rows}
+
+    def tickers(self, q):
+        syms = [q["symbol"]] if q.get("symbol") else self.market.symbols
+        if any(s not in self.market.paths for s in syms): return 10001, "params error", {}
+        return 0, "OK", {"category": "linear", "list": [self.market.ticker(s) for s in syms]}
+
+    def wallet(self, q):
+        upnl = sum(self._upnl(s, p) for s, p in self.positions.items())
+        return 0, "OK", {"list": [{"accountType": "UNIFIED", "totalEquity": f"{self.balance + upnl:.4f}",
+                                   "coin": [{"coin": "USDT", "walletBalance": f"{self.balance:.4f}", "unrealisedPnl": f"{upnl:.4f}"}]}]}
+
+    def _upnl(self, s, p):
+        return (1 if p["side"] == "Buy" else -1) * (self.market.price(s) - p["entry"]) * p["size"]
+
+    def position_list(self, q):
+        syms = [q["symbol"]] if q.get("symbol") else list(self.positions)
+        out = []
+        for s in syms:
+            p = self.positions.get(s)
+            if not p: out.append({"symbol": s, "side": "", "size": "0", "unrealisedPnl": "0", "createdTime": "0", "avgPrice": "0"}); continue
+            out.append({"symbol": s, "side": p["side"], "size": str(p["size"]), "avgPrice": str(p["entry"]), "markPrice": str(self.market.price(s)),
+                        "unrealisedPnl": f"{self._upnl(s, p):.6f}", "createdTime": str(p["created"]), "updatedTime": str(int(time.time() * 1000)),
+                        "leverage": str(p["lev"]), "stopLoss": str(p["sl"] or ""), "trailingStop": str(p["trail"] or 0),
+                        "positionIdx": 0})
+        return 0, "OK", {"category": "linear", "list": out}
+
+    def closed_pnl(self, q):
+        if "startTime" in q and "endTime" in q and int(q["endTime"]) - int(q["startTime"]) > 7 * 86400 * 1000:
+            return 10001, "The time range between startTime and endTime cannot exceed 7 days", {}
+        rows = [r for r in self.closed if (not q.get("symbol") or r["symbol"] == q["symbol"])
+                and int(r["updatedTime"]) >= int(q.get("startTime", 0)) and int(r["updatedTime"]) <= int(q.get("endTime", 1 << 62))]
+        rows = rows[::-1]
+        offset = int(q.get("cursor") or 0); limit = min(int(q.get("limit", 50)), 100)
+        page = rows[offset:offset + limit]
+        nxt = str(offset + limit) if offset + limit < len(rows) else ""
+        return 0, "OK", {"category": "linear", "list": page, "nextPageCursor": nxt}
+
+    def set_leverage(self, q):
+        lev = int(float(q.get("buyLeverage", 1)))
+        if self.leverage.get(q.get("symbol")) == lev: return 110043, "leverage not modified", {}
+        self.leverage[q["symbol"]] = lev
+        return 0, "OK", {}
+
+    def order_create(self, q):
+        s, side, qty = q.get("symbol"), q.get("side"), float(q.get("qty") or 0)
+        if s not in self.market.paths or side not in ("Buy", "Sell") or qty <= 0: return 10001, "params error", {}
+        oid = str(uuid.uuid4())
+        reduce = str(q.get("reduceOnly", "")).lower() == "true"
+        if reduce and s not in self.positions: return 110017, "current position is zero, cannot fix reduce-only order qty", {}
+        sl = float(q["stopLoss"]) if q.get("stopLoss") else None
+        rec = {"orderId": oid, "orderLinkId": q.get("orderLinkId", ""), "symbol": s, "side": side, "qty": str(qty),
+               "orderType": q.get("orderType", "Market"), "createdTime": str(int(time.time() * 1000))}
+        if q.get("orderType", "Market") == "Market":
+            px = self.market.price(s)
+            self.fill(s, side, qty, px, reduce, sl)
+            rec.update({"orderStatus": "Filled", "avgPrice": str(px), "cumExecQty": str(qty)})
+        else:
+            self.orders[oid] = {"symbol": s, "side": side, "qty": qty, "price": float(q["price"]), "reduce": reduce}
+            rec.update({"orderStatus": "New", "price": str(q["price"]), "avgPrice": "0", "cumExecQty": "0"})
+        self.history[oid] = rec
+        return 0, "OK", {"orderId": oid, "orderLinkId": rec["orderLinkId"]}
+
+    def order_create_batch(self, q):
+        # Per-leg outcome in retExtInfo.list, in request order; failed legs get an empty result row like Bybit's
+        legs = q.get("request") or []
+        if not legs or len(legs) > 20: return 10001, "params error", {}
+        rows, codes = [], []
+        for leg in legs:
+            code, msg, res = self.order_create({"category": q.get("category"), **leg})
+            rows.append({"category": "linear", "symbol": leg.get("symbol", ""), "orderId": res.get("orderId", ""),
+                         "orderLinkId": res.get("orderLinkId", ""), "createAt": str(int(time.time() * 1000)) if code == 0 else ""})
+            codes.append({"code": code, "msg": msg})
+        return 0, "OK", {"list": rows}, {"list": codes}
+
+    def order_realtime(self, q):
+        if q.get("orderId"): rows = [self.history[q["orderId"]]] if q["orderId"] in self.history else []
+        else: rows = [self.history[oid] for oid in self.orders if not q.get("symbol") or self.orders[oid]["symbol"] == q["symbol"]]
+        return 0, "OK", {"category": "linear", "list": rows}
+
+    def cancel_all(self, q):
+        gone = [oid for oid, o in self.orders.items() if not q.get("symbol") or o["symbol"] == q["symbol"]]
+        for oid in gone: del self.orders[oid]; self.history[oid]["orderStatus"] = "Cancelled"
+        return 0, "OK", {"list": [{"orderId": oid} for oid in gone], "success": "1"}
+
+    def trading_stop(self, q):
+        p = self.positions.get(q.get("symbol"))
+        if not p: return 10001, "can not set tp/sl/ts for zero position", {}
+        if q.get("stopLoss"): p["sl"] = float(q["stopLoss"])
+        if q.get("trailingStop"): p["trail"] = float(q["trailingStop"]); p["best"] = None
+        if q.get("activePrice"): p["active"] = float(q["activePrice"])
+        return 0, "OK", {}
+
+    async def telegram(self, request):
+        method = request.match_info["method"]
+        self.stats["telegram/" + method] = self.stats.get("telegram/" + method, 0) + 1
+        if method == "getUpdates": await asyncio.sleep(min(float(request.query.get("timeout", 0)), 1.0))
+        if method == "sendMessage":
+            body = await request.json()
+            chat, gap = str(body.get("chat_id")), self.faults["telegram_interval"]
+            wait = self.telegram_last.get(chat, 0) + gap - time.time()
+            if gap and wait > 0:
+                retry = max(1, math.ceil(wait))
+                return web.json_response({"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry}",
+                                          "parameters": {"retry_after": retry}}, status=429)
+            self.telegram_last[chat] = time.time(); self.telegram_log.append(body.get("text", ""))
+        return web.json_response({"ok": True, "result": [] if method == "getUpdates" else True})
+
+    async def mock_stats(self, request):
+        return web.json_response({"requests": self.stats, "positions": len(self.positions), "closed": len(self.closed),
+                                  "balance": self.balance, "faults": self.faults, "telegram": list(self.telegram_log)})
+
+    async def mock_config(self, request):
+        self.faults.update({k: v for k, v in (await request.json()).items() if k in self.faults})
+        return web.json_response(self.faults)
+
+async def serve(exchange, host="127.0.0.1", port=8600):
+    app = web.Application(); app.add_routes(exchange.routes())
+    runner = web.AppRunner(app); await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    asyncio.get_running_loop().create_task(exchange.engine())
+    return runner
+
+def default_symbols(n):
+    base = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "DOGEUSDT", "ADAUSDT", "AVAXUSDT", "LINKUSDT", "DOTUSDT", "LTCUSDT"]
+    return (base + [f"MOCK{k}USDT" for k in range(max(0, n - len(base)))])[:n]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local Bybit v5 mock exchange")
+    ap.add_argument("--port", type=int, default=8600)
+    ap.add_argument("--symbols", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--balance", type=float, default=1000.0)
+    ap.add_argument("--latency", type=float, default=0.0, help="added latency per request (ms)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="+/- latency jitter (ms)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with retCode 10016")
+    ap.add_argument("--rate-limit", type=int, default=0, help="requests per second per endpoint before retCode 10006 (0 = off)")
+    ap.add_argument("--secret", default=None, help="verify request signatures with this API secret")
+    ap.add_argument("--history", type=int, default=0, help="seed N closed-pnl records over the last 90 days")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    ex = Exchange(Market(default_symbols(args.symbols), args.seed), args.balance, args.latency, args.jitter, args.error_rate, args.rate_limit, args.secret)
+    if args.history: ex.seed_history(args.history)
+    async def main():
+        await serve(ex, port=args.port)
+        logging.info(f"🧪 MOCK EXCHANGE on http://127.0.0.1:{args.port} ({args.symbols} symbols)")
+        await asyncio.Event().wait()
+    asyncio.run(main())
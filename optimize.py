@@ -0,0 +1,187 @@
+import argparse, copy, csv, itertools, os, random, time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import backtest as bt
+
+# Searchable parameters; dotted names reach into SCALP_CONF / SWING_CONF
+SPACE = {
+    "ADX_THRESHOLD": [20, 22.5, 25, 27.5, 30],
+    "RISK_PER_TRADE": [2.0, 4.0, 6.0],
+    "COOLDOWN_MINUTES": [30, 60, 90, 120],
+    "STALEMATE_HOURS": [2, 4, 6],
+    "SCALP_CONF.sl_atr": [2.0, 3.0, 4.0],
+    "SCALP_CONF.trail_active_atr": [0.5, 1.0],
+    "SCALP_CONF.trail_cb_atr": [0.3, 0.5, 0.8],
+    "SWING_CONF.sl_atr": [3.0, 5.0],
+    "SWING_CONF.trail_active_atr": [1.0, 1.5, 2.0],
+    "SWING_CONF.trail_cb_atr": [0.5, 1.0],
+}
+STAT_KEYS = ("pnl", "max_dd", "trades", "win_rate")
+
+# --- SHARED ARRAYS ---
+# The dataset and precomputed indicator series are copied once into a single shared-memory block;
+# workers map numpy views onto it instead of receiving pickled copies.
+def flatten(ds, pre):
+    arrays = {f"ds.{k}": v for k, v in ds.items() if isinstance(v, np.ndarray)}
+    for iv in ("15", "60"):
+        arrays.update({f"pre.{iv}.{name}": a for name, a in pre[iv].items()})
+    arrays.update({"pre.htf": pre["htf"], "pre.btc": pre["btc"]})
+    return arrays
+
+def share(arrays):
+    layout, off = {}, 0
+    for key, a in arrays.items():
+        layout[key] = (off, a.shape, a.dtype.str)
+        off += (a.nbytes + 63) // 64 * 64
+    shm = shared_memory.SharedMemory(create=True, size=max(off, 1))
+    for key, a in arrays.items():
+        o, shape, dtype = layout[key]
+        np.ndarray(shape, dtype, buffer=shm.buf, offset=o)[...] = a
+    return shm, layout
+
+def attach(name, layout, meta):
+    shm = shared_memory.SharedMemory(name=name)
+    ds, pre = dict(meta), {"15": {}, "60": {}}
+    for key, (o, shape, dtype) in layout.items():
+        a = np.ndarray(shape, dtype, buffer=shm.buf, offset=o)
+        a.flags.writeable = False
+        parts = key.split(".")
+        if parts[0] == "ds": ds[parts[1]] = a
+        elif len(parts) == 3: pre[parts[1]][parts[2]] = a
+        else: pre[parts[1]] = a
+    return shm, ds, pre
+
+# --- WORKER ---
+_W = {}
+
+def _init(name, layout, meta, modes, windows):
+    _W["shm"], _W["ds"], _W["pre"] = attach(name, layout, meta)
+    _W["modes"], _W["windows"], _W["events"] = modes, windows, {}
+
+def _run(combo):
+    # combo -> [stats per window]; candidate events are memoised per (ADX_THRESHOLD, window)
+    params = apply(combo)
+    out = []
+    for w in _W["windows"]:
+        key = (params["ADX_THRESHOLD"], w)
+        if key not in _W["events"]:
+            _W["events"][key] = bt.candidates(_W["ds"], _W["pre"], params, _W["modes"], *w)
+        trades = bt.simulate(_W["ds"], _W["pre"], params, _W["modes"], *w, events=_W["events"][key])
+        out.append(bt.summarize(trades))
+    return combo, out
+
+# --- SEARCH ---
+def apply(combo, base=bt.DEFAULTS):
+    params = copy.deepcopy(base)
+    for k, v in combo.items():
+        if "." in k:
+            conf, field = k.split(".")
+            params[conf][field] = v
+        else: params[k] = v
+    return params
+
+def grid(space):
+    keys = list(space)
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(space[k] for k in keys))]
+
+def sample(space, n, seed=0):
+    rng = random.Random(seed)
+    total = int(np.prod([len(v) for v in space.values()]))
+    if n >= total: return grid(space)
+    seen, out = set(), []
+    while len(out) < n:
+        combo = tuple(rng.randrange(len(v)) for v in space.values())
+        if combo in seen: continue
+        seen.add(combo)
+        out.append({k: space[k][i] for k, i in zip(space, combo)})
+    return out
+
+def windows_for(ds, folds):
+    # folds == 0: the whole test window. Otherwise folds + 1 equal consecutive segments; fold i trains on
+    # segment i and is tested on segment i + 1 (rolling walk-forward).
+    lo, hi = bt.test_window(ds)
+    if folds <= 0: return [(lo, hi)]
+    edges = np.linspace(lo, hi, folds + 2).astype(np.int64)
+    return [(int(edges[i]), int(edges[i + 1]) - 1) for i in range(folds + 1)]
+
+def score(st, min_trades):
+    # Return over drawdown, with too-thin samples pushed to the bottom
+    if st["trades"] < min_trades: return -np.inf
+    return st["pnl"] / (1.0 + st["max_dd"])
+
+def rank(results, w, min_trades, sort="score"):
+    keys = {"score": lambda r: score(r[1][w], min_trades), "pnl": lambda r: r[1][w]["pnl"],
+            "dd": lambda r: -r[1][w]["max_dd"], "trades": lambda r: r[1][w]["trades"]}
+    return sorted(results, key=lambda r: (keys[sort](r), r[1][w]["pnl"], -r[1][w]["max_dd"], r[1][w]["trades"]), reverse=True)
+
+def walk_forward(results, folds, min_trades, sort):
+    # Best-on-train params per fold and how they did on the following unseen segment
+    report = []
+    for i in range(folds):
+        combo, stats = rank(results, i, min_trades, sort)[0]
+        report.append({"fold": i + 1, "params": combo, "train": stats[i], "test": stats[i + 1]})
+    return report
+
+def run(ds, pre, modes, combos, folds=0, workers=None):
+    windows = windows_for(ds, folds)
+    meta = {k: v for k, v in ds.items() if not isinstance(v, np.ndarray)}
+    shm, layout = share(flatten(ds, pre))
+    try:
+        bt.simulate(ds, pre, bt.DEFAULTS, modes, *windows[0])   # compile _walk into numba's cache for the workers
+        # spawn, not fork: forking after numba's OpenMP pool has started can deadlock
+        with mp.get_context("spawn").Pool(workers or os.cpu_count(), initializer=_init, initargs=(shm.name, layout, meta, modes, windows)) as pool:
+            results = list(pool.imap_unordered(_run, combos, chunksize=max(1, len(combos) // (64 * (workers or os.cpu_count())))))
+    finally:
+        shm.close(); shm.unlink()
+    return windows, results
+
+def write_results(results, windows, path):
+    keys = list(results[0][0]) if results else []
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(keys + [f"w{i}_{s}" for i in range(len(windows)) for s in STAT_KEYS])
+        for combo, stats in results:
+            writer.writerow([combo[k] for k in keys] + [round(st[s], 4) for st in stats for s in STAT_KEYS])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parallel parameter sweep / walk-forward optimisation on top of backtest.py")
+    ap.add_argument("--symbols", default="SOLUSDT,DOGEUSDT,XRPUSDT,ETHUSDT")
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--ltf", default="5")
+    ap.add_argument("--random", type=int, default=0, help="sample N combinations instead of the full grid")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--folds", type=int, default=0, help="walk-forward folds (0 = single in-sample run)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--min-trades", type=int, default=20)
+    ap.add_argument("--sort", choices=("score", "pnl", "dd", "trades"), default="score")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--out", default="optimize_results.csv")
+    ap.add_argument("--synthetic", action="store_true")
+    args = ap.parse_args()
+
+    symbols = args.symbols.split(",")
+    end = int(time.time() * 1000) // bt.HOUR * bt.HOUR; start = end - args.days * 24 * bt.HOUR
+    ds = (bt.synthetic_dataset if args.synthetic else bt.load_dataset)(symbols, start, end, args.ltf)
+    pre = bt.precompute(ds)
+    modes = bt.mode_masks(ds, *bt.split_by_volatility(ds))
+    combos = sample(SPACE, args.random, args.seed) if args.random else grid(SPACE)
+
+    t0 = time.time()
+    windows, results = run(ds, pre, modes, combos, args.folds, args.workers)
+    el = time.time() - t0
+    write_results(results, windows, args.out)
+    print(f"⚙️ {len(combos)} combinations x {len(windows)} windows on {args.workers or os.cpu_count()} workers in {el:.1f}s -> {args.out}")
+
+    w = len(windows) - 1
+    print(f"🏆 Top {args.top} ({'last segment' if args.folds else 'full window'}, by {args.sort}):")
+    for combo, stats in rank(results, w, args.min_trades, args.sort)[:args.top]:
+        st = stats[w]
+        print(f"  PnL ${st['pnl']:8.2f} | DD ${st['max_dd']:7.2f} | {st['trades']:4d} trades | WR {st['win_rate']:5.1f}% | {combo}")
+    if args.folds:
+        oos = 0.0
+        for r in walk_forward(results, args.folds, args.min_trades, args.sort):
+            oos += r["test"]["pnl"]
+            print(f"  Fold {r['fold']}: train ${r['train']['pnl']:.2f} -> test ${r['test']['pnl']:.2f} "
+                  f"(DD ${r['test']['max_dd']:.2f}, {r['test']['trades']} trades) {r['params']}")
+        print(f"📈 Walk-forward out-of-sample PnL: ${oos:.2f}")
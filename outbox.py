@@ -0,0 +1,91 @@
+import collections, logging, threading, time
+import metrics
+
+MAX_CHARS = 4096  # Telegram's per-message limit
+
+# --- OUTBOX ---
+# Background sender for Telegram messages so the trading thread never waits on api.telegram.org.
+# put() only appends to a bounded queue (oldest dropped first); everything that arrives within `window` seconds of
+# the first message goes out as one digest, sends are spaced `min_interval` apart for Telegram's per-chat limit,
+# 429s wait out `retry_after`, and other failures back off exponentially.
+class Outbox:
+    def __init__(self, post, max_queue=500, window=0.5, min_interval=1.0, max_attempts=5):
+        self.post = post  # post(text, parse_mode) -> requests.Response
+        self.max_queue, self.window, self.min_interval, self.max_attempts = max_queue, window, min_interval, max_attempts
+        self.q = collections.deque()
+        self.dropped = 0
+        self.busy = False
+        self.last_send = 0.0
+        self.thread = None
+        self.cond = threading.Condition()
+
+    def put(self, text):
+        with self.cond:
+            if len(self.q) >= self.max_queue:
+                self.q.popleft(); self.dropped += 1; metrics.telegram_messages.inc("dropped")
+            self.q.append(text)
+            metrics.telegram_queue.set(len(self.q))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="telegram-outbox", daemon=True); self.thread.start()
+            self.cond.notify_all()
+
+    def flush(self, timeout=10.0):
+        # Wait until everything queued so far has been delivered (or given up on) -> True if drained
+        deadline = time.time() + timeout
+        with self.cond:
+            while self.q or self.busy:
+                left = deadline - time.time()
+                if left <= 0: return False
+                self.cond.wait(left)
+        return True
+
+    @staticmethod
+    def digest(msgs):
+        # Pack messages into as few <= MAX_CHARS chunks as possible without splitting any message
+        chunks, cur = [], ""
+        for m in msgs:
+            if len(m) > MAX_CHARS: m = m[:MAX_CHARS - 1] + "…"
+            if cur and len(cur) + 2 + len(m) > MAX_CHARS: chunks.append(cur); cur = ""
+            cur = f"{cur}\n\n{m}" if cur else m
+        if cur: chunks.append(cur)
+        return chunks
+
+    def _take(self):
+        with self.cond:
+            while not self.q: self.cond.wait()
+        time.sleep(self.window)  # let the rest of the burst arrive
+        with self.cond:
+            msgs, dropped = list(self.q), self.dropped
+            self.q.clear(); self.dropped = 0; self.busy = True
+            metrics.telegram_queue.set(0)
+        if dropped: msgs.insert(0, f"⚠️ {dropped} older messages dropped (outbox full)")
+        return self.digest(msgs)
+
+    def _deliver(self, text):
+        parse_mode = "Markdown"
+        for attempt in range(self.max_attempts):
+            wait = self.last_send + self.min_interval - time.time()
+            if wait > 0: time.sleep(wait)
+            try:
+                res = self.post(text, parse_mode); self.last_send = time.time()
+                if res.status_code == 200: metrics.telegram_messages.inc("sent"); return True
+                metrics.telegram_messages.inc("retried")
+                if res.status_code == 429:
+                    try: retry_after = float(res.json().get("parameters", {}).get("retry_after", 1))
+                    except Exception: retry_after = 1.0
+                    time.sleep(retry_after); continue
+                if res.status_code == 400 and parse_mode: parse_mode = None; continue  # merged Markdown didn't parse: resend as plain text
+                if 400 <= res.status_code < 500: break  # retrying won't help
+            except Exception as e:
+                logging.warning(f"Telegram send error: {e}")
+            time.sleep(min(2 ** attempt, 30))
+        metrics.telegram_messages.inc("failed")
+        logging.warning(f"⚠️ Telegram message dropped after {attempt + 1} attempts: {text[:80]!r}")
+        return False
+
+    def _run(self):
+        while True:
+            try:
+                for chunk in self._take(): self._deliver(chunk)
+            finally:
+                with self.cond: self.busy = False; self.cond.notify_all()
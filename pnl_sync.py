@@ -0,0 +1,102 @@
+import collections, json, logging, os, time
+
+PAGE_LIMIT = 100
+OVERLAP_MS = 10 * 60 * 1000              # re-read this far behind the watermark; records can land slightly out of order
+MAX_CATCHUP_MS = 7 * 86400 * 1000 - 60_000  # closed-pnl accepts at most 7 days per query; older gaps are not replayed
+
+# --- ROLLING LEDGER ---
+# Trades closed in the last `window` seconds with running totals. Adding a trade and expiring old ones are O(1)
+# (amortised), so daily PnL and loss velocity never rescan history.
+class Ledger:
+    def __init__(self, window):
+        self.window = window
+        self.items = collections.deque()  # (ts, pnl, order_id), oldest first
+        self.pnl, self.wins = 0.0, 0
+
+    def add(self, ts, pnl, order_id="", now=None):
+        if (now or time.time()) - ts >= self.window: return
+        self.items.append((ts, pnl, order_id)); self.pnl += pnl; self.wins += pnl > 0
+
+    def expire(self, now=None):
+        cutoff = (now or time.time()) - self.window
+        while self.items and self.items[0][0] <= cutoff:
+            _, pnl, _ = self.items.popleft(); self.pnl -= pnl; self.wins -= pnl > 0
+        if not self.items: self.pnl = 0.0  # drop float residue
+        return self
+
+    def count(self, now=None): return len(self.expire(now).items)
+    def total(self, now=None): return self.expire(now).pnl
+    def losses(self, now=None): return self.count(now) - self.wins
+
+# --- SYNCHRONIZER ---
+# Pages /v5/position/closed-pnl forward from a persisted (updatedTime, orderId) watermark: the newest record applied,
+# or the "synced through" time when nothing closed. Order ids seen within the overlap window are remembered (and
+# forgotten once they fall behind it), so each record is applied exactly once without an ever-growing set. The last
+# 24h of trades are persisted with the watermark so a restart resumes where it stopped.
+class PnlSync:
+    def __init__(self, fetch, path, window=86400):
+        self.fetch = fetch  # fetch(params) -> closed-pnl `result` dict, or None on failure
+        self.path = path
+        self.mark = (0, "")
+        self.seen = {}                      # order_id -> updated ms, only within the overlap window
+        self.seen_order = collections.deque()
+        self.day = Ledger(window)
+        self.hour = Ledger(3600)
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f: st = json.load(f)
+        except (OSError, ValueError): return
+        self.mark = tuple(st.get("mark", (0, "")))
+        now = time.time()
+        for ts, pnl, oid in st.get("ledger", []):
+            self.day.add(ts, pnl, oid, now); self.hour.add(ts, pnl, oid, now); self._remember(oid, int(ts * 1000))
+        self._prune()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f: json.dump({"mark": list(self.mark), "ledger": list(self.day.expire().items)}, f)
+            os.replace(tmp, self.path)
+        except OSError as e: logging.error(f"PnL watermark save failed: {e}")
+
+    def _remember(self, oid, ms):
+        if oid in self.seen: return
+        self.seen[oid] = ms; self.seen_order.append((ms, oid))
+
+    def _prune(self):
+        cutoff = self.mark[0] - 2 * OVERLAP_MS
+        while self.seen_order and self.seen_order[0][0] < cutoff:
+            _, oid = self.seen_order.popleft(); self.seen.pop(oid, None)
+
+    def poll(self, now=None):
+        # -> closed-pnl records not applied before, oldest first (empty if the exchange call failed)
+        now = now or time.time(); now_ms = int(now * 1000)
+        start = max(self.mark[0] - OVERLAP_MS, now_ms - MAX_CATCHUP_MS) if self.mark[0] else now_ms - int(self.day.window * 1000)
+        rows, cursor = [], ""
+        while True:
+            q = {"category": "linear", "startTime": start, "endTime": now_ms, "limit": PAGE_LIMIT}
+            if cursor: q["cursor"] = cursor
+            res = self.fetch(q)
+            if res is None: return []
+            rows += res.get("list") or []
+            cursor = res.get("nextPageCursor")
+            if not cursor or not res.get("list"): break
+        new = sorted((r for r in rows if r["orderId"] not in self.seen), key=lambda r: (int(r["updatedTime"]), r["orderId"]))
+        for r in new:
+            ms, pnl = int(r["updatedTime"]), float(r["closedPnl"])
+            self._remember(r["orderId"], ms)
+            self.day.add(ms / 1000, pnl, r["orderId"], now); self.hour.add(ms / 1000, pnl, r["orderId"], now)
+            self.mark = max(self.mark, (ms, r["orderId"]))
+        # Everything up to now - overlap is settled even when nothing closed; keeps the next query short
+        self.mark = max(self.mark, (now_ms - OVERLAP_MS, ""))
+        self._prune()
+        self.save()
+        return new
+
+    def daily_pnl(self, now=None): return self.day.total(now)
+    def recent_losses(self, now=None): return self.hour.losses(now)
+    def win_rate(self, now=None):
+        n = self.day.count(now)
+        return 100.0 * self.day.wins / n if n else 0.0
@@ -0,0 +1,116 @@
+import hashlib, hmac, logging, queue, threading, time
+from collections import OrderedDict
+from market_stream import BybitStream
+
+PRIVATE_URL = "wss://stream.bybit.com/v5/private"
+TOPICS = ["position", "execution", "order", "wallet"]
+CLOSE_GRACE = 2.0   # seconds between a position going flat and its closed-PnL record being queryable
+MAX_ORDERS = 500    # recent orders/fills kept in the book
+
+# --- ACCOUNT STREAM ---
+# Authenticated v5 private feed that keeps an in-memory book of open positions, recent orders/fills and
+# wallet balance. Noteworthy changes are queued as events for the trading thread:
+#   {"type": "resync"}                    - (re)authenticated; anything may have been missed meanwhile
+#   {"type": "closed", "symbol": ...}     - a position went flat
+class AccountStream(BybitStream):
+    def __init__(self, api_key, api_secret, url=PRIVATE_URL, on_event=None):
+        super().__init__(url)
+        self.api_key, self.api_secret = api_key, api_secret
+        self.on_event = on_event
+        self.events = queue.Queue()
+        self.positions = {}          # symbol -> {"size", "side", "pnl", "created", "entry"}
+        self.orders = OrderedDict()  # orderId -> last order update
+        self.fills = OrderedDict()   # orderId -> {"symbol", "qty", "value", "ts"}
+        self.wallet = {}             # coin -> walletBalance
+        self.pending = {}            # symbol -> time it went flat
+        self.authed = False
+        self.seeded = False          # book reconciled with a REST snapshot since the last connect
+        self.lock = threading.Lock()
+        self.filled = threading.Condition()  # notified on every execution
+
+    def is_live(self, max_silence=60):
+        return self.authed and self.seeded and super().is_live(max_silence)
+
+    def seed(self, positions):
+        # REST snapshot ({symbol: {"size", "pnl", "created"}}) taken after (re)connecting
+        with self.lock:
+            for s, p in positions.items(): self.positions.setdefault(s, {}).update(p)
+            for s in [s for s in self.positions if s not in positions]: del self.positions[s]
+            self.seeded = True
+
+    def position_details(self):
+        with self.lock:
+            return {s: {"size": p["size"], "side": p.get("side"), "pnl": p["pnl"], "created": p["created"]} for s, p in self.positions.items()}
+
+    def wait_fill(self, order_id, qty, timeout):
+        # Blocks until `qty` of the order has executed -> {"qty", "value", ...}, or None on timeout
+        with self.filled:
+            if self.filled.wait_for(lambda: self.fills.get(order_id, {}).get("qty", 0) >= qty - 1e-12, timeout):
+                return dict(self.fills[order_id])
+        return None
+
+    def drain(self):
+        out = []
+        while True:
+            try: out.append(self.events.get_nowait())
+            except queue.Empty: return out
+
+    def _emit(self, event):
+        self.events.put(event)
+        if self.on_event: self.on_event(event)
+
+    async def _on_connect(self):
+        self.authed = self.seeded = False
+        expires = int((time.time() + 10) * 1000)
+        sig = hmac.new(self.api_secret.encode("utf-8"), f"GET/realtime{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+        await self.ws.send_json({"op": "auth", "args": [self.api_key, expires, sig]})  # topics are subscribed on the ack
+
+    async def _tick(self):
+        now = time.time()
+        for s, t0 in list(self.pending.items()):
+            if now - t0 >= CLOSE_GRACE:
+                del self.pending[s]
+                self._emit({"type": "closed", "symbol": s, "ts": t0})
+
+    def _handle(self, msg):
+        if msg.get("op") == "auth":
+            self.authed = bool(msg.get("success"))
+            if self.authed:
+                logging.info("🔐 ACCOUNT STREAM: authenticated")
+                self.loop.create_task(self._send_ops("subscribe", TOPICS)); self._emit({"type": "resync"})
+            else: logging.error(f"🔐 ACCOUNT STREAM auth failed: {msg.get('ret_msg')}")
+            return
+        topic, data = msg.get("topic"), msg.get("data", [])
+        if topic == "position":
+            for p in data: self._on_position(p)
+        elif topic == "execution":
+            for e in data: self._on_execution(e)
+        elif topic == "order":
+            for o in data: self._remember(self.orders, o["orderId"], o)
+        elif topic == "wallet":
+            for acct in data:
+                for c in acct.get("coin", []): self.wallet[c["coin"]] = float(c.get("walletBalance") or 0)
+
+    def _on_position(self, p):
+        if p.get("category", "linear") != "linear": return
+        s = p["symbol"]
+        with self.lock:
+            if float(p.get("size") or 0) > 0:
+                self.positions[s] = {"size": p["size"], "side": p.get("side"), "pnl": float(p.get("unrealisedPnl") or 0),
+                                     "created": int(p.get("createdTime") or 0), "entry": float(p.get("entryPrice") or p.get("avgPrice") or 0)}
+                self.pending.pop(s, None)
+            elif self.positions.pop(s, None) is not None:
+                self.pending[s] = time.time()
+
+    def _on_execution(self, e):
+        if e.get("execType", "Trade") != "Trade": return
+        f = self.fills.get(e["orderId"]) or {"symbol": e["symbol"], "qty": 0.0, "value": 0.0, "ts": 0}
+        qty = float(e["execQty"])
+        f["qty"] += qty; f["value"] += qty * float(e["execPrice"]); f["ts"] = int(e.get("execTime") or 0)
+        with self.filled:
+            self._remember(self.fills, e["orderId"], f)
+            self.filled.notify_all()
+
+    def _remember(self, book, key, value):
+        book[key] = value; book.move_to_end(key)
+        while len(book) > MAX_ORDERS: book.popitem(last=False)
@@ -0,0 +1,110 @@
+import heapq, itertools, threading, time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import metrics
+
+# Request priorities, lowest value goes first
+ORDER, ACCOUNT, MARKET, UI = 0, 1, 2, 3
+PRIORITY_NAMES = {ORDER: "order", ACCOUNT: "account", MARKET: "market", UI: "ui"}
+KIND_PRIORITY = {"order": ORDER, "private": ACCOUNT, "market": MARKET}  # transport kinds that hit Bybit
+
+# Endpoint group -> (requests/s, burst). Bybit limits each endpoint separately: every path gets its own bucket, seeded
+# with its group's documented default until that endpoint's X-Bapi-Limit headers say otherwise. "ip" is the shared
+# per-IP budget (600 per 5s) every Bybit request also draws from.
+GROUPS = {"ip": (120.0, 600), "order": (10.0, 10), "position": (10.0, 10), "account": (50.0, 50), "market": (100.0, 100)}
+
+# --- TOKEN BUCKET ---
+# Waiters queue in a heap by (priority, arrival); only the head may take a token, so an order request that arrives
+# behind twenty kline fetches is still the next one out.
+class Bucket:
+    def __init__(self, name, rate, burst):
+        self.name, self.rate, self.burst = name, float(rate), float(burst)
+        self.tokens, self.t = float(burst), time.monotonic()
+        self.hold_until = 0.0   # monotonic; set when the exchange reports the window as spent
+        self.waiters = []
+        self.cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.t) * self.rate); self.t = now
+
+    def acquire(self, priority, seq):
+        # Blocks until this caller is the head of the queue and a token is free -> seconds waited
+        me, t0 = (priority, seq), time.monotonic()
+        with self.cond:
+            heapq.heappush(self.waiters, me)
+            metrics.ratelimit_queue.set(len(self.waiters), self.name)
+            try:
+                while True:
+                    now = time.monotonic(); self._refill(now)
+                    if self.waiters[0] != me: self.cond.wait(0.5); continue
+                    if now >= self.hold_until and self.tokens >= 1: self.tokens -= 1; break
+                    self.cond.wait(max(self.hold_until - now, (1 - self.tokens) / self.rate, 0.001))
+            finally:
+                self.waiters.remove(me); heapq.heapify(self.waiters)
+                metrics.ratelimit_queue.set(len(self.waiters), self.name)
+                self.cond.notify_all()
+        return time.monotonic() - t0
+
+    def learn(self, limit, remaining, reset_ms):
+        # X-Bapi-Limit is the per-second cap, -Status what is left of the current window, -Reset-Timestamp when it refills
+        with self.cond:
+            now = time.monotonic(); self._refill(now)
+            if limit > 0: self.rate = self.burst = float(limit)
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining <= 0:
+                self.hold_until = max(self.hold_until, now + max(0.0, reset_ms / 1000 - time.time()))
+                metrics.ratelimit_holds.inc(self.name)
+            self.cond.notify_all()
+
+    def hold(self, seconds):
+        with self.cond:
+            self.hold_until = max(self.hold_until, time.monotonic() + seconds); self.tokens = 0.0
+            metrics.ratelimit_holds.inc(self.name)
+
+# --- LIMITER ---
+# Plugged into Transport: acquire() before every Bybit request, update() with the response headers after it.
+class RateLimiter:
+    def __init__(self, groups=GROUPS):
+        self.groups = groups
+        self.buckets = {"ip": Bucket("ip", *groups["ip"])}  # "ip" + one per endpoint path
+        self.seq = itertools.count()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def group_of(kind, path):
+        if kind == "order": return "position" if path.startswith("/v5/position/") else "order"
+        return "account" if kind == "private" else "market"
+
+    def bucket(self, kind, path):
+        with self.lock:
+            if path not in self.buckets: self.buckets[path] = Bucket(path, *self.groups[self.group_of(kind, path)])
+            return self.buckets[path]
+
+    @contextmanager
+    def priority(self, level):
+        # Demote non-order requests made on this thread (e.g. Telegram reads); orders keep their place
+        prev = getattr(self.local, "floor", None); self.local.floor = level
+        try: yield
+        finally: self.local.floor = prev
+
+    def acquire(self, kind, url):
+        if kind not in KIND_PRIORITY: return 0.0
+        pr = KIND_PRIORITY[kind]
+        floor = getattr(self.local, "floor", None)
+        if floor is not None and pr != ORDER: pr = max(pr, floor)
+        path, seq = urlsplit(url).path, next(self.seq)
+        waited = self.bucket(kind, path).acquire(pr, seq) + self.buckets["ip"].acquire(pr, seq)
+        metrics.ratelimit_wait.observe(waited, self.group_of(kind, path), PRIORITY_NAMES[pr])
+        return waited
+
+    def update(self, kind, url, status, headers):
+        if kind not in KIND_PRIORITY: return
+        bucket = self.bucket(kind, urlsplit(url).path)
+        if status in (403, 429): self.buckets["ip"].hold(1.0); return  # IP-level throttle: back everyone off
+        try: limit, remaining, reset = int(headers["X-Bapi-Limit"]), int(headers["X-Bapi-Limit-Status"]), int(headers["X-Bapi-Limit-Reset-Timestamp"])
+        except (KeyError, TypeError, ValueError): return
+        bucket.learn(limit, remaining, reset)
+
+    def depth(self):
+        with self.lock: return {name: len(b.waiters) for name, b in self.buckets.items()}
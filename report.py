@@ -1,76 +1,158 @@
-import ccxt
-import pandas as pd
-from datetime import datetime, timedelta
+import argparse, csv, datetime, json, os, sqlite3, time, urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 import config
 from colorama import Fore, Style, init
+from transport import Transport, bybit_headers
 
 # --- CONFIG ---
 init(autoreset=True)
-exchange = ccxt.bybit({
-    'apiKey': config.API_KEY,
-    'secret': config.API_SECRET,
-    'options': {'defaultType': 'swap'}
-})
-
-def get_pnl(days=1):
-    print(f"\n📊 {Fore.CYAN}SCANNING ACCOUNT PERFORMANCE (Last {days} Days)...{Style.RESET_ALL}")
-    
-    # Calculate timestamp for X days ago
-    since_time = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
-    
-    try:
-        # Fetch closed orders (Limit 50 to be fast)
-        trades = exchange.fetch_closed_orders(limit=50, since=since_time)
-        
-        total_pnl = 0
-        wins = 0
-        losses = 0
-        
-        print(f"{'SYMBOL':<15} {'SIDE':<6} {'RESULT':<10} {'PnL ($)':<10}")
-        print("-" * 45)
-        
-        for t in trades:
-            symbol = t['symbol']
-            side = t['side'].upper()
-            
-            # Not all trades have PnL info immediately, but Bybit usually provides trade data
-            # For simplicity, we assume Bybit 'closed_orders' response includes filled value
-            # Note: Accurate PnL often requires fetching 'my_trades', but let's try order cost diff
-            
-            # Fetch specific trade execution details for PnL
-            my_trades = exchange.fetch_my_trades(symbol, since=t['timestamp'], limit=5)
-            trade_pnl = 0
-            
-            for mt in my_trades:
-                if mt['order'] == t['id']:
-                    # Use realizedPnl if available (Bybit specific)
-                    info = mt.get('info', {})
-                    pnl = float(info.get('closedPnl', 0))
-                    trade_pnl += pnl
-            
-            if trade_pnl == 0: continue # Skip open/partial orders
-
-            total_pnl += trade_pnl
-            
-            # Determine Color
-            if trade_pnl > 0:
-                color = Fore.GREEN
-                result = "WIN"
-                wins += 1
-            else:
-                color = Fore.RED
-                result = "LOSS"
-                losses += 1
-                
-            print(f"{symbol:<15} {side:<6} {color}{result:<10} ${trade_pnl:.2f}{Style.RESET_ALL}")
-
-        print("-" * 45)
-        total_color = Fore.GREEN if total_pnl >= 0 else Fore.RED
-        print(f"🏆 TOTAL PnL: {total_color}${total_pnl:.2f}{Style.RESET_ALL}")
-        print(f"📈 WINS: {wins} | 📉 LOSSES: {losses}")
-        
-    except Exception as e:
-        print(f"❌ Error fetching PnL: {e}")
+BASE_URL = os.environ.get("BYBIT_BASE_URL") or getattr(config, "BYBIT_BASE_URL", "https://api.bybit.com")
+CACHE_FILE = os.path.join(os.getcwd(), "pnl_cache.db")
+TRADE_DB = os.path.join(os.getcwd(), "trade_history.db")  # bot_v33's trade journal, for the per-mode split
+DAY_MS = 86400 * 1000
+WINDOW_MS = 7 * DAY_MS     # /v5/position/closed-pnl rejects ranges longer than 7 days
+PAGE_LIMIT = 100           # max rows per page
+OVERLAP_MS = 10 * 60 * 1000  # re-read the newest cached stretch in case records landed late
+transport = Transport(pool_size=16)
+
+# --- FETCH ---
+def signed_get(path, params):
+    headers = bybit_headers(config.API_KEY, config.API_SECRET, urllib.parse.urlencode(params))
+    res = transport.get(f"{BASE_URL}{path}", "private", headers=headers, params=params).json()
+    if res.get("retCode"): raise RuntimeError(f"{path}: {res.get('retCode')} {res.get('retMsg')}")
+    return res["result"]
+
+def fetch_window(start, end):
+    # Every closed-pnl record in [start, end] (<= 7 days), following nextPageCursor
+    rows, cursor = [], ""
+    while True:
+        q = {"category": "linear", "startTime": start, "endTime": end, "limit": PAGE_LIMIT}
+        if cursor: q["cursor"] = cursor
+        r = signed_get("/v5/position/closed-pnl", q)
+        rows += r.get("list") or []
+        cursor = r.get("nextPageCursor")
+        if not cursor or not r.get("list"): return rows
+
+def fetch_ranges(ranges, workers=8):
+    # Ranges are cut into 7-day windows and the windows fetched concurrently
+    windows = [(t, min(t + WINDOW_MS - 1, end)) for start, end in ranges for t in range(start, end + 1, WINDOW_MS)]
+    if not windows: return []
+    with ThreadPoolExecutor(min(workers, len(windows))) as pool:
+        return [r for part in pool.map(lambda w: fetch_window(*w), windows) for r in part]
+
+# --- CACHE ---
+# Closed-pnl records never change once written, so every record seen is kept locally together with the time range
+# known to be complete; a run only asks the exchange for what lies outside that range.
+class PnlCache:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS closed_pnl (
+        order_id TEXT PRIMARY KEY, symbol TEXT NOT NULL, side TEXT, qty REAL,
+        entry_price REAL, exit_price REAL, pnl REAL, created INTEGER, updated INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_closed_updated ON closed_pnl(updated);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+
+    def covered(self):
+        m = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        return (m["from"], m["to"]) if "from" in m else None
+
+    def add(self, rows, lo, hi):
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO closed_pnl VALUES (?,?,?,?,?,?,?,?,?)",
+                                  [(r["orderId"], r["symbol"], r.get("side"), float(r.get("qty") or 0), float(r.get("avgEntryPrice") or 0),
+                                    float(r.get("avgExitPrice") or 0), float(r["closedPnl"]), int(r.get("createdTime") or 0), int(r["updatedTime"])) for r in rows])
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [("from", lo), ("to", hi)])
+
+    def rows(self, start, end, symbol=None, journal=TRADE_DB):
+        # -> [dict] in time order, each tagged with the bot's mode when the trade journal knows the closing order
+        mode = "'-'"
+        if journal and os.path.exists(journal):
+            if not self.conn.execute("PRAGMA database_list").fetchall()[1:]: self.conn.execute("ATTACH DATABASE ? AS journal", (journal,))
+            mode = "COALESCE((SELECT t.mode FROM journal.trades t WHERE t.exit_order_id = c.order_id), '-')"
+        sql = f"SELECT c.*, {mode} FROM closed_pnl c WHERE c.updated BETWEEN ? AND ?" + (" AND c.symbol = ?" if symbol else "") + " ORDER BY c.updated"
+        keys = ("order_id", "symbol", "side", "qty", "entry_price", "exit_price", "pnl", "created", "updated", "mode")
+        return [dict(zip(keys, r)) for r in self.conn.execute(sql, (start, end, symbol) if symbol else (start, end))]
+
+def sync(cache, start, end, workers=8):
+    # Fetch only the parts of [start, end] the cache can't vouch for -> records fetched
+    end = min(end, int(time.time() * 1000))
+    cov = cache.covered()
+    if cov is None: gaps, lo, hi = [(start, end)], start, end
+    else:
+        lo, hi = cov
+        gaps = ([(start, lo - 1)] if start < lo else []) + ([(hi - OVERLAP_MS, end)] if end > hi else [])
+        lo, hi = min(lo, start), max(hi, end)
+    rows = fetch_ranges(gaps, workers)
+    cache.add(rows, lo, hi)
+    return len(rows)
+
+# --- REPORT ---
+def breakdown(rows, key):
+    out = {}
+    for r in rows:
+        k = datetime.datetime.fromtimestamp(r["updated"] / 1000).strftime("%Y-%m-%d") if key == "day" else r[key]
+        g = out.setdefault(k, {"trades": 0, "pnl": 0.0, "wins": 0})
+        g["trades"] += 1; g["pnl"] += r["pnl"]; g["wins"] += r["pnl"] > 0
+    for g in out.values(): g["win_rate"] = 100.0 * g["wins"] / g["trades"]
+    return dict(sorted(out.items(), key=lambda kv: kv[0] if key == "day" else -kv[1]["pnl"]))
+
+def summarize(rows, by):
+    pnl = sum(r["pnl"] for r in rows); wins = sum(r["pnl"] > 0 for r in rows)
+    return {"trades": len(rows), "pnl": pnl, "wins": wins, "losses": len(rows) - wins,
+            "win_rate": 100.0 * wins / len(rows) if rows else 0.0, "by": {k: breakdown(rows, k) for k in by}}
+
+def print_report(summary, start, end, top):
+    fmt = lambda ms: datetime.datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M")
+    print(f"\n📊 {Fore.CYAN}ACCOUNT PERFORMANCE {fmt(start)} -> {fmt(end)}{Style.RESET_ALL}")
+    for key, groups in summary["by"].items():
+        print(f"\n{'BY ' + key.upper():<15} {'TRADES':>6} {'WIN %':>7} {'PnL ($)':>10}")
+        print("-" * 42)
+        for k, g in list(groups.items())[:top]:
+            color = Fore.GREEN if g["pnl"] >= 0 else Fore.RED
+            print(f"{str(k):<15} {g['trades']:>6} {g['win_rate']:>6.1f}% {color}{g['pnl']:>10.2f}{Style.RESET_ALL}")
+    print("-" * 42)
+    total_color = Fore.GREEN if summary["pnl"] >= 0 else Fore.RED
+    print(f"🏆 TOTAL PnL: {total_color}${summary['pnl']:.2f}{Style.RESET_ALL}")
+    print(f"📈 WINS: {summary['wins']} | 📉 LOSSES: {summary['losses']} | WR {summary['win_rate']:.1f}%")
+
+def export(rows, summary, csv_path=None, json_path=None):
+    if csv_path:
+        with open(csv_path, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["order_id"]); w.writeheader(); w.writerows(rows)
+    if json_path:
+        with open(json_path, "w") as f: json.dump({"summary": summary, "trades": rows}, f, indent=2)
+
+def parse_day(s):
+    return int(datetime.datetime.strptime(s, "%Y-%m-%d").timestamp() * 1000)
 
 if __name__ == "__main__":
-    get_pnl(days=1) # Check last 24 hours
+    ap = argparse.ArgumentParser(description="Closed-PnL report from Bybit with a local delta cache")
+    ap.add_argument("--days", type=float, default=1, help="look-back when --start is not given")
+    ap.add_argument("--start", help="YYYY-MM-DD (local time)")
+    ap.add_argument("--end", help="YYYY-MM-DD, inclusive (default: now)")
+    ap.add_argument("--symbol")
+    ap.add_argument("--by", default="symbol,mode", help="comma list of symbol, mode, day")
+    ap.add_argument("--top", type=int, default=20, help="rows per breakdown")
+    ap.add_argument("--csv"); ap.add_argument("--json")
+    ap.add_argument("--cache", default=CACHE_FILE)
+    ap.add_argument("--journal", default=TRADE_DB)
+    ap.add_argument("--workers", type=int, default=8)
+    args = ap.parse_args()
+
+    now = int(time.time() * 1000)
+    end = parse_day(args.end) + DAY_MS - 1 if args.end else now
+    start = parse_day(args.start) if args.start else end - int(args.days * DAY_MS)
+    t0 = time.time()
+    cache = PnlCache(args.cache)
+    try: fetched = sync(cache, start, end, args.workers)
+    except Exception as e: print(f"❌ Error fetching PnL: {e}"); raise SystemExit(1)
+    rows = cache.rows(start, end, args.symbol, args.journal)
+    summary = summarize(rows, [k for k in args.by.split(",") if k])
+    print_report(summary, start, min(end, now), args.top)
+    export(rows, summary, args.csv, args.json)
+    print(f"⚡ {len(rows)} trades ({fetched} fetched, rest from cache) in {time.time() - t0:.2f}s")
@@ -0,0 +1,184 @@
+import argparse, collections, logging, os, socket, statistics, subprocess, sys, time, zlib
+from multiprocessing.connection import Connection
+import numpy as np
+from candles import INTERVAL_MS
+from indicators import IndicatorEngine, market_info, synthetic_candles
+import metrics
+
+RECORD = ("adx", "slope", "price", "atr", "vol_mult", "rsi", "ema200")  # field order of a worker's signal record
+EVICT_AFTER = 3600  # a worker forgets series nobody has asked for in this long
+
+# --- SYNTHETIC SERIES ---
+# Seeded random walk per symbol, aligned to the current bar, oldest -> newest like CandleRing.view(); for benchmarks.
+def synthetic_series(symbol, interval, limit=200):
+    step = INTERVAL_MS[str(interval)]
+    arr = synthetic_candles(limit, seed=zlib.crc32(symbol.encode()), step_ms=step)
+    arr[:, 0] += int(time.time() * 1000) // step * step - arr[-1, 0]
+    return arr
+
+# --- WORKER ---
+# One process per shard, owning the indicator state of the symbols hashed to it. Downloads stay with the caller's
+# CandleStore (its rate limiter and the stream); a scan request carries, per series, only the bars from the last one
+# the worker committed plus the forming bar, or the whole window when the worker has nothing for it yet. The worker
+# steps its engines over them and answers with compact records.
+# Workers run `python shards.py --worker FD`, never the caller's main module, so importing them costs indicators only.
+def shard_worker(conn):
+    engines = {}
+    while True:
+        try: msg = conn.recv()
+        except (EOFError, KeyboardInterrupt): return
+        if msg[0] == "stop": return
+        if msg[0] == "reset":
+            engines.clear(); conn.send(("reset",)); continue
+        _, series, evict, adx_threshold, btc_trend = msg
+        t0 = time.perf_counter()
+        for key in evict: engines.pop(key, None)
+        records, errors = [], []
+        for (s, i), arr, full in series:
+            try:
+                if not full and (s, i) not in engines: raise LookupError("no state, resync")
+                vals = engines.setdefault((s, i), IndicatorEngine()).sync(arr)
+                if vals is None or None in vals.values(): raise ValueError(f"only {len(arr)} candles")
+                info = market_info(vals, adx_threshold, btc_trend)
+                records.append((s, i) + tuple(info[k] for k in RECORD))
+            except Exception as e: errors.append((s, i, str(e) or type(e).__name__))
+        conn.send(("scan", records, errors, time.perf_counter() - t0, len(engines)))
+
+# --- COORDINATOR ---
+# Splits each pass's {(symbol, interval): candle window} across the shards by a stable hash, so a symbol always lands
+# on the worker that already holds its indicator state, and merges the records back into the scanner's
+# {(symbol, interval): info}. `synced` mirrors what each worker holds (the last committed bar it was sent), so a warm
+# pass ships two rows per series instead of the window; series unused for EVICT_AFTER are dropped on both sides.
+# Portfolio rules, entries and orders stay with the caller. A shard that dies or misses the deadline is restarted
+# (cold) and its symbols simply have no info that pass.
+class ShardPool:
+    def __init__(self, workers, timeout=20.0):
+        self.timeout = timeout
+        self.synced = {}  # (symbol, interval) -> (last committed bar ts sent, last used)
+        self.evict = collections.defaultdict(list)  # shard -> keys to drop with its next request
+        self.sent_rows = 0  # rows shipped by the last evaluate()
+        self.shards = [self._spawn(k) for k in range(workers)]
+
+    def __len__(self): return len(self.shards)
+
+    def _spawn(self, k, restarts=0):
+        parent, child = socket.socketpair()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", str(child.fileno())], pass_fds=(child.fileno(),))
+        child.close()
+        return {"id": k, "proc": proc, "conn": Connection(parent.detach()), "status": "starting", "restarts": restarts, "lat": collections.deque(maxlen=50),
+                "last_ms": 0.0, "symbols": 0, "series": 0, "errors": 0, "last_ok": 0.0}
+
+    def _restart(self, sh, why):
+        logging.warning(f"🧩 SHARD {sh['id']} {why}, restarting")
+        metrics.shard_restarts.inc(str(sh['id']), why)
+        sh["proc"].terminate(); sh["conn"].close()
+        try: sh["proc"].wait(1)
+        except subprocess.TimeoutExpired: sh["proc"].kill()
+        for key in [key for key in self.synced if self.shard_of(key[0]) == sh["id"]]: del self.synced[key]
+        self.evict.pop(sh["id"], None)
+        self.shards[sh["id"]] = {**self._spawn(sh["id"], sh["restarts"] + 1), "status": why}
+
+    def shard_of(self, symbol):
+        return zlib.crc32(symbol.encode()) % len(self.shards)
+
+    def evaluate(self, series, adx_threshold, btc_trend):
+        # {(symbol, interval): oldest -> newest array} -> ({(symbol, interval): info}, {(symbol, interval): error})
+        parts, now = collections.defaultdict(list), time.time()
+        for key in [key for key, (_, used) in self.synced.items() if now - used > EVICT_AFTER]:
+            del self.synced[key]; self.evict[self.shard_of(key[0])].append(key)
+        self.sent_rows = 0
+        for (s, i), arr in series.items():
+            key, last = (s, str(i)), self.synced.get((s, str(i)), (None,))[0]
+            j = np.searchsorted(arr[:, 0], last) if last is not None and len(arr) and arr[0, 0] <= last else None
+            if j is not None: arr = arr[j:]  # from the bar the worker committed last (the engine skips it) on
+            parts[self.shard_of(s)].append((key, arr, j is None))
+            self.synced[key] = (arr[-2, 0] if len(arr) > 1 else last, now); self.sent_rows += len(arr)
+        infos, errors = {}, {}
+        sent, t0 = [], time.time()
+        for k, part in parts.items():
+            sh = self.shards[k]
+            keys = [key for key, _, _ in part]
+            try: sh["conn"].send(("scan", part, self.evict.pop(k, []), adx_threshold, btc_trend)); sent.append((sh, keys))
+            except (OSError, ValueError): self._restart(sh, "send failed"); errors.update(dict.fromkeys(keys, f"shard {k} down"))
+        for sh, part in sent:
+            try:
+                if not sh["conn"].poll(max(0.0, self.timeout - (time.time() - t0))): raise TimeoutError
+                _, records, errs, el, engines = sh["conn"].recv()
+            except TimeoutError:
+                self._restart(sh, "timeout"); errors.update(dict.fromkeys(part, f"shard {sh['id']} timeout")); continue
+            except (EOFError, OSError):
+                self._restart(sh, "died"); errors.update(dict.fromkeys(part, f"shard {sh['id']} died")); continue
+            for r in records: infos[(r[0], r[1])] = dict(zip(RECORD, r[2:]))
+            for s, i, e in errs: errors[(s, i)] = e; self.synced.pop((s, i), None)  # resend the full window next pass
+            sh.update(status="ok", last_ms=el * 1000, symbols=len(part), series=engines, errors=len(errs), last_ok=time.time())
+            sh["lat"].append(el); metrics.shard_seconds.observe(el, str(sh["id"]))
+        return infos, errors
+
+    def reset(self):
+        # Drop every worker's indicator state (benchmarks: time cold passes)
+        self.synced.clear(); self.evict.clear()
+        for sh in self.shards: sh["conn"].send(("reset",))
+        for sh in self.shards: sh["conn"].recv()
+
+    def health(self):
+        now = time.time()
+        return [{"shard": sh["id"], "pid": sh["proc"].pid, "alive": sh["proc"].poll() is None, "status": sh["status"], "symbols": sh["symbols"],
+                 "series": sh["series"], "last_ms": sh["last_ms"],
+                 "p95_ms": statistics.quantiles(sh["lat"], n=20)[-1] * 1000 if len(sh["lat"]) >= 2 else sh["last_ms"],
+                 "errors": sh["errors"], "restarts": sh["restarts"], "idle_s": now - sh["last_ok"] if sh["last_ok"] else None} for sh in self.shards]
+
+    def summary(self):
+        # Telegram /perf lines
+        lines = [f"🧩 **Shards** ({len(self.shards)}) last | p95, symbols"]
+        for h in self.health():
+            icon = "🟢" if h["alive"] and h["status"] == "ok" else "🔴"
+            lines.append(f"{icon} `#{h['shard']}` {h['last_ms']:.0f}ms | ≤{h['p95_ms']:.0f}ms, {h['symbols']} sym"
+                         + (f" ⚠️{h['errors']} err" if h["errors"] else "") + (f" ♻️{h['restarts']}" if h["restarts"] else ""))
+        return "\n".join(lines)
+
+    def close(self):
+        for sh in self.shards:
+            try: sh["conn"].send(("stop",))
+            except (OSError, ValueError): pass
+        for sh in self.shards:
+            try: sh["proc"].wait(2)
+            except subprocess.TimeoutExpired: sh["proc"].terminate()
+            sh["conn"].close()
+
+# --- SCALING BENCHMARK ---
+# `python shards.py` evaluates a synthetic universe (default 1000 symbols on the 15m interval) cold -- full
+# 200-bar seeding, the CPU-heavy case -- and warm with 1..N workers, and prints throughput, speedup and the rows
+# shipped per pass for each count. Speedup needs as many free cores as workers.
+def bench_pass(pool, series, cold):
+    if cold: pool.reset()
+    t0 = time.perf_counter()
+    infos, errors = pool.evaluate(series, 25.0, "BULL")
+    assert not errors and len(infos) == len(series), f"{len(errors)} errors, e.g. {next(iter(errors.items()), None)}"
+    return time.perf_counter() - t0
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        shard_worker(Connection(int(sys.argv[2]))); sys.exit()
+    ap = argparse.ArgumentParser(description="Shard scaling benchmark on a synthetic universe")
+    ap.add_argument("--symbols", type=int, default=1000)
+    ap.add_argument("--interval", default="15")
+    ap.add_argument("--workers", default=None, help="comma list of worker counts (default: 1,2,4.. up to the CPU count)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    cpus = os.cpu_count() or 1
+    counts = [int(x) for x in args.workers.split(",")] if args.workers else sorted({1, *[2 ** k for k in range(1, 8) if 2 ** k <= cpus], cpus})
+    series = {(f"SYN{k}USDT", args.interval): synthetic_series(f"SYN{k}USDT", args.interval) for k in range(args.symbols)}
+    print(f"🧪 {args.symbols} symbols x {args.interval}m, {cpus} CPU(s)")
+    base = None
+    for n in counts:
+        pool = ShardPool(n, timeout=600)
+        bench_pass(pool, dict(list(series.items())[:n]), cold=True)  # spawn + imports out of the timing
+        cold = min(bench_pass(pool, series, cold=True) for _ in range(args.repeat))
+        cold_rows = pool.sent_rows
+        bench_pass(pool, series, cold=False)
+        warm = min(bench_pass(pool, series, cold=False) for _ in range(args.repeat))
+        base = base or cold
+        print(f"  {n:>3} workers: cold {cold:6.2f}s ({args.symbols / cold:7.0f} sym/s, x{base / cold:.2f}, {cold_rows} rows)"
+              f"  warm {warm * 1000:7.1f}ms ({pool.sent_rows} rows)")
+        for h in pool.health(): print(f"      #{h['shard']} pid {h['pid']} {h['symbols']} sym, last {h['last_ms']:.0f}ms, p95 {h['p95_ms']:.0f}ms, restarts {h['restarts']}")
+        pool.close()
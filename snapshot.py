@@ -0,0 +1,56 @@
+import logging, os, pickle, threading, time
+
+VERSION = 1
+
+# --- SNAPSHOT FILE ---
+# One pickle (protocol 5, numpy buffers stored raw) written to a temp file and renamed over the old one, so a crash
+# mid-write never leaves a torn snapshot behind.
+def save(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"version": VERSION, "saved_at": time.time(), "state": state}, f, protocol=5)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load(path, max_age=None):
+    # -> (state, saved_at), or (None, None) when missing, unreadable, from another version or older than max_age seconds
+    try:
+        with open(path, "rb") as f: snap = pickle.load(f)
+    except FileNotFoundError: return None, None
+    except Exception as e: logging.warning(f"Snapshot unreadable, cold start: {e}"); return None, None
+    if snap.get("version") != VERSION: return None, None
+    if max_age is not None and time.time() - snap["saved_at"] > max_age: return None, None
+    return snap["state"], snap["saved_at"]
+
+# --- SNAPSHOTTER ---
+# maybe_save() runs capture() on the caller's thread (cheap dict/array copies) at most every `every` seconds and
+# hands the result to a writer thread for pickling and disk I/O. Only the newest pending snapshot is kept.
+class Snapshotter:
+    def __init__(self, path, every=60):
+        self.path, self.every = path, every
+        self.last = time.time()
+        self.pending = None
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def maybe_save(self, capture, now=None):
+        now = now or time.time()
+        if now - self.last < self.every: return False
+        self.last = now
+        state = capture()
+        with self.cond:
+            self.pending = state
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="snapshot", daemon=True); self.thread.start()
+            self.cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None: self.cond.wait()
+                state, self.pending = self.pending, None
+            t0 = time.time()
+            try: save(self.path, state)
+            except Exception as e: logging.error(f"Snapshot save failed: {e}"); continue
+            logging.info(f"💾 Snapshot saved in {(time.time() - t0) * 1000:.0f}ms")
@@ -0,0 +1,225 @@
+import argparse, csv, datetime, logging, os, queue, sqlite3, tempfile, threading, time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL, mode TEXT, side TEXT,
+    entry_ts REAL NOT NULL, entry_price REAL, qty REAL, order_id TEXT,
+    rsi REAL, adx REAL, atr REAL, trend TEXT,
+    exit_ts REAL, exit_price REAL, pnl REAL, result INTEGER, exit_order_id TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_trades_symbol ON trades(symbol, entry_ts);
+CREATE INDEX IF NOT EXISTS ix_trades_exit ON trades(exit_ts);
+CREATE INDEX IF NOT EXISTS ix_trades_mode ON trades(mode, exit_ts);
+CREATE INDEX IF NOT EXISTS ix_trades_open ON trades(symbol) WHERE exit_ts IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_trades_exit_order ON trades(exit_order_id) WHERE exit_order_id IS NOT NULL;
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY, symbol TEXT NOT NULL, order_id TEXT, side TEXT, price REAL, qty REAL, ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_fills_symbol ON fills(symbol, ts);
+"""
+CSV_TIME = "%Y-%m-%d %H:%M:%S"
+IMPORT_MATCH = 7 * 86400  # how far before a closed-pnl record an imported CSV trade may have been opened
+GROUPINGS = {"mode": "COALESCE(mode, '-')", "symbol": "symbol",
+             "hour": "CAST(strftime('%H', exit_ts, 'unixepoch', 'localtime') AS INTEGER)"}
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL"); conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# --- TRADE STORE ---
+# SQLite (WAL) trade journal. record_* calls only enqueue; one writer thread applies whatever has queued up in a
+# single transaction, so the trading thread never waits on disk. If that transaction fails, the batch is replayed one
+# op per transaction so only the bad op is lost. Readers use their own per-thread connections,
+# which WAL lets run alongside the writer.
+class TradeStore:
+    def __init__(self, path, max_batch=500):
+        self.path, self.max_batch = path, max_batch
+        self.q = queue.Queue()
+        self.local = threading.local()
+        self.writer = None
+        self.lock = threading.Lock()
+        self.ready = False
+
+    def _init(self):
+        with self.lock:
+            if self.ready: return
+            conn = connect(self.path); conn.executescript(SCHEMA); conn.close()
+            self.ready = True
+
+    def _db(self):
+        self._init()
+        conn = getattr(self.local, "conn", None)
+        if conn is None: conn = self.local.conn = connect(self.path)
+        return conn
+
+    # --- writes (queued) ---
+    def _put(self, op, *args):
+        if self.writer is None:
+            with self.lock:
+                if self.writer is None:
+                    self.writer = threading.Thread(target=self._run, name="trade-store", daemon=True); self.writer.start()
+        self.q.put((op, args))
+
+    def record_entry(self, symbol, mode, side, rsi, adx, atr, trend, price, qty=None, order_id=None, ts=None):
+        self._put("entry", symbol, mode, side, rsi, adx, atr, trend, price, qty, order_id, ts or time.time())
+
+    def record_exit(self, symbol, exit_price, pnl, ts=None, order_id=None):
+        self._put("exit", symbol, exit_price, pnl, ts or time.time(), order_id)
+
+    def record_fill(self, symbol, order_id, side, price, qty, ts=None):
+        self._put("fill", symbol, order_id, side, price, qty, ts or time.time())
+
+    def flush(self, timeout=None):
+        # Block until everything queued so far is committed
+        if self.writer is None: return True
+        if timeout is None: self.q.join(); return True
+        deadline = time.time() + timeout
+        while self.q.unfinished_tasks and time.time() < deadline: time.sleep(0.01)
+        return not self.q.unfinished_tasks
+
+    def _run(self):
+        conn = self._db()
+        while True:
+            batch = [self.q.get()]
+            while len(batch) < self.max_batch:
+                try: batch.append(self.q.get_nowait())
+                except queue.Empty: break
+            try:
+                with conn:
+                    for op, args in batch: getattr(self, "_" + op)(conn, *args)
+            except Exception:
+                for op, args in batch:
+                    try:
+                        with conn: getattr(self, "_" + op)(conn, *args)
+                    except Exception as e: logging.error(f"Trade store {op} dropped ({args[0]}): {e}")
+            for _ in batch: self.q.task_done()
+
+    @staticmethod
+    def _entry(conn, symbol, mode, side, rsi, adx, atr, trend, price, qty, order_id, ts):
+        conn.execute("INSERT INTO trades (symbol, mode, side, entry_ts, entry_price, qty, order_id, rsi, adx, atr, trend) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                     (symbol, mode, side, ts, price, qty, order_id, rsi, adx, atr, trend))
+
+    @staticmethod
+    def _exit(conn, symbol, exit_price, pnl, ts, order_id):
+        # Closes the newest open trade for the symbol; an exit with no recorded entry (manual trade, lost context) still
+        # gets its own row so PnL totals match the exchange. Re-delivered closed-pnl records are ignored, and so are
+        # records for trades imported from the legacy CSV (same symbol and PnL, opened shortly before, no order id yet),
+        # which adopt the record's order id and real exit time instead.
+        if order_id and conn.execute("SELECT 1 FROM trades WHERE exit_order_id = ?", (order_id,)).fetchone(): return
+        if order_id:
+            row = conn.execute("SELECT id FROM trades WHERE symbol = ? AND exit_order_id IS NULL AND exit_ts IS NOT NULL AND ABS(pnl - ?) < 1e-9 "
+                               "AND entry_ts BETWEEN ? AND ? ORDER BY entry_ts DESC LIMIT 1", (symbol, pnl, ts - IMPORT_MATCH, ts)).fetchone()
+            if row: conn.execute("UPDATE trades SET exit_ts = ?, exit_order_id = ? WHERE id = ?", (ts, order_id, row[0])); return
+        vals = (ts, exit_price, pnl, 1 if pnl > 0 else 0, order_id)
+        row = conn.execute("SELECT id FROM trades WHERE symbol = ? AND exit_ts IS NULL ORDER BY entry_ts DESC LIMIT 1", (symbol,)).fetchone()
+        if row: conn.execute("UPDATE trades SET exit_ts = ?, exit_price = ?, pnl = ?, result = ?, exit_order_id = ? WHERE id = ?", vals + (row[0],))
+        else: conn.execute("INSERT INTO trades (symbol, entry_ts, exit_ts, exit_price, pnl, result, exit_order_id) VALUES (?,?,?,?,?,?,?)", (symbol, ts) + vals)
+
+    @staticmethod
+    def _fill(conn, symbol, order_id, side, price, qty, ts):
+        conn.execute("INSERT INTO fills (symbol, order_id, side, price, qty, ts) VALUES (?,?,?,?,?,?)", (symbol, order_id, side, price, qty, ts))
+
+    # --- reads ---
+    def open_trades(self):
+        # symbol -> entry context (same keys as the bot's entry_data_log) for every trade without an exit
+        rows = self._db().execute("SELECT symbol, entry_ts, mode, side, rsi, adx, atr, trend, entry_price FROM trades WHERE exit_ts IS NULL ORDER BY entry_ts").fetchall()
+        return {r[0]: {"Time": datetime.datetime.fromtimestamp(r[1]).strftime(CSV_TIME), "Mode": r[2], "Side": r[3], "RSI": r[4], "ADX": r[5],
+                       "ATR": r[6], "Trend": r[7], "EntryPrice": r[8]} for r in rows}
+
+    def count(self):
+        return self._db().execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    def pnl_by(self, key, since=0, until=None):
+        # [(mode | symbol | hour, trades, pnl, win rate %)] over closed trades, best PnL first
+        sql = (f"SELECT {GROUPINGS[key]} AS k, COUNT(*), SUM(pnl), 100.0 * SUM(pnl > 0) / COUNT(*) FROM trades "
+               "WHERE exit_ts >= ? AND exit_ts < ? GROUP BY k ORDER BY SUM(pnl) DESC")
+        return self._db().execute(sql, (since, until or time.time() + 1)).fetchall()
+
+    def totals(self, since=0, until=None):
+        # -> (trades, pnl, win rate %)
+        n, pnl, wins = self._db().execute("SELECT COUNT(*), COALESCE(SUM(pnl), 0), COALESCE(SUM(pnl > 0), 0) FROM trades WHERE exit_ts >= ? AND exit_ts < ?",
+                                          (since, until or time.time() + 1)).fetchone()
+        return n, pnl, (100.0 * wins / n if n else 0.0)
+
+    def win_rates(self, windows=(86400, 7 * 86400, 30 * 86400), now=None):
+        now = now or time.time()
+        return {w: self.totals(now - w, now + 1) for w in windows}
+
+    def rolling(self, window=86400, step=3600, since=None, until=None):
+        # [(window end, trades, pnl, win rate %)] every `step` seconds, one pass over the sorted exits
+        until = until or time.time()
+        since = since if since is not None else until - 30 * 86400
+        rows = self._db().execute("SELECT exit_ts, pnl FROM trades WHERE exit_ts >= ? AND exit_ts < ? ORDER BY exit_ts",
+                                  (since - window, until + 1)).fetchall()
+        out, lo, hi, n, pnl, wins = [], 0, 0, 0, 0.0, 0
+        t = since
+        while t <= until:
+            while hi < len(rows) and rows[hi][0] <= t: n += 1; pnl += rows[hi][1]; wins += rows[hi][1] > 0; hi += 1
+            while lo < hi and rows[lo][0] <= t - window: n -= 1; pnl -= rows[lo][1]; wins -= rows[lo][1] > 0; lo += 1
+            if not n: pnl = 0.0  # drop float residue once the window empties
+            out.append((t, n, pnl, 100.0 * wins / n if n else 0.0))
+            t += step
+        return out
+
+    # --- import ---
+    def import_csv(self, path):
+        # Load a trade_history.csv (Time, Symbol, Mode, Side, RSI, ADX, ATR, Trend, EntryPrice, ExitPrice, PnL, Result).
+        # The CSV has no exit time, so exit_ts is set to the entry time until the closed-pnl replay matches the trade (see
+        # _exit). Rows already present are skipped -> rows added.
+        conn = self._db()
+        added = 0
+        with open(path, newline="") as f, conn:
+            for r in csv.DictReader(f):
+                try: ts = datetime.datetime.strptime(r["Time"], CSV_TIME).timestamp()
+                except (KeyError, ValueError): continue
+                if conn.execute("SELECT 1 FROM trades WHERE symbol = ? AND entry_ts = ?", (r["Symbol"], ts)).fetchone(): continue
+                num = lambda k: float(r[k]) if r.get(k) not in (None, "") else None
+                pnl = num("PnL")
+                conn.execute("INSERT INTO trades (symbol, mode, side, entry_ts, entry_price, rsi, adx, atr, trend, exit_ts, exit_price, pnl, result) "
+                             "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", (r["Symbol"], r["Mode"], r["Side"], ts, num("EntryPrice"), num("RSI"), num("ADX"),
+                                                                   num("ATR"), r["Trend"], ts, num("ExitPrice"), pnl, int(pnl > 0) if pnl is not None else None))
+                added += 1
+        return added
+
+def print_report(store, days):
+    since = time.time() - days * 86400
+    n, pnl, wr = store.totals(since)
+    print(f"📅 Last {days}d: {n} trades | PnL ${pnl:.2f} | WR {wr:.1f}%")
+    for key in ("mode", "symbol", "hour"):
+        print(f"\nBy {key}:")
+        for k, cnt, p, w in store.pnl_by(key, since): print(f"  {str(k):<14} {cnt:4d} trades | ${p:8.2f} | WR {w:5.1f}%")
+    print("\nWin rate:")
+    for w, (cnt, p, r) in store.win_rates().items(): print(f"  {w // 86400:>3}d  {cnt:4d} trades | ${p:8.2f} | WR {r:5.1f}%")
+
+# `python trade_store.py --selftest` queues a batch around one op that cannot be written: the batch's other entries,
+# exits and fills must still be committed.
+def selftest(n=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TradeStore(os.path.join(tmp, "t.db"))
+        store.writer = True  # hold the writer back so everything lands in one batch
+        for k in range(n): store.record_entry(f"S{k}USDT", "SCALP", "Buy", 50, 30, 1, "BULL", 100.0)
+        store.record_entry(None, "SCALP", "Buy", 50, 30, 1, "BULL", 100.0)  # symbol NOT NULL
+        for k in range(n): store.record_exit(f"S{k}USDT", 101.0, 1.0, order_id=f"o{k}")
+        store.record_fill("S0USDT", "f0", "Buy", 100.0, 1.0)
+        store.writer = None; store.record_fill("S1USDT", "f1", "Buy", 100.0, 1.0)  # starts the writer on the whole queue
+        store.flush()
+        db = store._db()
+        trades, closed = db.execute("SELECT COUNT(*), COUNT(exit_ts) FROM trades").fetchone()
+        fills = db.execute("SELECT COUNT(*) FROM fills").fetchone()[0]
+    ok = trades == n and closed == n and fills == 2
+    print(f"{'✅' if ok else '❌'} {n} entries + 1 bad op + {n} exits + 2 fills in one batch: {trades} trades, {closed} closed, {fills} fills")
+    return ok
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Trade journal (SQLite) for bot_v33")
+    ap.add_argument("--db", default=os.path.join(os.getcwd(), "trade_history.db"))
+    ap.add_argument("--import-csv", metavar="CSV", help="import an existing trade_history.csv")
+    ap.add_argument("--days", type=int, default=30, help="report window")
+    ap.add_argument("--selftest", action="store_true", help="check that one failing write does not drop its batch and exit")
+    args = ap.parse_args()
+    if args.selftest: raise SystemExit(0 if selftest() else 1)
+    store = TradeStore(args.db)
+    if args.import_csv: print(f"📥 Imported {store.import_csv(args.import_csv)} trades from {args.import_csv}")
+    print_report(store, args.days)
@@ -0,0 +1,73 @@
+import hashlib, hmac, threading, time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+try: import httpx  # optional: only needed for HTTP/2
+except ImportError: httpx = None
+
+# Seconds per endpoint class
+TIMEOUTS = {"market": 3, "private": 5, "order": 5, "sentiment": 5, "telegram": 10, "telegram_poll": 15}
+# Signed Bybit paths sent as "order"; everything else signed is "private". Order writes only: reads such as
+# /v5/order/realtime fill polling are account reads.
+ORDER_ENDPOINTS = ("/v5/order/create", "/v5/order/cancel", "/v5/order/amend", "/v5/position/trading-stop", "/v5/position/set-leverage")
+
+# --- SIGNING ---
+def bybit_headers(api_key, api_secret, param_str, recv_window="5000"):
+    # Bybit v5 auth headers; param_str is the query string for GET, the JSON body for POST
+    ts = str(int(time.time() * 1000))
+    signature = hmac.new(api_secret.encode("utf-8"), (ts + api_key + recv_window + param_str).encode("utf-8"), hashlib.sha256).hexdigest()
+    return {"X-BAPI-API-KEY": api_key, "X-BAPI-SIGN": signature, "X-BAPI-TIMESTAMP": ts, "X-BAPI-RECV-WINDOW": recv_window, "Content-Type": "application/json"}
+
+# --- TRANSPORT ---
+# One keep-alive session for every HTTP call the bot makes. urllib3 keeps a connection pool per host,
+# so after warm-up each request reuses an open TCP+TLS connection instead of handshaking again.
+# `observer(kind, url, seconds, status)` is called after every request (status None when it raised).
+# An optional `limiter` (ratelimit.RateLimiter) gates each request and learns from the response headers.
+class Transport:
+    def __init__(self, pool_size=16, http2=False, timeouts=None, observer=None, limiter=None):
+        self.timeouts = {**TIMEOUTS, **(timeouts or {})}
+        self.observer, self.limiter = observer, limiter
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+        self.adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.h2 = httpx.Client(http2=True, limits=httpx.Limits(max_connections=pool_size)) if (http2 and httpx) else None
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def request(self, method, url, kind="market", **kw):
+        kw.setdefault("timeout", self.timeouts.get(kind, 5))
+        host = urlsplit(url).hostname
+        with self.lock: self.counts[host] = self.counts.get(host, 0) + 1
+        if self.limiter: self.limiter.acquire(kind, url)
+        t0 = time.perf_counter()
+        try: res = (self.h2 or self.session).request(method, url, **kw)
+        except Exception:
+            if self.observer: self.observer(kind, url, time.perf_counter() - t0, None)
+            raise
+        if self.observer: self.observer(kind, url, time.perf_counter() - t0, res.status_code)
+        if self.limiter: self.limiter.update(kind, url, res.status_code, res.headers)
+        return res
+
+    def get(self, url, kind="market", **kw): return self.request("GET", url, kind, **kw)
+    def post(self, url, kind="market", **kw): return self.request("POST", url, kind, **kw)
+
+    def stats(self):
+        # host -> requests sent / TCP connections opened / share of requests that reused a connection
+        out = {h: {"requests": n, "connections": 0} for h, n in self.counts.items()}
+        if not self.h2:
+            pools = self.adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool and pool.host in out: out[pool.host]["connections"] += pool.num_connections
+        for d in out.values(): d["reuse"] = 1 - d["connections"] / d["requests"] if d["requests"] and d["connections"] else None
+        return out
+
+    def summary(self):
+        st = self.stats()
+        reqs = sum(d["requests"] for d in st.values()); conns = sum(d["connections"] for d in st.values())
+        if not reqs: return "no requests yet"
+        if self.h2: return f"HTTP/2, {reqs} reqs"
+        return f"{100 * (1 - conns / reqs):.0f}% reuse ({conns} conns / {reqs} reqs)"
@@ -0,0 +1,139 @@
+import heapq, threading
+
+# --- STREAMING TOP-K ---
+# Keeps the k highest-scoring keys as scores change. Members sit in a min-heap, the rest in a max-heap; both use lazy
+# deletion (an entry is live only while it matches the key's current score and side), so an update is one push plus
+# amortised O(log n) pops instead of a full re-sort. An outsider only displaces the weakest member once it beats it by
+# `hysteresis` (relative), so keys hovering around the cut don't flip in and out on every tick.
+class TopK:
+    def __init__(self, k, hysteresis=0.0):
+        self.k, self.hysteresis = k, hysteresis
+        self.score = {}
+        self.members = set()
+        self.inside = []   # (score, key)
+        self.outside = []  # (-score, key)
+        self.changes = []  # (key, True on promotion / False on demotion) since the last drain()
+
+    def __len__(self): return len(self.members)
+
+    def update(self, key, score):
+        if self.score.get(key) == score: return
+        self.score[key] = score
+        if key in self.members: heapq.heappush(self.inside, (score, key))
+        else: heapq.heappush(self.outside, (-score, key))
+        self._balance()
+
+    def remove(self, key):
+        if self.score.pop(key, None) is None: return
+        if key in self.members: self.members.discard(key); self.changes.append((key, False))
+        self._balance()
+
+    def ranked(self):
+        # Members, best first (O(k log k); k is small)
+        return sorted(self.members, key=lambda s: (-self.score[s], s))
+
+    def drain(self):
+        out, self.changes = self.changes, []
+        return out
+
+    def _top(self, heap, inside):
+        # Pop stale entries until the head is live -> (score, key) or None
+        while heap:
+            s, key = heap[0]
+            s = s if inside else -s
+            if self.score.get(key) == s and (key in self.members) == inside: return s, key
+            heapq.heappop(heap)
+        return None
+
+    def _balance(self):
+        while True:
+            best, worst = self._top(self.outside, False), self._top(self.inside, True)
+            if best and len(self.members) < self.k: self._move(best[1], True); continue
+            if worst and len(self.members) > self.k: self._move(worst[1], False); continue
+            if best and worst and best[0] > worst[0] + abs(worst[0]) * self.hysteresis:
+                self._move(worst[1], False); self._move(best[1], True); continue
+            break
+        if len(self.inside) + len(self.outside) > 4 * len(self.score) + 64: self._compact()
+
+    def _move(self, key, promote):
+        s = self.score[key]
+        if promote: self.members.add(key); heapq.heappush(self.inside, (s, key))
+        else: self.members.discard(key); heapq.heappush(self.outside, (-s, key))
+        self.changes.append((key, promote))
+
+    def _compact(self):
+        self.inside = [(self.score[k], k) for k in self.members]
+        self.outside = [(-s, k) for k, s in self.score.items() if k not in self.members]
+        heapq.heapify(self.inside); heapq.heapify(self.outside)
+
+# --- UNIVERSE RANKING ---
+# Live version of MarketSelector.refresh_lists: the top `size` USDT perps by 24h turnover, minus those whose funding is
+# over the cap, split by 24h range volatility into the `scalp` most volatile and the rest (swing). Fed one ticker
+# (snapshot or delta) at a time from the public stream. Funding has its own band: a symbol is excluded above
+# max_funding and only readmitted once back under max_funding * (1 - hysteresis).
+class UniverseRanker:
+    def __init__(self, size=40, scalp=20, max_funding=0.001, hysteresis=0.1):
+        self.max_funding, self.hysteresis = max_funding, hysteresis
+        self.turnover = TopK(size, hysteresis)
+        self.volatility = TopK(scalp, hysteresis)
+        self.tickers = {}      # symbol -> merged ticker fields we rank on
+        self.banned = set()    # over the funding cap
+        self.version = 0       # bumped whenever the scalp/swing split changes
+        self.seeded = False    # a full ticker list has been loaded; until then the split is partial
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def eligible(symbol):
+        return symbol.endswith("USDT") and "USDC" not in symbol
+
+    def update(self, ticker):
+        # Apply one ticker message (any subset of fields) -> True if the split changed
+        sym = ticker.get("symbol", "")
+        if not self.eligible(sym): return False
+        with self.lock:
+            t = self.tickers.setdefault(sym, {})
+            t.update((k, ticker[k]) for k in ("turnover24h", "highPrice24h", "lowPrice24h", "fundingRate") if ticker.get(k) not in (None, ""))
+            if "turnover24h" in t: self.turnover.update(sym, float(t["turnover24h"]))
+            funding = abs(float(t.get("fundingRate") or 0))
+            if funding > self.max_funding: self.banned.add(sym)
+            elif funding <= self.max_funding * (1 - self.hysteresis): self.banned.discard(sym)
+            for s, _ in self.turnover.drain():
+                if s != sym: self._place(s)
+            self._place(sym)
+            changed = bool(self.volatility.changes)
+            self.volatility.drain()
+            if changed: self.version += 1
+            return changed
+
+    def load(self, tickers):
+        # Seed from a full /v5/market/tickers list (or a dump())
+        for t in tickers: self.update(t)
+        self.seeded = True
+
+    def dump(self):
+        with self.lock: return [dict(t, symbol=s) for s, t in self.tickers.items()]
+
+    def set_max_funding(self, cap):
+        with self.lock: self.max_funding = cap
+
+    def _place(self, sym):
+        t = self.tickers.get(sym, {})
+        if sym not in self.turnover.members or sym in self.banned or "highPrice24h" not in t:
+            self.volatility.remove(sym); return
+        h, l = float(t["highPrice24h"]), float(t.get("lowPrice24h") or 0)
+        self.volatility.update(sym, (h - l) / l if l > 0 else 0)
+
+    def split(self):
+        # -> (scalp targets, swing targets), each most volatile first
+        with self.lock:
+            ranked = sorted(self.volatility.score, key=lambda s: (-self.volatility.score[s], s))
+            scalp = [s for s in ranked if s in self.volatility.members]
+            return scalp, [s for s in ranked if s not in self.volatility.members]
+
+    def scalp_cut(self, default=0.05):
+        # Lowest 24h range that currently makes the scalp list
+        with self.lock:
+            return min((self.volatility.score[s] for s in self.volatility.members), default=default)
+
+    def symbols(self):
+        with self.lock: return list(self.tickers)